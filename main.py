@@ -1,5 +1,16 @@
+import sys
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # frozen EXE: multi-camera workers start here
+
+if __name__ == "__main__" and "--headless" in sys.argv:
+    # Service mode: run the shared pipeline before any GUI toolkit is imported.
+    # Run as the package's __main__ so spawned camera workers don't re-import this script
+    import runpy
+    runpy.run_module("tracker_core", run_name="__main__", alter_sys=True)
+
 import cv2
-import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 import json
@@ -8,13 +19,15 @@ import time
 import math
 import numpy as np
 import os
-import urllib.request
 import threading
 import tkinter as tk
 from tkinter import filedialog
 import customtkinter as ctk
 
-import sys
+from tracker_core import (
+    BLENDSHAPE_NAMES, EYE_L, EYE_R, HAND_MODEL_URL, MODEL_URL, REF_MAP_URL, MeshOverlay, PreviewThrottle, Tracker,
+    canonical_mode, create_pipeline, default_config, ensure_asset, load_config, save_config, window_hidden,
+)
 
 if getattr(sys, 'frozen', False):
     # รันจากไฟล์ .exe ให้เอาตำแหน่งของไฟล์ exe
@@ -24,9 +37,9 @@ else:
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
 MODEL_FILE = os.path.join(SCRIPT_DIR, "face_landmarker.task")
+HAND_MODEL_FILE = os.path.join(SCRIPT_DIR, "hand_landmarker.task")
 REF_MAP_FILE = os.path.join(SCRIPT_DIR, "face_mesh.png")
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/face_landmarker/face_landmarker/float16/1/face_landmarker.task"
-REF_MAP_URL = "https://raw.githubusercontent.com/google-ai-edge/mediapipe/master/mediapipe/modules/face_geometry/data/canonical_face_model_uv_visualization.png"
+REPLAY_CANVAS = (640, 480)  # preview size for landmark replays, which have no image
 
 # --- Theme Colors ---
 ACCENT = "#3B8ED0"
@@ -41,12 +54,6 @@ TEXT_DIM = "#888888"
 # We'll load these from MediaPipe's canonical mesh at runtime
 CANONICAL_FACE_MESH = None
 
-# MediaPipe landmark indices for iris tracking
-# Right eye (from viewer's perspective, mirrored in camera)
-EYE_R = {"iris": 468, "inner": 133, "outer": 33, "top": 159, "bottom": 145}
-# Left eye
-EYE_L = {"iris": 473, "inner": 362, "outer": 263, "top": 386, "bottom": 374}
-
 def get_canonical_mesh():
     """Get canonical face mesh coordinates from MediaPipe for the point picker."""
     global CANONICAL_FACE_MESH
@@ -183,24 +190,8 @@ def generate_canonical_positions():
     return positions
 
 
-def calculate_distance(p1, p2):
-    return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2 + (p1.z - p2.z)**2)
-
-def normalize_value(val, radius_min, radius_max, out_min, out_max):
-    if radius_max <= radius_min:
-        return out_min
-    if val <= radius_min:
-        return out_min
-    elif val >= radius_max:
-        return out_max
-    normalized = (val - radius_min) / (radius_max - radius_min)
-    return out_min + (out_max - out_min) * normalized
-
 def download_model():
-    if not os.path.exists(MODEL_FILE):
-        print(f"Downloading MediaPipe Face Landmarker Model to {MODEL_FILE}...")
-        urllib.request.urlretrieve(MODEL_URL, MODEL_FILE)
-        print("Download complete.")
+    ensure_asset(MODEL_FILE, MODEL_URL)
 
 
 from PIL import Image, ImageTk
@@ -222,12 +213,26 @@ class PointPickerWindow:
         self.hover_id = None
         self.point_radius = 4
         
+        # A copy of the preview's last frame and, from the tracker's shared
+        # ring, the landmarks of exactly that frame (the ring checks itself).
+        # With "shared_ring" off the frame's own landmarks are used.
         self.source_image = None
-        if self.parent.latest_image is not None and self.parent.latest_landmarks is not None:
-            self.source_image = self.parent.latest_image.copy()
-            self.landmarks = self.parent.latest_landmarks
-        else:
-            self.landmarks = None
+        self.landmarks = None
+        ring = self.parent.tracker.ring
+        image = pts = ring_frame = None
+        with self.parent.preview_lock:
+            if self.parent.latest_preview is not None:
+                frame, image = self.parent.latest_preview
+                ring_frame, pts = frame.ring_frame, frame.pts
+                if pts is not None:
+                    image = image.copy()  # the preview lets go of its buffer later
+        if ring is not None and ring_frame is not None:
+            record = ring.read(ring_frame)
+            if record is not None and record["present"]:
+                pts = record["pts"]
+        if pts is not None:
+            self.source_image = image
+            self.landmarks = pts
 
         self.canvas_image = None
         self.photo_image = None
@@ -303,7 +308,7 @@ class PointPickerWindow:
         )
 
     def update_canvas(self):
-        if self.source_image is None or not self.landmarks:
+        if self.source_image is None or self.landmarks is None:
             return
 
         w = self.canvas.winfo_width()
@@ -342,10 +347,10 @@ class PointPickerWindow:
 
         self._screen_points = {}
 
-        for idx, lm in enumerate(self.landmarks):
+        for idx, (x, y) in enumerate(self.landmarks[:, :2].tolist()):
             # Calculate screen coordinates based on scaled image
-            sx = int(self.offset_x + (lm.x * self.draw_w))
-            sy = int(self.offset_y + (lm.y * self.draw_h))
+            sx = int(self.offset_x + (x * self.draw_w))
+            sy = int(self.offset_y + (y * self.draw_h))
             self._screen_points[idx] = (sx, sy)
 
             if idx == self.selected_id:
@@ -417,41 +422,37 @@ class FaceTrackerApp:
 
         self.config = self.load_config()
         if not self.config:
-            self.config = {
-                "blender_ip": "127.0.0.1",
-                "blender_port": 5000,
-                "camera_index": 0,
-                "draw_mesh": True,
-                "groups": {}
-            }
+            self.config = default_config()
 
         self.running = True
         self.camera_visible = False
-        self.target_address = (self.config.get("blender_ip", "127.0.0.1"), self.config.get("blender_port", 5000))
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.settimeout(2.0)
 
-        self.groups_data = self.config.get("groups", {})
+        self.groups_data = self.config.setdefault("groups", {})
         self.current_group = tk.StringVar()
         self._last_selected_group = ""
 
         self.current_x_raw = 0.0
         self.current_y_raw = 0.0
         
-        # Live state for picker
-        self.latest_image = None
-        self.latest_landmarks = None
-
-        # Lerp state
-        self.lerp_values = {}  # {group_name: {"x": float, "y": float}}
-        
-        # Iris EMA smoothing state: {"R": {"x": float, "y": float}, "L": {...}}
-        # Separate from per-group lerp — this runs at capture-frame rate on raw iris position.
-        self._iris_ema = {"R": {"x": 0.0, "y": 0.0}, "L": {"x": 0.0, "y": 0.0}}
+        # Live state for the picker: the frame last previewed and the RGB image
+        # shown for it. The preview keeps a hold on that frame (its pooled RGB
+        # buffer is not reused meanwhile) and swaps it under preview_lock
+        self.latest_preview = None
+        self.preview_lock = threading.Lock()
+
+        # Shared capture/inference/mapping/output pipeline. The mapping engine
+        # is recompiled on the tracker thread after any edit to groups_data.
+        self.tracker = Tracker(self.config, MODEL_FILE, HAND_MODEL_FILE)
+        self.mapping = self.tracker.mapping
+        self.overlay = MeshOverlay({"mesh": ((0, 255, 0), 1), "active": ((0, 0, 255), 4)},
+                                   reduced=self.config.get("reduced_mesh", False))
+        self.preview_throttle = PreviewThrottle(self.config.get("preview_max_hz", 15))
 
         self.build_ui()
 
         download_model()
+        if self.tracker.hands_active:
+            ensure_asset(HAND_MODEL_FILE, HAND_MODEL_URL)
 
         self.tracker_thread = threading.Thread(target=self.run_tracker_loop, daemon=True)
         self.tracker_thread.start()
@@ -459,20 +460,13 @@ class FaceTrackerApp:
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def load_config(self):
-        if not os.path.exists(CONFIG_FILE):
-            return None
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return load_config(CONFIG_FILE)
 
     def save_config(self):
         self.save_current_group_ui()
         self.config["groups"] = self.groups_data
         try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.config, f, indent=4)
+            save_config(CONFIG_FILE, self.config)
             self.show_toast("✓ Settings saved!")
         except Exception as e:
             self.show_toast(f"✗ Save failed: {e}", error=True)
@@ -489,8 +483,7 @@ class FaceTrackerApp:
         )
         if path:
             try:
-                with open(path, "w") as f:
-                    json.dump(self.config, f, indent=4)
+                save_config(path, self.config)
                 self.show_toast(f"✓ Exported to {os.path.basename(path)}")
             except Exception as e:
                 self.show_toast(f"✗ Export failed: {e}", error=True)
@@ -508,6 +501,7 @@ class FaceTrackerApp:
                     data = json.load(f)
                 self.config = data
                 self.groups_data = data.get("groups", {})
+                self.mapping.update(self.groups_data)
                 all_groups = list(self.groups_data.keys())
                 self.group_combo.configure(values=all_groups if all_groups else [""])
                 if all_groups:
@@ -543,7 +537,12 @@ class FaceTrackerApp:
         ).pack(side="left", padx=16)
 
         self.show_cam_var = ctk.BooleanVar(value=True)
+        self.reduced_mesh_var = ctk.BooleanVar(value=self.config.get("reduced_mesh", False))
+        self.reduced_mesh_var.trace_add(
+            "write", lambda *args: setattr(self.overlay, "reduced", self.reduced_mesh_var.get()))
         self.enable_send_var = ctk.BooleanVar(value=True)
+        self.enable_send_var.trace_add(
+            "write", lambda *args: setattr(self.tracker, "send_enabled", self.enable_send_var.get()))
         self.lerp_enabled_var = ctk.BooleanVar(value=False)
         self.lerp_factor_var = tk.DoubleVar(value=0.15)
 
@@ -567,6 +566,8 @@ class FaceTrackerApp:
                          font=ctk.CTkFont(size=13)).pack(side="left", padx=(0, 14))
         ctk.CTkCheckBox(chk_row, text="Enable Send", variable=self.enable_send_var,
                          font=ctk.CTkFont(size=13)).pack(side="left", padx=(0, 14))
+        ctk.CTkCheckBox(chk_row, text="Reduced Mesh", variable=self.reduced_mesh_var,
+                         font=ctk.CTkFont(size=13)).pack(side="left", padx=(0, 14))
 
         # Buttons row
         btn_row = ctk.CTkFrame(ctrl_inner, fg_color="transparent")
@@ -664,14 +665,22 @@ class FaceTrackerApp:
             if m == "iris":
                 # Hide manual point entries — preset fills them automatically
                 pts_row.pack_forget()
+                blend_row.pack_forget()
                 iris_row.pack(fill="x", pady=4)
+            elif m == "blendshape":
+                # Reads one of FaceLandmarker's 52 scores, no points needed
+                pts_row.pack_forget()
+                iris_row.pack_forget()
+                blend_row.pack(fill="x", pady=2)
             elif m == "1pt":
                 iris_row.pack_forget()
+                blend_row.pack_forget()
                 pts_row.pack(fill="x", pady=2)
                 pt_a_label.configure(text="Target Pt")
                 pt_b_label.configure(text="Origin Pt")
             else:
                 iris_row.pack_forget()
+                blend_row.pack_forget()
                 pts_row.pack(fill="x", pady=2)
                 pt_a_label.configure(text="Point A")
                 pt_b_label.configure(text="Point B")
@@ -680,8 +689,8 @@ class FaceTrackerApp:
                 
         mode_var.trace_add("write", trace_mode_var)
         
-        ctk.CTkSegmentedButton(mode_row, values=["2pt", "1pt", "iris"],
-                               variable=mode_var, width=180, height=28,
+        ctk.CTkSegmentedButton(mode_row, values=["2pt", "1pt", "iris", "blendshape"],
+                               variable=mode_var, width=280, height=28,
                                selected_color=ACCENT, selected_hover_color=ACCENT_HOVER).pack(side="left")
 
         inner = ctk.CTkFrame(frame, fg_color="transparent")
@@ -697,6 +706,18 @@ class FaceTrackerApp:
         pt_a, pt_a_label = self.create_entry_field(pts_row, "Point A", side="left", width=70, return_label=True)
         pt_b, pt_b_label = self.create_entry_field(pts_row, "Point B", side="left", width=70, return_label=True)
 
+        # Blendshape mode controls (hidden by default)
+        blend_row = ctk.CTkFrame(inner, fg_color="transparent")
+        ctk.CTkLabel(blend_row, text="Blendshape", font=ctk.CTkFont(size=11),
+                     text_color=TEXT_DIM).pack(side="left", padx=(0, 6))
+        blend_var = tk.StringVar(value="jawOpen")
+        def trace_blend(*args):
+            if not getattr(self, '_populating', False):
+                self.save_current_group_ui()
+        blend_var.trace_add("write", trace_blend)
+        ctk.CTkOptionMenu(blend_row, values=list(BLENDSHAPE_NAMES[1:]), variable=blend_var,
+                          width=180, height=28).pack(side="left")
+
         # Iris mode controls (hidden by default)
         iris_row = ctk.CTkFrame(inner, fg_color="transparent")
         # iris_row starts hidden; trace_mode_var shows it when mode=="iris"
@@ -823,6 +844,7 @@ class FaceTrackerApp:
         data = {
             "mode": mode_var,
             "pt_a": pt_a, "pt_b": pt_b,
+            "blendshape": blend_var,
             "exp_power": exp_power_var,
             "rad_min": rad_min, "rad_max": rad_max,
             "out_min": out_min, "out_max": out_max,
@@ -875,12 +897,8 @@ class FaceTrackerApp:
 
     def fetch_groups(self):
         try:
-            req = json.dumps({"type": "GET_GROUPS"})
-            self.sock.sendto(req.encode('utf-8'), self.target_address)
-            data, addr = self.sock.recvfrom(2048)
-            resp = json.loads(data.decode('utf-8'))
-            if resp.get("type") == "GROUPS":
-                groups = resp.get("groups", [])
+            groups = self.tracker.output.request_groups()
+            if groups is not None:
                 self.merge_groups(groups)
                 self.show_toast(f"✓ Fetched {len(groups)} groups")
         except socket.timeout:
@@ -898,6 +916,7 @@ class FaceTrackerApp:
         for g in groups_list:
             if g not in self.groups_data:
                 self.groups_data[g] = {}
+        self.mapping.invalidate()
 
         all_groups = list(self.groups_data.keys())
         self.group_combo.configure(values=all_groups if all_groups else [""])
@@ -934,6 +953,8 @@ class FaceTrackerApp:
             axis_data = self.groups_data[group][axis]
 
             axis_data["mode"] = widgets["mode"].get()
+            if axis_data["mode"] == "blendshape":
+                axis_data["blendshape"] = widgets["blendshape"].get()
 
             a_val = safe_int(widgets["pt_a"].get())
             b_val = safe_int(widgets["pt_b"].get())
@@ -960,6 +981,8 @@ class FaceTrackerApp:
             axis_data["lerp_en"] = widgets["lerp_var"].get()
             axis_data["lerp_fac"] = widgets["lerp_fac"].get()
 
+        self.mapping.invalidate()
+
     def on_group_selected(self, choice):
         # Save the PREVIOUS group before switching
         if self._last_selected_group:
@@ -985,12 +1008,11 @@ class FaceTrackerApp:
 
                 axis_data = data.get(axis) or {}
                 # Graceful fallback: old "box" mode → "2pt"
-                saved_mode = str(axis_data.get("mode", "2pt"))
-                if saved_mode == "box":
-                    saved_mode = "2pt"
-                widgets["mode"].set(saved_mode)
+                # Accept other front ends' spellings ("2pt (Dist)", "box", ...)
+                widgets["mode"].set(canonical_mode(axis_data.get("mode", "2pt")))
                 widgets["pt_a"].set(str(axis_data.get("point_a", "")) if axis_data.get("point_a") is not None else "")
                 widgets["pt_b"].set(str(axis_data.get("point_b", "")) if axis_data.get("point_b") is not None else "")
+                widgets["blendshape"].set(axis_data.get("blendshape", "jawOpen"))
                 widgets["exp_power"].set(float(axis_data.get("exp_power", 1.2)))
                 widgets["rad_min"].set(str(axis_data.get("radius_min", axis_data.get("min", "0.0"))))
                 widgets["rad_max"].set(str(axis_data.get("radius_max", axis_data.get("max", "1.0"))))
@@ -1016,6 +1038,7 @@ class FaceTrackerApp:
                 widgets["exp_power"].set(1.2)
                 widgets["lerp_var"].set(False)
                 widgets["lerp_fac"].set(0.15)
+                widgets["blendshape"].set("jawOpen")
                 widgets["out_label"].configure(text="0.000")
                 widgets["raw_label"].configure(text="raw: 0.000")
                 widgets["bar"].set(0)
@@ -1030,6 +1053,7 @@ class FaceTrackerApp:
             if name not in self.groups_data:
                 self.save_current_group_ui()
                 self.groups_data[name] = {}
+                self.mapping.invalidate()
                 all_groups = list(self.groups_data.keys())
                 self.group_combo.configure(values=all_groups)
                 self.group_combo.set(name)
@@ -1051,6 +1075,7 @@ class FaceTrackerApp:
 
             def do_delete():
                 del self.groups_data[grp]
+                self.mapping.invalidate()
                 all_groups = list(self.groups_data.keys())
                 self.group_combo.configure(values=all_groups if all_groups else [""])
                 if all_groups:
@@ -1070,10 +1095,7 @@ class FaceTrackerApp:
         if not os.path.exists(REF_MAP_FILE):
             print("Downloading Reference Mesh Map...")
             try:
-                import urllib.request
-                req = urllib.request.Request(REF_MAP_URL, headers={'User-Agent': 'Mozilla/5.0'})
-                with open(REF_MAP_FILE, 'wb') as f:
-                    f.write(urllib.request.urlopen(req).read())
+                ensure_asset(REF_MAP_FILE, REF_MAP_URL, user_agent='Mozilla/5.0')
             except Exception as e:
                 self.show_toast(f"✗ Failed to download map: {e}", error=True)
                 return
@@ -1088,306 +1110,108 @@ class FaceTrackerApp:
             self.show_toast(f"✗ Failed to open map: {e}", error=True)
 
     def run_tracker_loop(self):
-        base_options = python.BaseOptions(model_asset_path=MODEL_FILE)
-        options = vision.FaceLandmarkerOptions(
-            base_options=base_options,
-            running_mode=vision.RunningMode.VIDEO,
-            num_faces=1,
-            min_face_detection_confidence=0.5,
-            min_face_presence_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        landmarker = vision.FaceLandmarker.create_from_options(options)
-
-        cap = cv2.VideoCapture(self.config.get("camera_index", 0))
-        if not cap.isOpened():
+        tracker = self.tracker
+        if not tracker.start():
             print("Error: Could not open camera.")
             return
 
         window_name = 'ShapeKey Face Tracker - Preview'
         window_created = False
 
-        while self.running and cap.isOpened():
-            success, image = cap.read()
-            if not success:
-                time.sleep(0.01)
-                continue
+        # Capture / inference / output may run on their own threads; this
+        # thread is the preview stage and only sees frames that were sent
+        pipeline = create_pipeline(tracker, self.config)
+        pipeline.start()
 
-            image = cv2.flip(image, 1)
-            rgb_frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        metrics = tracker.metrics
+        last_log_t = time.time()
+        preview_bgr = blank_rgb = None
+        try:
+            while self.running and tracker.source.is_opened() and pipeline.alive:
+                frame = pipeline.next_frame()
+                if frame is None:
+                    continue
+                # Pause the preview while its window is minimized or behind
+                # another application (WND_PROP_VISIBLE stays 1 for both, so
+                # it only tells a closed or hidden window where the OS can't)
+                if window_created:
+                    try:
+                        visible = cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE)
+                    except cv2.error:
+                        visible = -1
+                    if visible < 0:  # closed by the user; imshow opens it again
+                        window_created = False
+                    hidden = window_hidden(window_name) if visible > 0 else None
+                    self.preview_throttle.paused = visible == 0 if hidden is None else hidden
+                # Frames were already sent; only redraw at preview_max_hz
+                if not self.preview_throttle.ready():
+                    frame.release()
+                    if window_created:
+                        cv2.waitKey(1)
+                    continue
 
-            timestamp_ms = int(time.time() * 1000)
-            results = landmarker.detect_for_video(mp_image, timestamp_ms)
-            
-            # Store latest for point picker
-            self.latest_image = rgb_frame.copy()
-
-            payload = {}
-            if results.face_landmarks and len(results.face_landmarks) > 0:
-                face_landmarks = results.face_landmarks[0]
-                self.latest_landmarks = face_landmarks
-                pt_left = face_landmarks[234]
-                pt_left = face_landmarks[234]
-                pt_right = face_landmarks[454]
-                face_width = calculate_distance(pt_left, pt_right)
-                if face_width <= 0: face_width = 1.0
-                
-                # Pre-calculate Face Local Axes for 1-point tracking projection
-                # Face X Axis (Right ear to Left ear)
-                fx_vec = (pt_right.x - pt_left.x, pt_right.y - pt_left.y, pt_right.z - pt_left.z)
-                fx_len_sq = fx_vec[0]**2 + fx_vec[1]**2 + fx_vec[2]**2
-                if fx_len_sq <= 0: fx_len_sq = 1.0
-                
-                # Face Y Axis (Chin to Forehead)
-                pt_top = face_landmarks[10]
-                pt_bottom = face_landmarks[152]
-                fy_vec = (pt_bottom.x - pt_top.x, pt_bottom.y - pt_top.y, pt_bottom.z - pt_top.z)
-                fy_len_sq = fy_vec[0]**2 + fy_vec[1]**2 + fy_vec[2]**2
-                if fy_len_sq <= 0: fy_len_sq = 1.0
-
-                draw_points_set = set()
-
-                snapshot = dict(self.groups_data)
-
-                for group_name, mappings in snapshot.items():
-                    group_data = {}
-                    if mappings.get("x") and mappings["x"].get("point_a") is not None and mappings["x"].get("point_b") is not None:
-                        x_map = mappings["x"]
-                        try:
-                            mode = x_map.get("mode", "2pt")
-
-                            if mode == "iris":
-                                # Iris Local Projection Mode — X axis
-                                pt_b_idx = int(x_map["point_b"])
-                                eye = EYE_L if pt_b_idx == EYE_L["outer"] else EYE_R
-                                eye_key = "L" if pt_b_idx == EYE_L["outer"] else "R"
-                                p_iris  = face_landmarks[eye["iris"]]
-                                p_inner = face_landmarks[eye["inner"]]
-                                p_outer = face_landmarks[eye["outer"]]
-                                p_top   = face_landmarks[eye["top"]]
-                                p_bot   = face_landmarks[eye["bottom"]]
-                                # Eye-local X axis vector (outer → inner)
-                                ex = (p_inner.x - p_outer.x,
-                                      p_inner.y - p_outer.y,
-                                      p_inner.z - p_outer.z)
-                                ex_len = math.sqrt(ex[0]**2 + ex[1]**2 + ex[2]**2)
-                                if ex_len <= 0: ex_len = 1.0
-                                eye_width = ex_len
-                                # --- Blink guard: skip this frame if eye mostly closed ---
-                                eye_h = abs(p_top.y - p_bot.y)
-                                if eye_h < 0.25 * eye_width:
-                                    # Eye is closing/blinking — reuse last smoothed value
-                                    raw_val = self._iris_ema[eye_key]["x"]
-                                else:
-                                    # Eye center (3D midpoints)
-                                    cx = (p_inner.x + p_outer.x) / 2.0
-                                    cy = (p_top.y   + p_bot.y)   / 2.0
-                                    # Project iris offset onto eye-local X axis
-                                    delta = (p_iris.x - cx, p_iris.y - cy,
-                                             p_iris.z - (p_inner.z + p_outer.z) / 2.0)
-                                    dot = delta[0]*ex[0] + delta[1]*ex[1] + delta[2]*ex[2]
-                                    inst = dot / (ex_len * eye_width)
-                                    # EMA smoothing (α=0.30 — fast enough, kills jitter)
-                                    ema = self._iris_ema[eye_key]
-                                    ema["x"] += 0.30 * (inst - ema["x"])
-                                    raw_val = ema["x"]
-                                # Exponential sensitivity curve (preserves sign)
-                                exp_p = float(x_map.get("exp_power", 1.2))
-                                raw_val = math.copysign(abs(raw_val) ** exp_p, raw_val)
-                                draw_points_set.update([eye["iris"], eye["inner"], eye["outer"], eye["top"], eye["bottom"]])
-                            else:
-                                pA = face_landmarks[int(x_map["point_a"])]
-                                pB = face_landmarks[int(x_map["point_b"])]
-                                if mode == "1pt":
-                                    # 3D Vector from Origin (B) to Target (A)
-                                    target_vec = (pA.x - pB.x, pA.y - pB.y, pA.z - pB.z)
-                                    dot_x = (target_vec[0] * fx_vec[0]) + (target_vec[1] * fx_vec[1]) + (target_vec[2] * fx_vec[2])
-                                    proj_x = dot_x / math.sqrt(fx_len_sq) / face_width
-                                    raw_val = proj_x * 10.0
-                                else:
-                                    dist = calculate_distance(pA, pB)
-                                    norm_dist = dist / face_width
-                                    raw_val = norm_dist
-                                draw_points_set.add(int(x_map["point_a"]))
-                                draw_points_set.add(int(x_map["point_b"]))
-
-                            if group_name == self.current_group.get():
-                                self.current_x_raw = raw_val
-
-                            sens = float(x_map.get("sens", 1.0))
-                            
-                            if mode in ("1pt", "iris"):
-                                rad_min = float(x_map.get("radius_min", x_map.get("min", 0.0)))
-                                rad_max = float(x_map.get("radius_max", x_map.get("max", 1.0)))
-                                out_min = float(x_map.get("out_min", 0.0))
-                                out_max = float(x_map.get("out_max", 1.0))
-                                abs_dist = abs(raw_val)
-                                if abs_dist <= rad_min or rad_max <= rad_min:
-                                    mapped_mag = out_min
-                                elif abs_dist >= rad_max:
-                                    mapped_mag = out_max
-                                else:
-                                    normalized = (abs_dist - rad_min) / (rad_max - rad_min)
-                                    mapped_mag = out_min + (out_max - out_min) * normalized
-                                val = mapped_mag * sens * (1.0 if raw_val >= 0 else -1.0)
-                            else:
-                                val = normalize_value(
-                                    raw_val,
-                                    float(x_map.get("radius_min", x_map.get("min", 0.0))),
-                                    float(x_map.get("radius_max", x_map.get("max", 1.0))),
-                                    float(x_map.get("out_min", 0.0)),
-                                    float(x_map.get("out_max", 1.0))
-                                ) * sens
-                                
-                            group_data["x"] = max(-1.0, min(1.0, val))
-                        except (IndexError, ValueError, TypeError): pass
-
-                    if mappings.get("y") and mappings["y"].get("point_a") is not None and mappings["y"].get("point_b") is not None:
-                        y_map = mappings["y"]
-                        try:
-                            mode = y_map.get("mode", "2pt")
-
-                            if mode == "iris":
-                                # Iris Local Projection Mode — Y axis
-                                pt_b_idx = int(y_map["point_b"])
-                                eye = EYE_L if pt_b_idx == EYE_L["outer"] else EYE_R
-                                eye_key = "L" if pt_b_idx == EYE_L["outer"] else "R"
-                                p_iris  = face_landmarks[eye["iris"]]
-                                p_inner = face_landmarks[eye["inner"]]
-                                p_outer = face_landmarks[eye["outer"]]
-                                p_top   = face_landmarks[eye["top"]]
-                                p_bot   = face_landmarks[eye["bottom"]]
-                                # Eye width for scale-invariant normalization
-                                ex = (p_inner.x - p_outer.x,
-                                      p_inner.y - p_outer.y,
-                                      p_inner.z - p_outer.z)
-                                eye_width = math.sqrt(ex[0]**2 + ex[1]**2 + ex[2]**2)
-                                if eye_width <= 0: eye_width = 1.0
-                                # --- Blink guard ---
-                                eye_h = abs(p_top.y - p_bot.y)
-                                if eye_h < 0.25 * eye_width:
-                                    raw_val = self._iris_ema[eye_key]["y"]
-                                else:
-                                    cy = (p_top.y + p_bot.y) / 2.0
-                                    inst = (p_iris.y - cy) / eye_width
-                                    # EMA smoothing
-                                    ema = self._iris_ema[eye_key]
-                                    ema["y"] += 0.30 * (inst - ema["y"])
-                                    raw_val = ema["y"]
-                                # Exponential sensitivity
-                                exp_p = float(y_map.get("exp_power", 1.2))
-                                raw_val = math.copysign(abs(raw_val) ** exp_p, raw_val)
-                                draw_points_set.update([eye["iris"], eye["inner"], eye["outer"], eye["top"], eye["bottom"]])
-                            else:
-                                pA = face_landmarks[int(y_map["point_a"])]
-                                pB = face_landmarks[int(y_map["point_b"])]
-                                if mode == "1pt":
-                                    target_vec = (pA.x - pB.x, pA.y - pB.y, pA.z - pB.z)
-                                    dot_y = (target_vec[0] * fy_vec[0]) + (target_vec[1] * fy_vec[1]) + (target_vec[2] * fy_vec[2])
-                                    proj_y = dot_y / math.sqrt(fy_len_sq) / face_width
-                                    raw_val = proj_y * 10.0
-                                else:
-                                    dist = calculate_distance(pA, pB)
-                                    norm_dist = dist / face_width
-                                    raw_val = norm_dist
-                                draw_points_set.add(int(y_map["point_a"]))
-                                draw_points_set.add(int(y_map["point_b"]))
-
-                            if group_name == self.current_group.get():
-                                self.current_y_raw = raw_val
-
-                            sens = float(y_map.get("sens", 1.0))
-                            
-                            if mode in ("1pt", "iris"):
-                                rad_min = float(y_map.get("radius_min", y_map.get("min", 0.0)))
-                                rad_max = float(y_map.get("radius_max", y_map.get("max", 1.0)))
-                                out_min = float(y_map.get("out_min", 0.0))
-                                out_max = float(y_map.get("out_max", 1.0))
-                                abs_dist = abs(raw_val)
-                                if abs_dist <= rad_min or rad_max <= rad_min:
-                                    mapped_mag = out_min
-                                elif abs_dist >= rad_max:
-                                    mapped_mag = out_max
-                                else:
-                                    normalized = (abs_dist - rad_min) / (rad_max - rad_min)
-                                    mapped_mag = out_min + (out_max - out_min) * normalized
-                                val = mapped_mag * sens * (1.0 if raw_val >= 0 else -1.0)
-                            else:
-                                val = normalize_value(
-                                    raw_val,
-                                    float(y_map.get("radius_min", y_map.get("min", 0.0))),
-                                    float(y_map.get("radius_max", y_map.get("max", 1.0))),
-                                    float(y_map.get("out_min", 0.0)),
-                                    float(y_map.get("out_max", 1.0))
-                                ) * sens
-                                
-                            group_data["y"] = max(-1.0, min(1.0, val))
-                        except (IndexError, ValueError, TypeError): pass
-
-                    if group_data:
-                        if "x" not in group_data: group_data["x"] = 0.0
-                        if "y" not in group_data: group_data["y"] = 0.0
-
-                        # Apply per-axis lerp smoothing
-                        if group_name not in self.lerp_values:
-                            self.lerp_values[group_name] = {"x": 0.0, "y": 0.0}
-                        lv = self.lerp_values[group_name]
-                        
-                        # X axis lerp
-                        x_map = mappings.get("x", {})
-                        if x_map.get("lerp_en", False):
-                            factor = float(x_map.get("lerp_fac", 0.15))
-                            lv["x"] += (group_data["x"] - lv["x"]) * factor
-                            group_data["x"] = lv["x"]
-                        else:
-                            lv["x"] = group_data["x"]  # Keep state updated
-                            
-                        # Y axis lerp
-                        y_map = mappings.get("y", {})
-                        if y_map.get("lerp_en", False):
-                            factor = float(y_map.get("lerp_fac", 0.15))
-                            lv["y"] += (group_data["y"] - lv["y"]) * factor
-                            group_data["y"] = lv["y"]
-                        else:
-                            lv["y"] = group_data["y"]  # Keep state updated
-
-                        payload[group_name] = group_data
-
-                        if group_name == self.current_group.get():
-                            xr = self.current_x_raw
-                            yr = self.current_y_raw
-                            self.root.after(0, lambda x=group_data["x"], y=group_data["y"], xr=xr, yr=yr: self.update_output_labels(x, y, xr, yr))
-
-                if self.config.get("draw_mesh", True):
-                    h, w, _ = image.shape
-                    if not self.show_cam_var.get():
-                        image = np.zeros((h, w, 3), dtype=np.uint8)
-                    for i, lm in enumerate(face_landmarks):
-                        x_px = int(lm.x * w)
-                        y_px = int(lm.y * h)
-                        if i in draw_points_set:
-                            cv2.circle(image, (x_px, y_px), 4, (0, 0, 255), -1)
-                        else:
-                            cv2.circle(image, (x_px, y_px), 1, (0, 255, 0), -1)
-
-            # Only send if enabled
-            if payload and self.enable_send_var.get():
-                try:
-                    self.sock.sendto(json.dumps(payload).encode('utf-8'), self.target_address)
-                except Exception:
-                    pass
-
-            if not window_created:
-                cv2.namedWindow(window_name)
-                window_created = True
-            cv2.imshow(window_name, image)
-            cv2.waitKey(5)
-
-        cap.release()
-        if window_created:
-            cv2.destroyWindow(window_name)
-        landmarker.close()
+                t0 = time.perf_counter()
+                # The picker may copy the shared RGB frame, so it stays held
+                # until the next preview; the preview converts it into its
+                # own BGR buffer to draw on
+                rgb = frame.display_rgb()
+                if rgb is None:
+                    # Landmark replays carry no image: draw on a black canvas
+                    if blank_rgb is None:
+                        blank_rgb = np.zeros((REPLAY_CANVAS[1], REPLAY_CANVAS[0], 3), dtype=np.uint8)
+                    rgb = blank_rgb
+                with self.preview_lock:
+                    previous, self.latest_preview = self.latest_preview, (frame, rgb)
+                if previous is not None:
+                    previous[0].release()
+                preview_bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=preview_bgr)
+                image = preview_bgr
+
+                if frame.pts is not None:  # live and replayed frames alike
+                    out, raw = frame.out, frame.raw
+
+                    g = self.mapping.index_of(self.current_group.get())
+                    if g >= 0:
+                        self.current_x_raw, self.current_y_raw = raw[g].tolist()
+                        if self.mapping.group_active[g]:
+                            x, y = out[g].tolist()
+                            xr, yr = self.current_x_raw, self.current_y_raw
+                            self.root.after(0, lambda x=x, y=y, xr=xr, yr=yr: self.update_output_labels(x, y, xr, yr))
+
+                    if self.config.get("draw_mesh", True):
+                        h, w, _ = image.shape
+                        if not self.show_cam_var.get():
+                            image = np.zeros((h, w, 3), dtype=np.uint8)
+                        self.overlay.draw(image, frame.pts, {"active": self.mapping.draw_points})
+                        for face in frame.faces or ():
+                            if face.track_id:  # other performers: mesh only
+                                self.overlay.draw(image, face.pts, {})
+
+                t1 = time.perf_counter()
+                metrics.add("draw", t1 - t0)
+                if not window_created:
+                    cv2.namedWindow(window_name)
+                    window_created = True
+                cv2.imshow(window_name, image)
+                cv2.waitKey(5)
+                metrics.add("preview", time.perf_counter() - t1)
+
+                if time.time() - last_log_t >= 30.0:
+                    last_log_t = time.time()
+                    status = tracker.status(pipeline)
+                    print(f"[stats] fps={status['fps']} {metrics.summary()}")
+        finally:
+            pipeline.stop()
+            with self.preview_lock:
+                previous, self.latest_preview = self.latest_preview, None
+            if previous is not None:
+                previous[0].release()
+            tracker.close()
+            if window_created:
+                cv2.destroyWindow(window_name)
+        if not pipeline.alive and self.running:
+            print(f"Error: tracking stopped: {pipeline.failed!r}")
+            self.root.after(0, lambda: self.show_toast("✗ Tracking stopped after an error, see console", error=True))
 
     def update_output_labels(self, x, y, x_raw=0, y_raw=0):
         if hasattr(self, 'x_widgets'):
@@ -1404,11 +1228,10 @@ class FaceTrackerApp:
         self.save_current_group_ui()
         self.config["groups"] = self.groups_data
         try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.config, f, indent=4)
+            save_config(CONFIG_FILE, self.config)
         except:
             pass
-        self.sock.close()
+        self.tracker.output.close()
         self.root.destroy()
 
 
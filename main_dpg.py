@@ -1,19 +1,30 @@
+import sys
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # frozen EXE: multi-camera workers start here
+
+if __name__ == "__main__" and "--headless" in sys.argv:
+    # Service mode: run the shared pipeline before any GUI toolkit is imported.
+    # Run as the package's __main__ so spawned camera workers don't re-import this script
+    import runpy
+    runpy.run_module("tracker_core", run_name="__main__", alter_sys=True)
+
 import dearpygui.dearpygui as dpg
 import cv2
-import mediapipe as mp
 import numpy as np
 import threading
 import time
 import json
 import os
-import socket
-import math
-import urllib.request
 import logging
-import sys
 import shutil
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+
+from tracker_core import (
+    BLENDSHAPE_NAMES, EYE_L, EYE_R, HAND_MODEL_URL, MODEL_URL, REF_MAP_URL, MeshOverlay, PreviewThrottle, Tracker,
+    canonical_mode, create_pipeline, default_config, ensure_asset, load_config, nearest_point, save_config,
+    window_hidden,
+)
 
 # --- Resource Path Handling ---
 def get_resource_path(relative_path):
@@ -41,15 +52,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# URLs (Fallbacks)
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/face_landmarker/face_landmarker/float16/1/face_landmarker.task"
-HAND_MODEL_URL = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
-REF_MAP_URL = "https://raw.githubusercontent.com/google-ai-edge/mediapipe/master/mediapipe/modules/face_geometry/data/canonical_face_model_uv_visualization.png"
-# MediaPipe landmark indices for iris tracking
+VIEWPORT_TITLE = "ShapeKey Face Tracker (DPG High-Performance)"
 
-# MediaPipe landmark indices for iris tracking
-EYE_R = {"iris": 468, "inner": 133, "outer": 33, "top": 159, "bottom": 145}
-EYE_L = {"iris": 473, "inner": 362, "outer": 263, "top": 386, "bottom": 374}
+# Radio button labels for the shared mode names
+MODE_LABELS = {"None": "None", "2pt": "2pt (Dist)", "1pt": "1pt (Proj)", "iris": "iris",
+               "blendshape": "blendshape"}
 
 # --- Default Presets (Embedded) ---
 DEFAULT_PRESETS = {
@@ -67,26 +74,14 @@ DEFAULT_PRESETS = {
     }
 }
 
-def calculate_distance(p1, p2):
-    return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2 + (p1.z - p2.z)**2)
-
-def normalize_value(val, radius_min, radius_max, out_min, out_max):
-    if radius_max <= radius_min: return out_min
-    if val <= radius_min: return out_min
-    elif val >= radius_max: return out_max
-    normalized = (val - radius_min) / (radius_max - radius_min)
-    return out_min + (out_max - out_min) * normalized
-
 class FaceTrackerAppDPG:
     def __init__(self):
         self.running = True
         self.camera_show = True # For Privacy
         self.camera_active = True # For Backend
-        self.send_enabled = True
         self.draw_mesh = True
         self.initialized = False
         
-        self.latest_landmarks = None
         self.active_points_x = set()
         self.active_points_y = set()
         self.hover_id = -1
@@ -95,16 +90,25 @@ class FaceTrackerAppDPG:
         
         # State Data
         self.config = self.load_config()
-        self.groups_data = self.config.get("groups", {})
+        self.groups_data = self.config.setdefault("groups", {})
         self.current_group_name = ""
-        self.lerp_values = {}
-        self._iris_ema = {"R": {"x": 0.0, "y": 0.0}, "L": {"x": 0.0, "y": 0.0}}
         self.current_vals = {"x": 0.0, "y": 0.0, "rx": 0.0, "ry": 0.0}
         
-        # Network
-        self.target_address = (self.config.get("blender_ip", "127.0.0.1"), self.config.get("blender_port", 5000))
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.settimeout(1.0)
+        # Shared capture/inference/mapping/output pipeline
+        self.tracker = Tracker(self.config, MODEL_FILE, HAND_MODEL_FILE)
+        self.tracker.output.sock.settimeout(1.0)
+        self.mapping = self.tracker.mapping
+        # Later roles draw on top: selected > hover > X+Y > X > Y > mesh.
+        # The preview is drawn in RGB, so these are (r, g, b)
+        self.overlay = MeshOverlay({
+            "mesh": ((100, 255, 0), 1),      # Green
+            "y": ((255, 150, 0), 2),         # Blue (Y)
+            "x": ((0, 100, 255), 2),         # Orange (X)
+            "both": ((255, 255, 255), 2),    # White (Both)
+            "hover": ((255, 255, 0), 4),     # Yellow
+            "selected": ((255, 0, 0), 3),    # Red
+        }, reduced=self.config.get("reduced_mesh", False))
+        self.preview_throttle = PreviewThrottle(self.config.get("preview_max_hz", 15))
         
         self._ensure_assets()
         
@@ -118,7 +122,7 @@ class FaceTrackerAppDPG:
         with dpg.handler_registry():
             dpg.add_mouse_click_handler(callback=self._handle_click)
         
-        dpg.create_viewport(title="ShapeKey Face Tracker (DPG High-Performance)", width=1400, height=900)
+        dpg.create_viewport(title=VIEWPORT_TITLE, width=1400, height=900)
         dpg.setup_dearpygui()
         dpg.show_viewport()
         
@@ -138,35 +142,22 @@ class FaceTrackerAppDPG:
                     shutil.copy2(bundled_path, local_path)
 
         # 2. If still missing, download (emergency fallback)
-        if not os.path.exists(MODEL_FILE):
-            logger.info("Face model missing and not bundled. Downloading...")
-            urllib.request.urlretrieve(MODEL_URL, MODEL_FILE)
-        if not os.path.exists(HAND_MODEL_FILE):
-            logger.info("Hand model missing and not bundled. Downloading...")
-            urllib.request.urlretrieve(HAND_MODEL_URL, HAND_MODEL_FILE)
-        if not os.path.exists(REF_MAP_FILE):
-            try:
-                logger.info("Mesh map missing and not bundled. Downloading...")
-                req = urllib.request.Request(REF_MAP_URL, headers={'User-Agent': 'Mozilla/5.0'})
-                with open(REF_MAP_FILE, 'wb') as f:
-                    f.write(urllib.request.urlopen(req).read())
-            except Exception as e:
-                logger.error(f"Failed to download mesh map: {e}")
+        ensure_asset(MODEL_FILE, MODEL_URL)
+        if self.tracker.hands_active:
+            ensure_asset(HAND_MODEL_FILE, HAND_MODEL_URL)
+        try:
+            ensure_asset(REF_MAP_FILE, REF_MAP_URL, user_agent='Mozilla/5.0')
+        except Exception as e:
+            logger.error(f"Failed to download mesh map: {e}")
 
     def load_config(self):
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r") as f:
-                    return json.load(f)
-            except: pass
-        return {"blender_ip": "127.0.0.1", "blender_port": 5000, "camera_index": 0, "groups": {}}
+        return load_config(CONFIG_FILE) or default_config()
 
     def save_config(self):
         self._sync_ui_to_data()
         self.config["groups"] = self.groups_data
         try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.config, f, indent=4)
+            save_config(CONFIG_FILE, self.config)
             self._show_toast("✓ All Settings Saved", (0, 255, 120))
         except Exception as e:
             self._show_toast(f"✗ Save Error: {e}", (255, 50, 50))
@@ -211,12 +202,8 @@ class FaceTrackerAppDPG:
 
     def fetch_groups(self):
         try:
-            req = json.dumps({"type": "GET_GROUPS"})
-            self.sock.sendto(req.encode('utf-8'), self.target_address)
-            data, addr = self.sock.recvfrom(2048)
-            resp = json.loads(data.decode('utf-8'))
-            if resp.get("type") == "GROUPS":
-                groups = resp.get("groups", [])
+            groups = self.tracker.output.request_groups()
+            if groups is not None:
                 self._merge_groups_data(groups)
                 self._show_toast(f"✓ Fetched {len(groups)} groups", (100, 255, 100))
         except Exception as e:
@@ -230,6 +217,7 @@ class FaceTrackerAppDPG:
         # Add new groups
         for g in blender_groups:
             if g not in self.groups_data: self.groups_data[g] = {"x": {}, "y": {}}
+        self.mapping.invalidate()
         
         items = list(self.groups_data.keys())
         dpg.configure_item("group_combo", items=items)
@@ -246,9 +234,30 @@ class FaceTrackerAppDPG:
         except: self._show_toast("✗ Could not open mesh map", (255, 100, 100))
 
     def setup_textures(self):
+        # Preview buffers are allocated once: the tracker's shared RGB frame
+        # is resized/drawn into an 8-bit RGB buffer and normalized into one
+        # of two float textures, which DPG reads in place. Swapping the two
+        # means the renderer never sees a half-written frame.
+        self.preview_rgb = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.tex_buffers = [np.zeros((480, 640, 3), dtype=np.float32) for _ in range(2)]
+        self.tex_back = 1
         with dpg.texture_registry(show=False):
-            dpg.add_raw_texture(640, 480, np.zeros((480, 640, 4), dtype=np.float32), 
-                               tag="camera_texture", format=dpg.mvFormat_Float_rgba)
+            dpg.add_raw_texture(640, 480, self.tex_buffers[0],
+                               tag="camera_texture", format=dpg.mvFormat_Float_rgb)
+
+    def preview_paused(self):
+        """True while the viewport is minimized or (on Windows) behind another application."""
+        hidden = window_hidden(VIEWPORT_TITLE)
+        if hidden is not None:
+            return hidden
+        return dpg.get_viewport_client_width() <= 0 or dpg.get_viewport_client_height() <= 0
+
+    def upload_preview(self):
+        """Normalize preview_rgb into the back texture buffer and show it."""
+        back = self.tex_buffers[self.tex_back]
+        np.multiply(self.preview_rgb, np.float32(1.0 / 255.0), out=back)
+        dpg.set_value("camera_texture", back)
+        self.tex_back ^= 1
 
     def setup_theme(self):
         with dpg.theme() as global_theme:
@@ -280,8 +289,9 @@ class FaceTrackerAppDPG:
                     
                     with dpg.group(horizontal=True):
                         dpg.add_checkbox(label="Show Camera", default_value=True, callback=lambda s,v: setattr(self, 'camera_show', v))
-                        dpg.add_checkbox(label="Send UDP", default_value=True, callback=lambda s,v: setattr(self, 'send_enabled', v))
+                        dpg.add_checkbox(label="Send UDP", default_value=True, callback=lambda s,v: setattr(self.tracker, 'send_enabled', v))
                         dpg.add_checkbox(label="Mesh", default_value=True, callback=lambda s,v: setattr(self, 'draw_mesh', v))
+                        dpg.add_checkbox(label="Reduced", default_value=self.overlay.reduced, callback=lambda s,v: setattr(self.overlay, 'reduced', v))
                     
                     with dpg.group(horizontal=True):
                         dpg.add_button(label="🔄 FETCH FROM BLENDER", width=210, callback=self.fetch_groups)
@@ -329,6 +339,8 @@ class FaceTrackerAppDPG:
                             dpg.add_text("Hover ID: -1", tag="hover_id_text", color=(255, 255, 0))
                             dpg.add_spacer(width=20)
                             dpg.add_text("Selected: None", tag="selected_id_text", color=(255, 100, 100))
+                        dpg.add_text("", tag="stage_text", color=(150, 150, 150))
+                        dpg.add_text("", tag="counter_text", color=(150, 150, 150))
 
                         dpg.add_spacer(height=10)
                         dpg.add_separator()
@@ -367,8 +379,10 @@ class FaceTrackerAppDPG:
     def build_axis_ui(self, axis):
         p = f"{axis}_"
         dpg.add_text("Mode Selection:")
-        dpg.add_radio_button(["None", "2pt (Dist)", "1pt (Proj)", "iris"], horizontal=True, tag=p+"mode", 
+        dpg.add_radio_button(list(MODE_LABELS.values()), horizontal=True, tag=p+"mode",
                              callback=lambda: self._sync_ui_to_data())
+        dpg.add_combo(list(BLENDSHAPE_NAMES[1:]), label="Blendshape", width=200, tag=p+"blend",
+                      default_value="jawOpen", callback=lambda: self._sync_ui_to_data())
         
         with dpg.group(horizontal=True):
             dpg.add_input_int(label="Base Pt A", width=140, tag=p+"pt_a", callback=lambda: self._sync_ui_to_data())
@@ -453,6 +467,7 @@ class FaceTrackerAppDPG:
         name = f"Group_{int(time.time()*100)%1000}"
         self.groups_data[name] = {"x": {"mode":"2pt (Dist)", "radius_max":1.0, "out_max":1.0, "sens":1.0, "exp_power":1.2}, 
                                   "y": {"mode":"2pt (Dist)", "radius_max":1.0, "out_max":1.0, "sens":1.0, "exp_power":1.2}}
+        self.mapping.invalidate()
         dpg.configure_item("group_combo", items=list(self.groups_data.keys()))
         dpg.set_value("group_combo", name)
         self.on_group_select(None, name)
@@ -460,6 +475,7 @@ class FaceTrackerAppDPG:
     def on_remove_group(self):
         if self.current_group_name in self.groups_data:
             del self.groups_data[self.current_group_name]
+            self.mapping.invalidate()
             items = list(self.groups_data.keys())
             dpg.configure_item("group_combo", items=items)
             if items: 
@@ -501,6 +517,7 @@ class FaceTrackerAppDPG:
                 with open(file_name, "r") as f:
                     new_data = json.load(f)
                 self.groups_data[self.current_group_name] = new_data
+                self.mapping.invalidate()
                 self._populate_ui_from_data(self.current_group_name)
                 dpg.delete_item("import_window")
                 self._show_toast(f"✓ Imported {file_name}", (0, 255, 120))
@@ -524,6 +541,7 @@ class FaceTrackerAppDPG:
         preset = DEFAULT_PRESETS.get(preset_name)
         if preset:
             self.groups_data[self.current_group_name] = preset
+            self.mapping.invalidate()
             self._populate_ui_from_data(self.current_group_name)
             self._show_toast(f"✓ Applied {preset_name} Preset", (100, 255, 150))
 
@@ -534,6 +552,8 @@ class FaceTrackerAppDPG:
             if axis not in group: group[axis] = {}
             a, p = group[axis], f"{axis}_"
             a["mode"] = dpg.get_value(p+"mode")
+            if a["mode"] == "blendshape":
+                a["blendshape"] = dpg.get_value(p+"blend")
             a["point_a"] = dpg.get_value(p+"pt_a")
             a["point_b"] = dpg.get_value(p+"pt_b")
             a["radius_min"] = dpg.get_value(p+"rmin")
@@ -544,14 +564,16 @@ class FaceTrackerAppDPG:
             a["exp_power"] = dpg.get_value(p+"exp")
             a["lerp_en"] = dpg.get_value(p+"lerp_en")
             a["lerp_fac"] = dpg.get_value(p+"lerp_fac")
+        self.mapping.invalidate()
 
     def _populate_ui_from_data(self, group_name):
         data = self.groups_data.get(group_name, {})
         for axis in ["x", "y"]:
             a, p = data.get(axis, {}), f"{axis}_"
-            dpg.set_value(p+"mode", a.get("mode", "2pt (Dist)"))
+            dpg.set_value(p+"mode", MODE_LABELS[canonical_mode(a.get("mode", "2pt"))])
             dpg.set_value(p+"pt_a", a.get("point_a", 0))
             dpg.set_value(p+"pt_b", a.get("point_b", 0))
+            dpg.set_value(p+"blend", a.get("blendshape", "jawOpen"))
             dpg.set_value(p+"rmin", a.get("radius_min", 0.0))
             dpg.set_value(p+"rmax", a.get("radius_max", 1.0))
             dpg.set_value(p+"omin", a.get("out_min", 0.0))
@@ -566,24 +588,17 @@ class FaceTrackerAppDPG:
         self._ensure_assets()
         dpg.set_value("init_status", "Checking Camera Access...")
         
+        tracker = self.tracker
         try:
-            landmarker = vision.FaceLandmarker.create_from_options(vision.FaceLandmarkerOptions(
-                base_options=python.BaseOptions(model_asset_path=MODEL_FILE),
-                running_mode=vision.RunningMode.VIDEO, output_face_blendshapes=True
-            ))
+            tracker.start()
             logger.info("Mediapipe Landmarker initialized.")
         except Exception as e:
             logger.error(f"Landmarker init failed: {e}")
             dpg.set_value("init_status", "FATAL ERROR: See tracker_log.txt")
             return
 
-        cam_idx = self.config.get("camera_index", 0)
-        logger.info(f"Opening camera index: {cam_idx}")
-        cap = cv2.VideoCapture(cam_idx)
-        
-        if not cap.isOpened():
-            logger.error(f"Failed to open camera {cam_idx}")
-            dpg.set_value("init_status", f"CAMERA ERROR: Index {cam_idx} not found")
+        if not tracker.source.is_opened():
+            dpg.set_value("init_status", f"CAMERA ERROR: {tracker.source.name} not found")
             return
 
         dpg.set_value("init_status", "Ready!")
@@ -592,144 +607,102 @@ class FaceTrackerAppDPG:
         self.initialized = True
         logger.info("System Initialized.")
 
-        last_t = time.time()
-        while self.running:
-            success, raw_frame = cap.read()
-            if not success: continue
-            
-            raw_frame = cv2.flip(raw_frame, 1)
-            f_h, f_w = raw_frame.shape[:2]
-            rgb = cv2.cvtColor(raw_frame, cv2.COLOR_BGR2RGB)
-            mp_img = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+        # Capture / inference / output may run on their own threads; this
+        # thread is the preview stage and only sees frames that were sent
+        pipeline = create_pipeline(tracker, self.config)
+        pipeline.start()
+
+        metrics = tracker.metrics
+        last_stats_t = last_log_t = time.time()
+        throttle = self.preview_throttle
+        while self.running and pipeline.alive:
+            frame = pipeline.next_frame()
+            if frame is None: continue
+
+            # Frames were already sent; the UI only redraws at preview_max_hz
+            paused = self.preview_paused()
+            if paused and not throttle.paused:
+                dpg.set_value("fps_text", "PREVIEW PAUSED (tracking continues)")
+            throttle.paused = paused
+            if not throttle.ready():
+                frame.release()
+                continue
             
-            results = landmarker.detect_for_video(mp_img, int(time.time() * 1000))
-            payload = {}
-            self.active_points_x = set()
-            self.active_points_y = set()
-            self.hover_id = -1
-
-            if results.face_landmarks:
-                lms = results.face_landmarks[0]
-                self.latest_landmarks = lms
-                
-                # Face metrics
-                f_width = calculate_distance(lms[234], lms[454]) or 1.0
-                fx_v = (lms[454].x-lms[234].x, lms[454].y-lms[234].y, lms[454].z-lms[234].z)
-                fy_v = (lms[152].x-lms[10].x, lms[152].y-lms[10].y, lms[152].z-lms[10].z)
-                
+            # The click handler reads hover_id from the UI thread: compute the
+            # new value locally and publish it with a single assignment
+            hover_id = -1
+            points_x = points_y = set()
+
+            if frame.pts is not None:  # live and replayed frames alike
                 # Precise Point Hover Logic
                 mouse_screen = dpg.get_mouse_pos(local=False)
                 rect_min = dpg.get_item_rect_min("cam_image")
                 if rect_min:
                     mx, my = mouse_screen[0] - rect_min[0], mouse_screen[1] - rect_min[1]
                     if 0 <= mx <= 640 and 0 <= my <= 480:
-                        min_d = 0.05
-                        for i, lm in enumerate(lms):
-                            d = math.sqrt((mx/640 - lm.x)**2 + (my/480 - lm.y)**2)
-                            if d < min_d: min_d, self.hover_id = d, i
-
-                # Axis Logic
-                for gn, mapings in self.groups_data.items():
-                    out_d = {"x": 0.0, "y": 0.0}
-                    for axis in ["x", "y"]:
-                        m = mapings.get(axis, {})
-                        if "point_a" not in m: continue
-                        mode, ia, ib = m.get("mode", ""), int(m.get("point_a", 0)), int(m.get("point_b", 0))
-                        
-                        raw = 0.0
-                        if mode == "None":
-                            raw = 0.0
-                        elif "iris" in mode:
-                            ek = "L" if ib == EYE_L["outer"] or ib == EYE_L["top"] else "R"
-                            e = EYE_L if ek == "L" else EYE_R
-                            pa, pi, po = lms[e["iris"]], lms[e["inner"]], lms[e["outer"]]
-                            pt, pb = lms[e["top"]], lms[e["bottom"]]
-                            ew = abs(pi.x-po.x) or 1.0
-                            eh = abs(pt.y-pb.y) or 0.1
-                            
-                            # Vertical axis is often less sensitive, adjust or relax blink protection
-                            if eh > 0.05 * ew: # Relaxed from 0.25 to allow tracking more closed eyes
-                                if axis == "x":
-                                    inst = (pa.x - (pi.x+po.x)/2)/ew
-                                else:
-                                    # Y Axis: pa.y increases downwards. Look Up -> pa.y small -> inst negative.
-                                    # We multiply by -1 if we want Look Up to be Positive.
-                                    # But we'll keep it raw and let user set mins/maxes, 
-                                    # just ensure it's normalized to the horizontal width for scale stability.
-                                    inst = (pa.y - (pt.y+pb.y)/2)/ew * 2.0 # Extra gain for Y as vertical travel is smaller
-                                    
-                                self._iris_ema[ek][axis] += 0.3 * (inst - self._iris_ema[ek][axis])
-                            
-                            raw = self._iris_ema[ek][axis]
-                            pex = m.get("exp_power", 1.2)
-                            raw = math.copysign(abs(raw)**pex, raw)
-                            
-                            points = [e["iris"], e["inner"], e["outer"], e["top"], e["bottom"]]
-                            if axis == "x": self.active_points_x.update(points)
-                            else: self.active_points_y.update(points)
-                        elif "1pt" in mode:
-                            pa, pb = lms[ia], lms[ib]
-                            vec = (pa.x-pb.x, pa.y-pb.y, pa.z-pb.z)
-                            f_v = fx_v if axis=="x" else fy_v
-                            dot = (vec[0]*f_v[0] + vec[1]*f_v[1] + vec[2]*f_v[2])
-                            raw = (dot / f_width) * 10.0
-                            if axis == "x": self.active_points_x.update([ia, ib])
-                            else: self.active_points_y.update([ia, ib])
-                        elif "2pt" in mode: # Explicit 2pt
-                            raw = calculate_distance(lms[ia], lms[ib]) / f_width
-                            if axis == "x": self.active_points_x.update([ia, ib])
-                            else: self.active_points_y.update([ia, ib])
-                        else:
-                            raw = 0.0
-
-                        if gn == self.current_group_name: self.current_vals[f"r{axis}"] = raw
-                        
-                        rmin, rmax, omin, omax = m.get("radius_min", 0.0), m.get("radius_max", 1.0), m.get("out_min", 0.0), m.get("out_max", 1.0)
-                        if "2pt" in mode: val = normalize_value(raw, rmin, rmax, omin, omax)
-                        else: val = normalize_value(abs(raw), rmin, rmax, omin, omax) * math.copysign(1, raw)
-                        
-                        val *= m.get("sens", 1.0)
-                        if m.get("lerp_en"):
-                            lk = gn+axis
-                            if lk not in self.lerp_values: self.lerp_values[lk] = val
-                            self.lerp_values[lk] += (val - self.lerp_values[lk]) * m.get("lerp_fac", 0.15)
-                            val = self.lerp_values[lk]
-                        
-                        out_d[axis] = max(-1.0, min(1.0, val))
-                        if gn == self.current_group_name: self.current_vals[axis] = out_d[axis]
-                    payload[gn] = out_d
-
-                # Update Texture for UI (Respect Privacy)
-            if self.camera_show:
-                display_frame = raw_frame.copy()
+                        hover_id = nearest_point(frame.pts, mx/640, my/480)
+
+                points_x, points_y = self.mapping.points_x, self.mapping.points_y
+
+                g = self.mapping.index_of(self.current_group_name)
+                if g >= 0:
+                    self.current_vals["rx"], self.current_vals["ry"] = frame.raw[g].tolist()
+                    self.current_vals["x"], self.current_vals["y"] = frame.out[g].tolist()
+
+            self.hover_id = hover_id
+            self.active_points_x, self.active_points_y = points_x, points_y
+
+            # Preview is skipped entirely while it is scrolled away / hidden
+            t0 = time.perf_counter()
+            preview_visible = dpg.is_item_visible("cam_image")
+
+            # Update Texture for UI (Respect Privacy): resize straight into the preview buffer
+            display_frame = self.preview_rgb
+            raw_frame = frame.display_rgb() if preview_visible and self.camera_show else None
+            if not preview_visible:
+                pass
+            elif raw_frame is not None:
+                if raw_frame.shape[:2] == (480, 640):
+                    np.copyto(display_frame, raw_frame)
+                else:
+                    cv2.resize(raw_frame, (640, 480), dst=display_frame)
             else:
-                display_frame = np.zeros((f_h, f_w, 3), dtype=np.uint8)
+                display_frame.fill(0)
 
             # Visual Rendering (Drawing results on display_frame)
-            if self.draw_mesh and results.face_landmarks:
-                lms = results.face_landmarks[0]
-                for i, lm in enumerate(lms):
-                    px, py = int(lm.x*f_w), int(lm.y*f_h)
-                    if i == self.selected_id: color, size = (0, 0, 255), 3 # Red
-                    elif i == self.hover_id: color, size = (0, 255, 255), 4 # Yellow
-                    elif i in self.active_points_x and i in self.active_points_y: color, size = (255, 255, 255), 2 # White (Both)
-                    elif i in self.active_points_x: color, size = (255, 100, 0), 2 # Orange (X)
-                    elif i in self.active_points_y: color, size = (0, 150, 255), 2 # Blue (Y)
-                    else: color, size = (0, 255, 100), 1 # Green
-                    cv2.circle(display_frame, (px, py), size, color, -1)
-
-            # Send Network
-            if self.send_enabled and payload:
-                try: self.sock.sendto(json.dumps(payload).encode(), self.target_address)
-                except: pass
+            if preview_visible and self.draw_mesh and frame.pts is not None:
+                px, py = self.active_points_x, self.active_points_y
+                self.overlay.draw(display_frame, frame.pts, {
+                    "x": px, "y": py, "both": px & py,
+                    "hover": (self.hover_id,), "selected": (self.selected_id,)})
+                for face in frame.faces or ():
+                    if face.track_id:  # other performers: mesh only
+                        self.overlay.draw(display_frame, face.pts, {})
+
+            frame.release()  # drawn: its RGB buffer may be reused
+            t1 = time.perf_counter()
+            metrics.add("draw", t1 - t0)
 
             # Update DPG Texture
-            f_res = cv2.resize(display_frame, (640, 480))
-            tex_data = np.array(cv2.cvtColor(f_res, cv2.COLOR_BGR2RGBA), dtype=np.float32).flatten() / 255.0
-            dpg.set_value("camera_texture", tex_data)
-            
-            # Update Telemetry Stats
-            dpg.set_value("fps_text", f"FPS: {int(1.0/(time.time()-last_t))}"); last_t = time.time()
+            if preview_visible:
+                self.upload_preview()
+                metrics.add("preview", time.perf_counter() - t1)
+
+            # Update Telemetry Stats (rolling, twice a second; log every 30 s)
+            now = time.time()
+            if now - last_stats_t >= 0.5:
+                last_stats_t = now
+                status = tracker.status(pipeline)
+                dpg.set_value("fps_text", f"FPS: {status['fps']:.0f}")
+                dpg.set_value("stage_text", "ms  " + "  ".join(
+                    f"{s} {v['mean']:.1f}" for s, v in status["stages_ms"].items()))
+                c = status["counters"]
+                dpg.set_value("counter_text", f"dropped {c.get('frames_dropped', 0)}  "
+                              f"inference skipped {c.get('inference_skipped', 0)}  "
+                              f"send errors {c.get('send_errors', 0)}")
+                if now - last_log_t >= 30.0:
+                    last_log_t = now
+                    logger.info(f"fps={status['fps']} {metrics.summary()}")
             dpg.set_value("hover_id_text", f"Hover ID: {self.hover_id}")
             if self.current_group_name:
                 dpg.set_value("val_xr", f"{self.current_vals['rx']:.4f}")
@@ -742,7 +715,11 @@ class FaceTrackerAppDPG:
                 dpg.configure_item("joy_dot", center=(jx, jy))
                 dpg.configure_item("joy_line", p2=(jx, jy))
 
-        cap.release()
+        pipeline.stop()
+        tracker.close()
+        if not pipeline.alive:
+            logger.error(f"Tracking stopped after an error: {pipeline.failed!r}")
+            dpg.set_value("fps_text", "TRACKING STOPPED: see tracker_log.txt")
 
     def start(self):
         dpg.set_primary_window("Primary Window", True)
@@ -0,0 +1,46 @@
+"""Shared fixtures: synthetic landmark takes and a UDP sink.
+
+Nothing here needs a camera, a model file or a display; landmark replays
+skip inference entirely.
+"""
+import os
+import socket
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracker_core import NUM_LANDMARKS  # noqa: E402
+
+
+def synthetic_take(n_frames=30, seed=0):
+    """(n_frames, 478, 3) landmarks: a fixed random face drifting a little per frame."""
+    rng = np.random.default_rng(seed)
+    face = rng.uniform(0.3, 0.7, size=(NUM_LANDMARKS, 3))
+    face[:, 2] -= 0.5
+    drift = rng.normal(0.0, 0.004, size=(n_frames, NUM_LANDMARKS, 3)).cumsum(axis=0)
+    return face[None] + drift
+
+
+@pytest.fixture
+def take():
+    return synthetic_take()
+
+
+@pytest.fixture
+def replay_file(tmp_path, take):
+    path = tmp_path / "take.npy"
+    np.save(path, take)
+    return path
+
+
+@pytest.fixture
+def udp_sink():
+    """A bound socket to aim outputs at; yields (socket, (ip, port))."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(1.0)
+    yield sock, sock.getsockname()
+    sock.close()
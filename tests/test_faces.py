@@ -0,0 +1,69 @@
+"""FaceTracks keeps track IDs on faces that move and reorder."""
+import numpy as np
+import pytest
+
+from tracker_core.faces import FaceTracks
+
+
+@pytest.fixture
+def face(take):
+    """face(cx, cy): the synthetic face moved so its landmarks center on (cx, cy)."""
+    base = take[0] - take[0].mean(axis=0) * np.array([1.0, 1.0, 0.0])
+    return lambda cx, cy: base + np.array([cx, cy, 0.0])
+
+
+def stack(*faces):
+    return np.stack(faces) if faces else np.zeros((0, 478, 3))
+
+
+def test_ids_follow_faces_when_detections_reorder(face):
+    tracks = FaceTracks(max_faces=2)
+    assert tracks.assign(stack(face(0.3, 0.5), face(0.7, 0.5))).tolist() == [0, 1]
+    assert tracks.assign(stack(face(0.72, 0.5), face(0.31, 0.5))).tolist() == [1, 0]
+    assert tracks.assign(stack(face(0.33, 0.52), face(0.74, 0.5))).tolist() == [0, 1]
+
+
+def test_new_face_takes_the_lowest_free_id(face):
+    tracks = FaceTracks(max_faces=3)
+    tracks.assign(stack(face(0.2, 0.5), face(0.5, 0.5), face(0.8, 0.5)))
+    for _ in range(tracks.max_missing + 1):
+        tracks.assign(stack(face(0.5, 0.5), face(0.8, 0.5)))  # ID 0 left and expired
+    assert tracks.assign(stack(face(0.8, 0.5), face(0.2, 0.2), face(0.5, 0.5))).tolist() == [2, 0, 1]
+
+
+def test_briefly_missing_face_gets_its_id_back(face):
+    tracks = FaceTracks(max_faces=2, max_missing=5)
+    tracks.assign(stack(face(0.3, 0.5), face(0.7, 0.5)))
+    for _ in range(5):
+        assert tracks.assign(stack(face(0.3, 0.5))).tolist() == [0]
+    assert tracks.assign(stack(face(0.3, 0.5), face(0.7, 0.5))).tolist() == [0, 1]
+
+
+def test_expired_track_is_reused(face):
+    tracks = FaceTracks(max_faces=2, max_missing=2)
+    tracks.assign(stack(face(0.3, 0.5), face(0.7, 0.5)))
+    for _ in range(3):
+        tracks.assign(stack(face(0.7, 0.5)))
+    assert np.isnan(tracks.centers[0]).all()
+    assert tracks.assign(stack(face(0.5, 0.1), face(0.7, 0.5))).tolist() == [0, 1]
+
+
+def test_jump_past_max_distance_is_a_new_face(face):
+    tracks = FaceTracks(max_faces=2, max_distance=0.1)
+    tracks.assign(stack(face(0.2, 0.5)))
+    assert tracks.assign(stack(face(0.8, 0.5))).tolist() == [1]
+
+
+def test_extra_faces_get_no_id(face):
+    tracks = FaceTracks(max_faces=2)
+    ids = tracks.assign(stack(face(0.2, 0.5), face(0.5, 0.5), face(0.8, 0.5)))
+    assert ids.tolist() == [0, 1, -1]
+
+
+def test_empty_frame_ages_every_track(face):
+    tracks = FaceTracks(max_faces=2, max_missing=1)
+    tracks.assign(stack(face(0.3, 0.5)))
+    assert tracks.assign(stack()).tolist() == []
+    assert tracks.missing[0] == 1 and not np.isnan(tracks.centers[0]).any()
+    tracks.assign(stack())
+    assert np.isnan(tracks.centers).all()
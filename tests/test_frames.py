@@ -0,0 +1,70 @@
+"""Pooled frame buffers are only reissued once nobody holds them."""
+import numpy as np
+import pytest
+
+from tracker_core import Tracker
+from tracker_core.frames import FramePool
+
+SHAPE = (48, 64, 3)
+
+
+def test_held_buffer_is_not_reissued():
+    pool = FramePool(size=2)
+    held = pool.acquire(SHAPE)
+    other = pool.acquire(SHAPE)
+    assert other.array is not held.array
+    other.release()
+    assert pool.acquire(SHAPE) is other  # free again: reused
+    held.release()
+    assert pool.acquire(SHAPE) is held
+    assert pool.allocated == 2
+
+
+def test_retained_buffer_waits_for_every_holder():
+    pool = FramePool(size=1)
+    buf = pool.acquire(SHAPE).retain()
+    buf.release()
+    assert pool.acquire(SHAPE) is not buf
+    buf.release()
+    assert pool.acquire(SHAPE) is buf
+    buf.release()
+    with pytest.raises(RuntimeError):
+        buf.release()
+
+
+def test_pool_full_of_held_buffers_allocates_spares():
+    pool = FramePool(size=1)
+    first = pool.acquire(SHAPE)
+    spare = pool.acquire(SHAPE)
+    spare.release()
+    first.release()
+    assert pool.acquire(SHAPE) is first
+    assert pool.allocated == 2
+
+
+@pytest.fixture
+def tracker():
+    tracker = Tracker({"shared_ring": False}, "unused.task")
+    yield tracker
+    tracker.close()
+    tracker.output.close()
+
+
+def test_held_frame_keeps_its_rgb(tracker):
+    image = np.full(SHAPE, 10, dtype=np.uint8)
+    frame = tracker.convert(image)
+    frame.retain()  # e.g. kept by the picker past the preview
+    frame.release()
+    expected = frame.rgb.copy()
+
+    later = tracker.convert(np.full(SHAPE, 200, dtype=np.uint8))
+    assert later.rgb is not frame.rgb
+    np.testing.assert_array_equal(frame.rgb, expected)
+    later.release()
+
+    frame.release()
+    again = tracker.convert(image)
+    assert again.rgb is frame.rgb  # first free buffer in the pool
+    again.release()
+    with pytest.raises(RuntimeError):
+        frame.release()
@@ -0,0 +1,190 @@
+"""MappingEngine against the per-group math it replaced.
+
+`Reference` is the dict walk run_tracker_loop did for every group
+before the engine existed (main.py), kept here as the parity oracle. Two
+deliberate differences: lerp smoothing now primes on the first value
+instead of sweeping in from 0, and each eye's iris EMA advances once per
+frame rather than once per group reading it. The oracle does the same.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from tracker_core import EYE_L, EYE_R, MappingEngine, MultiFaceMapping
+
+EYES = {"L": EYE_L, "R": EYE_R}
+
+
+def normalize_value(val, radius_min, radius_max, out_min, out_max):
+    if radius_max <= radius_min:
+        return out_min
+    if val <= radius_min:
+        return out_min
+    elif val >= radius_max:
+        return out_max
+    normalized = (val - radius_min) / (radius_max - radius_min)
+    return out_min + (out_max - out_min) * normalized
+
+
+def distance(p1, p2):
+    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2 + (p1[2] - p2[2])**2)
+
+
+class Reference:
+    """Per-group, per-axis scalar evaluation (the pre-engine code path)."""
+
+    def __init__(self):
+        self.iris_ema = {"L": {"x": 0.0, "y": 0.0}, "R": {"x": 0.0, "y": 0.0}}
+        self.lerp_values = {}
+
+    def evaluate(self, groups, lms):
+        pt_left, pt_right = lms[234], lms[454]
+        face_width = distance(pt_left, pt_right) or 1.0
+        fx_vec = [pt_right[k] - pt_left[k] for k in range(3)]
+        fx_len_sq = sum(v * v for v in fx_vec) or 1.0
+        pt_top, pt_bottom = lms[10], lms[152]
+        fy_vec = [pt_bottom[k] - pt_top[k] for k in range(3)]
+        fy_len_sq = sum(v * v for v in fy_vec) or 1.0
+        face_axes = {"x": (fx_vec, fx_len_sq), "y": (fy_vec, fy_len_sq)}
+        for key, eye in EYES.items():
+            self.iris(key, eye, lms)
+        return {name: self.group(name, mappings, lms, face_width, face_axes)
+                for name, mappings in groups.items()}
+
+    def iris(self, key, eye, lms):
+        p_iris, p_inner, p_outer = lms[eye["iris"]], lms[eye["inner"]], lms[eye["outer"]]
+        p_top, p_bot = lms[eye["top"]], lms[eye["bottom"]]
+        ex = [p_inner[k] - p_outer[k] for k in range(3)]
+        eye_width = math.sqrt(sum(v * v for v in ex)) or 1.0
+        if abs(p_top[1] - p_bot[1]) < 0.25 * eye_width:
+            return  # blinking: hold the last value
+        cy = (p_top[1] + p_bot[1]) / 2.0
+        delta = (p_iris[0] - (p_inner[0] + p_outer[0]) / 2.0, p_iris[1] - cy,
+                 p_iris[2] - (p_inner[2] + p_outer[2]) / 2.0)
+        inst = {"x": sum(delta[k] * ex[k] for k in range(3)) / (eye_width * eye_width),
+                "y": (p_iris[1] - cy) / eye_width}
+        ema = self.iris_ema[key]
+        for axis in ("x", "y"):
+            ema[axis] += 0.30 * (inst[axis] - ema[axis])
+
+    def group(self, name, mappings, lms, face_width, face_axes):
+        data = {}
+        for axis in ("x", "y"):
+            m = mappings[axis]
+            mode = m["mode"]
+            if mode == "iris":
+                key = "L" if int(m["point_b"]) == EYE_L["outer"] else "R"
+                raw = self.iris_ema[key][axis]
+                exp_p = float(m.get("exp_power", 1.2))
+                raw = math.copysign(abs(raw) ** exp_p, raw)
+            else:
+                p_a, p_b = lms[int(m["point_a"])], lms[int(m["point_b"])]
+                if mode == "1pt":
+                    vec, len_sq = face_axes[axis]
+                    dot = sum((p_a[k] - p_b[k]) * vec[k] for k in range(3))
+                    raw = dot / math.sqrt(len_sq) / face_width * 10.0
+                else:
+                    raw = distance(p_a, p_b) / face_width
+
+            sens = float(m.get("sens", 1.0))
+            rad_min, rad_max = float(m.get("radius_min", 0.0)), float(m.get("radius_max", 1.0))
+            out_min, out_max = float(m.get("out_min", 0.0)), float(m.get("out_max", 1.0))
+            if mode in ("1pt", "iris"):
+                mag = normalize_value(abs(raw), rad_min, rad_max, out_min, out_max)
+                val = mag * sens * (1.0 if raw >= 0 else -1.0)
+            else:
+                val = normalize_value(raw, rad_min, rad_max, out_min, out_max) * sens
+            val = max(-1.0, min(1.0, val))
+
+            key = (name, axis)
+            if m.get("lerp_en", False) and key in self.lerp_values:
+                val = self.lerp_values[key] + (val - self.lerp_values[key]) * float(m.get("lerp_fac", 0.15))
+            self.lerp_values[key] = val
+            data[axis] = (val, raw)
+        return data
+
+
+def random_groups(n, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = {}
+    for g in range(n):
+        group = {}
+        for axis in ("x", "y"):
+            mode = ("2pt", "1pt", "iris")[rng.integers(0, 3)]
+            if mode == "iris":
+                eye = EYE_L if rng.integers(0, 2) else EYE_R
+                a, b = eye["iris"], eye["outer"]
+            else:
+                a, b = rng.integers(0, 478, size=2).tolist()
+            rmin = float(rng.uniform(0.0, 0.2))
+            group[axis] = {
+                "mode": mode, "point_a": a, "point_b": b,
+                "radius_min": rmin, "radius_max": rmin + float(rng.uniform(0.05, 1.0)),
+                "out_min": float(rng.uniform(-0.2, 0.2)), "out_max": float(rng.uniform(0.5, 1.0)),
+                "sens": float(rng.uniform(0.5, 2.0)), "exp_power": float(rng.uniform(0.8, 1.6)),
+                "lerp_en": bool(rng.integers(0, 3) == 0), "lerp_fac": float(rng.uniform(0.05, 0.5)),
+            }
+        groups[f"g{g:03d}"] = group
+    return groups
+
+
+def test_parity_with_per_group_math(take):
+    groups = random_groups(60)
+    engine, reference = MappingEngine(groups), Reference()
+    for pts in take:
+        out, raw = engine.evaluate(pts)
+        expected = reference.evaluate(groups, pts)
+        for g, name in enumerate(engine.names):
+            for a, axis in enumerate(("x", "y")):
+                val, r = expected[name][axis]
+                assert out[g, a] == pytest.approx(val, abs=1e-9), (name, axis)
+                assert raw[g, a] == pytest.approx(r, abs=1e-9), (name, axis)
+
+
+def test_payload_sends_unmapped_groups_as_zero(take):
+    groups = random_groups(3)
+    groups["off"] = {"x": {"mode": "None", "point_a": 0, "point_b": 1},
+                     "y": {"mode": "None", "point_a": 0, "point_b": 1}}
+    engine = MappingEngine(groups)
+    out, _ = engine.evaluate(take[0])
+    payload = engine.to_payload(out)
+    assert list(payload) == list(groups)
+    assert payload["off"] == {"x": 0.0, "y": 0.0}
+    assert not engine.group_active[engine.index_of("off")]
+
+
+def test_invalid_axes_are_ignored(take):
+    groups = {"bad": {"x": {"mode": "2pt", "point_a": 9999, "point_b": 1},
+                      "y": {"mode": "1pt", "point_a": "nope", "point_b": 1}},
+              "ok": random_groups(1)["g000"]}
+    engine = MappingEngine(groups)
+    out, _ = engine.evaluate(take[0])
+    np.testing.assert_array_equal(out[engine.index_of("bad")], 0.0)
+    assert np.isfinite(out).all()
+
+
+def test_recompile_keeps_lerp_state_by_name(take):
+    groups = random_groups(4, seed=3)
+    for group in groups.values():
+        group["x"]["lerp_en"] = group["y"]["lerp_en"] = True
+    engine = MappingEngine(groups)
+    engine.evaluate(take[0])
+    before = engine.lerp.state[engine.index_of("g002")].copy()
+    del groups["g000"]
+    engine.update(groups)
+    engine.refresh()
+    np.testing.assert_array_equal(engine.lerp.state[engine.index_of("g002")], before)
+
+
+def test_multi_face_matches_one_engine_per_face(take):
+    groups_a, groups_b = random_groups(10, seed=1), random_groups(7, seed=2)
+    multi = MultiFaceMapping([MappingEngine(groups_a), MappingEngine(groups_b)])
+    single = [MappingEngine(groups_a), MappingEngine(groups_b)]
+    for k in range(len(take) - 1):
+        pts = np.stack((take[k], take[k + 1]))
+        results = multi.evaluate_faces(pts, [True, True])
+        for p in range(2):
+            out, raw = single[p].evaluate(pts[p])
+            np.testing.assert_allclose(results[p][0], out, atol=1e-12)
+            np.testing.assert_allclose(results[p][1], raw, atol=1e-12)
@@ -0,0 +1,70 @@
+"""DeltaFilter thresholds and delta sends through UdpOutput."""
+import json
+
+import numpy as np
+
+from tracker_core import DeltaFilter, MappingEngine, UdpOutput
+
+NAMES = ["a", "b", "c"]
+
+
+def values(*rows):
+    return np.array(rows, dtype=float)
+
+
+def test_first_frame_is_a_keyframe():
+    delta = DeltaFilter(epsilon=0.01)
+    assert delta.select(NAMES, values([0, 0], [0, 0], [0, 0]), now=0.0) is None
+
+
+def test_only_moves_above_epsilon_are_sent():
+    delta = DeltaFilter(epsilon=0.01, keyframe_interval=10.0)
+    delta.select(NAMES, values([0, 0], [0, 0], [0, 0]), now=0.0)
+    changed = delta.select(NAMES, values([0.005, 0], [0, 0.02], [0, -0.011]), now=0.1)
+    assert changed.tolist() == [1, 2]
+    assert delta.select(NAMES, values([0.005, 0], [0, 0.02], [0, -0.011]), now=0.2).size == 0
+
+
+def test_slow_drift_is_measured_from_the_last_sent_value():
+    delta = DeltaFilter(epsilon=0.01, keyframe_interval=10.0)
+    delta.select(NAMES, values([0, 0], [0, 0], [0, 0]), now=0.0)
+    sent = []
+    for k in range(1, 6):
+        x = 0.004 * k  # each step is below epsilon, the total is not
+        sent.append(delta.select(NAMES, values([x, 0], [0, 0], [0, 0]), now=0.1 * k).tolist())
+    assert sent == [[], [], [0], [], []]
+
+
+def test_per_group_epsilon_with_nan_default():
+    delta = DeltaFilter(epsilon=0.01, keyframe_interval=10.0)
+    eps = np.array([0.1, np.nan, 0.0])
+    delta.select(NAMES, values([0, 0], [0, 0], [0, 0]), eps, now=0.0)
+    changed = delta.select(NAMES, values([0.05, 0], [0.05, 0], [0.001, 0]), eps, now=0.1)
+    assert changed.tolist() == [1, 2]
+
+
+def test_keyframe_interval_and_group_changes_resend_everything():
+    delta = DeltaFilter(epsilon=0.01, keyframe_interval=1.0)
+    still = values([0, 0], [0, 0], [0, 0])
+    delta.select(NAMES, still, now=0.0)
+    assert delta.select(NAMES, still, now=0.5).size == 0
+    assert delta.select(NAMES, still, now=1.0) is None
+    assert delta.select(NAMES[:2], still[:2], now=1.1) is None
+
+
+def test_udp_output_sends_changed_groups_only(udp_sink):
+    sock, (ip, port) = udp_sink
+    groups = {name: {"x": {"mode": "2pt", "point_a": 1, "point_b": 2 + i}} for i, name in enumerate(NAMES)}
+    mapping = MappingEngine(groups)
+    mapping.refresh()
+    output = UdpOutput(ip, port, delta_filter=DeltaFilter(epsilon=0.01, keyframe_interval=60.0))
+    try:
+        assert output.send_values(mapping, values([0.1, 0], [0.2, 0], [0.3, 0]))
+        assert set(json.loads(sock.recv(65535))) == set(NAMES)
+        assert output.send_values(mapping, values([0.1, 0], [0.5, 0], [0.3, 0]))
+        assert json.loads(sock.recv(65535)) == {"b": {"x": 0.5, "y": 0.0}}
+        assert not output.send_values(mapping, values([0.1, 0], [0.5, 0], [0.3, 0]))
+        assert output.frames_suppressed == 1
+        assert output.packets_sent == 2
+    finally:
+        output.close()
@@ -0,0 +1,73 @@
+"""Landmark replays through the per-frame preview path of both front ends.
+
+Replayed frames carry pts but no MediaPipe landmark objects and no image;
+value readouts, the mesh overlay and the hover lookup must still work so
+groups can be tuned offline.
+"""
+import cv2
+import numpy as np
+import pytest
+
+from tracker_core import MeshOverlay, Tracker, create_pipeline, nearest_point
+
+GROUPS = {
+    "jaw": {"x": {"mode": "2pt", "point_a": 13, "point_b": 14, "radius_min": 0.0, "radius_max": 0.5},
+            "y": {"mode": "1pt", "point_a": 61, "point_b": 291, "radius_min": 0.0, "radius_max": 1.0}},
+}
+CANVAS = (480, 640, 3)
+
+
+@pytest.fixture
+def replay(replay_file, udp_sink):
+    """Run the replay through the pipeline the front ends create; yields (tracker, frames)."""
+    ip, port = udp_sink[1]
+    config = {"frame_source": str(replay_file), "source_realtime": False, "shared_ring": False,
+              "groups": GROUPS, "blender_ip": ip, "blender_port": port}
+    tracker = Tracker(config, "unused.task")
+    assert tracker.start()
+    pipeline = create_pipeline(tracker, config)
+    pipeline.start()
+    frames = []
+    try:
+        while tracker.source.is_opened() and pipeline.alive:
+            frame = pipeline.next_frame(timeout=0.1)
+            if frame is not None:
+                frames.append(frame)
+    finally:
+        pipeline.stop()
+        tracker.close()
+        tracker.output.close()
+    assert pipeline.alive
+    assert frames
+    yield tracker, frames
+
+
+def test_tk_preview_replay(replay):
+    """main.py: black canvas, group values and mesh overlay from pts."""
+    tracker, frames = replay
+    overlay = MeshOverlay({"mesh": ((0, 255, 0), 1), "active": ((0, 0, 255), 4)})
+    blank = np.zeros(CANVAS, dtype=np.uint8)
+    g = tracker.mapping.index_of("jaw")
+    for frame in frames:
+        assert frame.landmarks is None and frame.pts is not None
+        rgb = frame.display_rgb()
+        assert rgb is None
+        image = cv2.cvtColor(blank, cv2.COLOR_RGB2BGR)
+        x, y = frame.out[g].tolist()
+        assert -1.0 <= x <= 1.0 and -1.0 <= y <= 1.0
+        overlay.draw(image, frame.pts, {"active": tracker.mapping.draw_points})
+        assert image.any()
+
+
+def test_dpg_preview_replay(replay):
+    """main_dpg.py: hover lookup and group values from pts."""
+    tracker, frames = replay
+    g = tracker.mapping.index_of("jaw")
+    assert g >= 0
+    assert tracker.mapping.points_x and tracker.mapping.points_y
+    for frame in frames:
+        mx, my = frame.pts[13, :2].tolist()
+        assert nearest_point(frame.pts, mx, my) == 13
+        rx, ry = frame.raw[g].tolist()
+        assert np.isfinite([rx, ry]).all()
+    assert nearest_point(frames[0].pts, 5.0, 5.0) == -1
@@ -0,0 +1,76 @@
+"""ModelScheduler intervals / adaptation and Extrapolator predictions."""
+import numpy as np
+
+from tracker_core import Extrapolator, ModelScheduler
+
+
+def pattern(scheduler, model, frames):
+    return [scheduler.due(model) for _ in range(frames)]
+
+
+def test_models_run_every_n_frames():
+    scheduler = ModelScheduler({"Face": 1, "Hand": 3})
+    assert pattern(scheduler, "Face", 4) == [True] * 4
+    assert pattern(scheduler, "Hand", 7) == [True, False, False, True, False, False, True]
+
+
+def test_unknown_models_always_run():
+    assert pattern(ModelScheduler(), "Pose", 3) == [True] * 3
+
+
+def test_slow_frames_back_off_the_least_important_model_first():
+    scheduler = ModelScheduler({"Face": 1, "Hand": 1}, target_ms=10.0, max_interval=3, adapt_frames=5)
+    steps = []
+    for _ in range(5):
+        for _ in range(5):
+            scheduler.observe(0.020)
+        steps.append(dict(scheduler.interval))
+    assert [s["Hand"] for s in steps] == [2, 3, 3, 3, 3]
+    assert [s["Face"] for s in steps] == [1, 1, 2, 3, 3]
+
+
+def test_headroom_restores_the_most_important_model_first():
+    scheduler = ModelScheduler({"Face": 1, "Hand": 2}, target_ms=10.0, adapt_frames=1)
+    scheduler.interval = {"Face": 3, "Hand": 4}
+    scheduler.frame_time = 0.002
+    seen = []
+    for _ in range(5):
+        scheduler.observe(0.002)
+        seen.append((scheduler.interval["Face"], scheduler.interval["Hand"]))
+    assert seen == [(2, 4), (1, 4), (1, 3), (1, 2), (1, 2)]
+
+
+def test_no_target_never_adapts():
+    scheduler = ModelScheduler({"Face": 1}, adapt_frames=1)
+    for _ in range(10):
+        scheduler.observe(1.0)
+    assert scheduler.interval["Face"] == 1
+
+
+def test_hold_repeats_the_last_output():
+    ex = Extrapolator("hold")
+    assert ex.predict(0.0) is None
+    ex.update(0.0, np.array([1.0]))
+    ex.update(0.1, np.array([2.0]))
+    assert ex.predict(0.15).tolist() == [2.0]
+
+
+def test_extrapolate_continues_the_last_step_by_at_most_one_gap():
+    ex = Extrapolator("extrapolate")
+    ex.update(0.0, np.array([1.0, 0.0]))
+    ex.update(0.1, np.array([2.0, -1.0]))
+    np.testing.assert_allclose(ex.predict(0.15), [2.5, -1.5])
+    np.testing.assert_allclose(ex.predict(1.0), [3.0, -2.0])
+    np.testing.assert_allclose(ex.predict(0.05), [2.0, -1.0])
+
+
+def test_extrapolate_holds_when_outputs_do_not_line_up():
+    ex = Extrapolator("extrapolate")
+    ex.update(0.0, np.zeros((1, 2)))
+    ex.update(0.1, np.ones((2, 2)))  # a second hand appeared
+    assert ex.predict(0.2).shape == (2, 2)
+    np.testing.assert_array_equal(ex.predict(0.2), 1.0)
+    ex.update(0.2, None)
+    assert ex.predict(0.3) is None
+    ex.reset()
+    assert ex.predict(0.3) is None
@@ -0,0 +1,67 @@
+"""A named shared ring is only taken over when its writing process is gone."""
+import os
+import subprocess
+import sys
+import uuid
+
+import pytest
+
+from tracker_core import SharedRing
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="leftover blocks only exist on POSIX")
+
+
+@pytest.fixture
+def name():
+    return f"skft_test_{uuid.uuid4().hex[:8]}"
+
+
+def leave_behind(name):
+    """Create the ring in another process that exits without cleaning up,
+    like a tracker that crashed."""
+    code = ("import sys; from multiprocessing import resource_tracker; from tracker_core import SharedRing; "
+            "ring = SharedRing(sys.argv[1], capacity=4, max_values=4); "
+            "resource_tracker.unregister(ring.shm._name, 'shared_memory')")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code, name], cwd=root, check=True)
+
+
+def test_idle_live_ring_is_kept(name):
+    leave_behind(name)
+    left = SharedRing.attach(name)
+    left.header["pid"] = os.getpid()  # writer still running, it just has not written yet
+    left.header["pid_start"] = 0.0
+    try:
+        ring = SharedRing(name, capacity=4, max_values=4)
+        try:
+            assert ring.name != name
+        finally:
+            ring.close()
+    finally:
+        left.close()
+        left.shm.unlink()
+
+
+def test_dead_writers_ring_is_replaced(name):
+    leave_behind(name)
+    ring = SharedRing(name, capacity=4, max_values=4)
+    try:
+        assert ring.name == name
+        assert int(ring.header["pid"][0]) == os.getpid()
+    finally:
+        ring.close()
+
+
+def test_reused_pid_is_not_the_writer(name):
+    leave_behind(name)
+    left = SharedRing.attach(name)
+    left.header["pid"] = os.getpid()  # a live pid, but not the process that wrote the ring
+    left.header["pid_start"] = 1.0
+    left.close()
+    ring = SharedRing(name, capacity=4, max_values=4)
+    try:
+        if not ring.header["pid_start"][0]:
+            pytest.skip("process start times are not readable here")
+        assert ring.name == name
+    finally:
+        ring.close()
@@ -0,0 +1,129 @@
+"""SKFT encode / decode round trips (tracker_core/wire.py)."""
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from tracker_core.wire import (
+    HEADER, MAX_DATAGRAM, MAX_FRAME_GROUPS, PKT_DELTA, PKT_FRAME, PKT_TABLE, BinaryEncoder, WireDecoder,
+)
+
+
+def ptype(packet):
+    return HEADER.unpack_from(packet)[2]
+
+
+def groups(n, width=12):
+    names = [f"group_{i:0{width}d}" for i in range(n)]
+    values = np.random.default_rng(n).uniform(-1.0, 1.0, size=(n, 2))
+    return names, values
+
+
+def decode_all(decoder, packets):
+    out = [decoder.feed(p) for p in packets]
+    return out[-1]
+
+
+def assert_values(decoded, names, values):
+    assert list(decoded) == names
+    got = np.array([[decoded[n]["x"], decoded[n]["y"]] for n in names])
+    np.testing.assert_array_equal(got, values.astype(np.float32))
+
+
+def test_frame_round_trip():
+    names, values = groups(5)
+    packets = BinaryEncoder().encode(names, values, timestamp=1.0)
+    assert [ptype(p) for p in packets] == [PKT_TABLE, PKT_FRAME]
+    assert_values(decode_all(WireDecoder(), packets), names, values)
+
+
+def test_table_of_1000_groups_is_split():
+    names, values = groups(1000, width=80)  # ~84 KB of names
+    packets = BinaryEncoder().encode(names, values, timestamp=1.0)
+    tables = [p for p in packets if ptype(p) == PKT_TABLE]
+    assert len(tables) > 1
+    assert all(len(p) <= MAX_DATAGRAM for p in packets)
+    decoder = WireDecoder()
+    assert_values(decode_all(decoder, packets), names, values)
+    assert decoder.names == names
+
+
+def test_frames_wait_for_every_table_part():
+    names, values = groups(1000, width=80)
+    packets = BinaryEncoder().encode(names, values, timestamp=1.0)
+    decoder = WireDecoder()
+    assert decoder.feed(packets[0]) is None
+    assert decoder.names is None
+    assert decoder.feed(packets[-1]) is None  # frame before the rest of the table
+    for packet in packets[1:-1]:
+        decoder.feed(packet)
+    assert_values(decoder.feed(packets[-1]), names, values)
+
+
+def test_small_table_round_trip_at_1000_groups():
+    names, values = groups(1000)
+    packets = BinaryEncoder().encode(names, values, timestamp=1.0)
+    assert [ptype(p) for p in packets] == [PKT_TABLE, PKT_FRAME]
+    assert_values(decode_all(WireDecoder(), packets), names, values)
+
+
+def test_delta_frame_carries_changed_groups_only():
+    names, values = groups(6)
+    encoder, decoder = BinaryEncoder(table_interval=60.0), WireDecoder()
+    decode_all(decoder, encoder.encode(names, values, timestamp=1.0))
+    packets = encoder.encode(names, values, timestamp=1.1, changed=np.array([1, 4]))
+    assert [ptype(p) for p in packets] == [PKT_DELTA]
+    decoded = decoder.feed(packets[0])
+    assert list(decoded) == [names[1], names[4]]
+    assert decoded[names[4]]["y"] == pytest.approx(values[4, 1], abs=1e-6)
+
+
+def test_table_resent_on_change_and_interval():
+    names, values = groups(3)
+    encoder = BinaryEncoder(table_interval=1.0)
+    assert ptype(encoder.encode(names, values, timestamp=10.0)[0]) == PKT_TABLE
+    assert len(encoder.encode(names, values, timestamp=10.5)) == 1
+    assert ptype(encoder.encode(names, values, timestamp=11.0)[0]) == PKT_TABLE
+    table_id = encoder.table_id
+    encoder.encode(names[:2], values[:2], timestamp=11.1)
+    assert encoder.table_id == table_id + 1
+
+
+def test_frames_of_an_unknown_table_are_ignored():
+    names, values = groups(3)
+    encoder = BinaryEncoder(table_interval=60.0)
+    encoder.encode(names, values, timestamp=1.0)  # table never reaches the decoder
+    frame = encoder.encode(names, values, timestamp=1.1)[0]
+    assert WireDecoder().feed(frame) is None
+
+
+def test_lost_packets_are_counted():
+    names, values = groups(3)
+    encoder, decoder = BinaryEncoder(table_interval=60.0), WireDecoder()
+    decode_all(decoder, encoder.encode(names, values, timestamp=1.0))
+    encoder.encode(names, values, timestamp=1.1)  # dropped on the way
+    decoder.feed(encoder.encode(names, values, timestamp=1.2)[0])
+    assert decoder.lost == 1
+
+
+def test_json_payload_passes_through():
+    payload = {"jaw": {"x": 0.25, "y": -0.5}}
+    assert WireDecoder().feed(json.dumps(payload).encode("utf-8")) == payload
+
+
+def test_too_many_groups_are_truncated():
+    names, values = groups(MAX_FRAME_GROUPS + 10, width=1)
+    packets = BinaryEncoder().encode(names, values, timestamp=1.0)
+    assert all(len(p) <= MAX_DATAGRAM for p in packets)
+    decoded = decode_all(WireDecoder(), packets)
+    assert len(decoded) == MAX_FRAME_GROUPS
+
+
+def test_other_versions_are_ignored():
+    names, values = groups(2)
+    table = bytearray(BinaryEncoder().encode(names, values, timestamp=1.0)[0])
+    struct.pack_into("<B", table, 4, 1)
+    decoder = WireDecoder()
+    decoder.feed(bytes(table))
+    assert decoder.names is None
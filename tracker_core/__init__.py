@@ -0,0 +1,31 @@
+"""UI-free tracking core shared by the Tk and DearPyGui front ends."""
+
+from .capture import (
+    Camera, FrameSource, ImageSequenceSource, LandmarkReplaySource, VideoFileSource, create_source,
+)
+from .config import (
+    DEFAULT_CONFIG, HAND_MODEL_FILE, HAND_MODEL_URL, MODEL_FILE, MODEL_URL, REF_MAP_URL,
+    default_config, ensure_asset, load_config, save_config,
+)
+from .faces import FaceTracks
+from .frames import FramePool
+from .hands import FINGERS, HandMapping
+from .inference import (
+    FaceInference, HandInference, LiveStreamInference, create_face_landmarker, create_hand_landmarker,
+)
+from .mapping import (
+    BLENDSHAPE_NAMES, EYE_L, EYE_R, NUM_BLENDSHAPES, NUM_LANDMARKS, MODE_CODES, MappingEngine,
+    MultiFaceMapping, blendshape_index, canonical_mode, head_pose_matrix, landmarks_to_array, parse_mode,
+)
+from .metrics import MetricsServer, StageMetrics
+from .multicam import MultiCameraTracker
+from .overlay import MeshOverlay, PreviewThrottle, nearest_point, window_hidden
+from .output import DeltaFilter, UdpOutput, create_output
+from .pipeline import (
+    DropOldestQueue, LiveStreamPipeline, StagedPipeline, SyncPipeline, create_pipeline,
+)
+from .recording import LandmarkRecorder, open_recording
+from .schedule import Extrapolator, ModelScheduler
+from .shm import LandmarkSlots, SharedRing
+from .smoothing import AxisLerp, Ema
+from .tracker import TrackedFace, Tracker, TrackerFrame
@@ -0,0 +1,217 @@
+"""Benchmark the tracking pipeline stage by stage.
+
+Drives a recorded video, image directory or landmark replay (.sklm / .npy)
+through the same Tracker the front ends use (read -> infer -> map -> emit
+over UDP, plus preview rendering) on one thread, once per group count,
+and reports the Tracker's own per-stage timings. Results go out as JSON
+so runs can be diffed over time:
+
+    python -m tracker_core.bench --source take.mp4 --output bench.json
+    python -m tracker_core.bench --source take.sklm --groups 1,10,100,1000 --format binary
+
+Landmark sources skip convert/inference, which isolates the mapping and
+output stages. Groups are synthetic (a seeded mix of 2pt, 1pt and iris
+axes, some with lerp) so a run is reproducible without a config.
+"""
+import argparse
+import json
+import logging
+import platform
+import socket
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from .config import MODEL_FILE
+from .mapping import EYE_L, EYE_R
+from .metrics import STAGES as METRIC_STAGES, StageMetrics
+from .overlay import MeshOverlay
+from .tracker import Tracker
+
+logger = logging.getLogger(__name__)
+
+# The Tracker's stages ("serialize" builds the payload, "send" is the UDP
+# send alone), then the preview drawing done here; end-to-end latency is
+# reported separately
+STAGES = tuple(s for s in METRIC_STAGES if s not in ("draw", "preview", "latency")) + ("render",)
+PREVIEW_SIZE = (640, 480)
+
+
+def synthetic_groups(n, seed=0):
+    """n groups with both axes mapped, deterministic for a given seed."""
+    rng = np.random.default_rng(seed)
+    groups = {}
+    for g in range(n):
+        group = {}
+        for axis in ("x", "y"):
+            kind = rng.integers(0, 10)
+            if kind < 6:
+                a, b = rng.integers(0, 468, size=2).tolist()
+                m = {"mode": "2pt", "point_a": a, "point_b": b, "radius_min": 0.0, "radius_max": 0.5}
+            elif kind < 9:
+                a, b = rng.integers(0, 468, size=2).tolist()
+                m = {"mode": "1pt", "point_a": a, "point_b": b, "radius_min": 0.0, "radius_max": 1.0}
+            else:
+                eye = EYE_L if rng.integers(0, 2) else EYE_R
+                m = {"mode": "iris", "point_a": eye["iris"], "point_b": eye["inner"],
+                     "radius_min": 0.0, "radius_max": 0.5}
+            m["lerp_en"] = bool(rng.integers(0, 4) == 0)
+            group[axis] = m
+        groups[f"bench_{g:04d}"] = group
+    return groups
+
+
+def percentiles(samples):
+    if len(samples) == 0:
+        return None
+    a = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(a, (50, 95, 99))
+    return {"mean": round(float(a.mean()), 4), "p50": round(float(p50), 4),
+            "p95": round(float(p95), 4), "p99": round(float(p99), 4), "max": round(float(a.max()), 4)}
+
+
+class Bench:
+    """One benchmark run: a source, a group count and an output format."""
+
+    def __init__(self, config, model_path=MODEL_FILE, fmt="json", render=True, roi=False, max_size=0):
+        self.config = config
+        self.model_path = model_path
+        self.fmt = fmt
+        self.render = render
+        self.roi = roi
+        self.max_size = max_size
+
+        # Sink socket nobody reads: sends behave like real ones, the kernel drops the data
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(("127.0.0.1", 0))
+
+    def _tracker(self, n_groups, window):
+        ip, port = self.sink.getsockname()
+        cfg = dict(self.config, groups=synthetic_groups(n_groups), blender_ip=ip, blender_port=port,
+                   output_format=self.fmt, delta_output=False, roi_crop=self.roi,
+                   inference_max_size=self.max_size, source_realtime=False, source_loop=False,
+                   metrics_window=window)
+        tracker = Tracker(cfg, self.model_path)
+        if not tracker.start():
+            tracker.close()
+            tracker.output.close()
+            raise RuntimeError(f"Could not open {tracker.source.name}")
+        return tracker
+
+    def run(self, n_groups, max_frames=300, warmup=10):
+        tracker = self._tracker(n_groups, max_frames)
+        canvas = np.zeros((PREVIEW_SIZE[1], PREVIEW_SIZE[0], 3), dtype=np.uint8)
+        overlay = MeshOverlay({"mesh": ((0, 255, 0), 1), "active": ((0, 0, 255), 4)})
+
+        latencies, render, frames, faces = [], [], 0, 0
+        clock = time.perf_counter
+        t_start, bytes_start = None, 0
+        try:
+            while frames < max_frames + warmup:
+                if frames == warmup:
+                    # Measure from here on: fresh stage rings, one slot per measured frame
+                    tracker.metrics = StageMetrics(max_frames)
+                    bytes_start = tracker.output.bytes_sent
+                    t_start = clock()
+                t0 = clock()
+                ok, image, t_capture = tracker.read()
+                if not ok:
+                    break
+                frame = tracker.map(tracker.infer(image, t_capture))
+                tracker.emit(frame)
+                t_sent = clock()
+                if self.render and frame.pts is not None:
+                    canvas[:] = 0
+                    overlay.draw(canvas, frame.pts, {"active": tracker.mapping.draw_points})
+                frame.release()
+                frames += 1
+                if frames <= warmup:
+                    continue
+                if frame.pts is not None:
+                    faces += 1
+                    if self.render:
+                        render.append(clock() - t_sent)
+                latencies.append(t_sent - t0)
+
+            elapsed = clock() - t_start if t_start is not None else 0.0
+            stages = {s: percentiles(tracker.metrics.samples(s)) for s in STAGES if s != "render"}
+            stages["render"] = percentiles(render)
+            payload_bytes = tracker.output.bytes_sent - bytes_start
+        finally:
+            tracker.close()
+            tracker.output.close()
+
+        measured = max(0, frames - warmup)
+        return {
+            "groups": n_groups,
+            "frames": measured,
+            "frames_with_face": faces,
+            "throughput_fps": round(measured / elapsed, 2) if elapsed > 0 else None,
+            "latency_ms": percentiles(latencies),
+            "stages_ms": {s: v for s, v in stages.items() if v is not None},
+            "bytes_per_frame": round(payload_bytes / faces, 1) if faces else None,
+        }
+
+    def close(self):
+        self.sink.close()
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(),
+            "numpy": np.__version__, "opencv": cv2.__version__}
+    try:
+        import mediapipe
+        info["mediapipe"] = mediapipe.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ShapeKey Face Tracker pipeline benchmark")
+    parser.add_argument("--source", required=True, help="video file, image directory or landmark .sklm/.npy")
+    parser.add_argument("--model", default=MODEL_FILE, help="face_landmarker.task path")
+    parser.add_argument("--groups", default="1,10,100,1000", help="comma separated group counts")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames per run")
+    parser.add_argument("--warmup", type=int, default=10, help="frames run before measuring")
+    parser.add_argument("--format", choices=("json", "binary"), default="json", help="UDP payload format")
+    parser.add_argument("--no-render", action="store_true", help="skip the preview drawing stage")
+    parser.add_argument("--roi", action="store_true", help="crop inference input to the tracked face")
+    parser.add_argument("--max-size", type=int, default=0, help="downscale inference input to this longest side")
+    parser.add_argument("--output", help="write the results JSON here instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    bench = Bench({"frame_source": args.source}, args.model, args.format, render=not args.no_render,
+                  roi=args.roi, max_size=args.max_size)
+    runs = []
+    try:
+        for n in (int(g) for g in args.groups.split(",") if g.strip()):
+            result = bench.run(n, args.frames, args.warmup)
+            lat = result["latency_ms"] or {}
+            logger.info(f"groups={n} frames={result['frames']} fps={result['throughput_fps']} "
+                        f"latency p50={lat.get('p50')} p95={lat.get('p95')} p99={lat.get('p99')} ms")
+            runs.append(result)
+    finally:
+        bench.close()
+
+    report = {"time": time.time(), "source": args.source, "format": args.format,
+              "environment": environment(), "runs": runs}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        logger.info(f"Results written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
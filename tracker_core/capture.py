@@ -0,0 +1,459 @@
+import glob
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .mapping import NUM_LANDMARKS
+from .recording import open_recording
+
+logger = logging.getLogger(__name__)
+
+# "camera_backend" names -> OpenCV capture API ids
+CAMERA_BACKENDS = {
+    "auto": cv2.CAP_ANY,
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "v4l2": cv2.CAP_V4L2,
+    "avfoundation": cv2.CAP_AVFOUNDATION,
+    "gstreamer": cv2.CAP_GSTREAMER,
+}
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+LANDMARK_EXTENSIONS = (".sklm", ".npy")
+
+
+class FrameSource:
+    """Something the capture stage can read() frames from.
+
+    read() returns (success, frame). Image sources hand out unmirrored BGR
+    frames; `mirror` tells the tracker to mirror them, which it does while
+    converting to RGB (or on the landmarks, see roi.py). Sources with
+    `provides_landmarks` hand out (pts, blendshapes) pairs and the tracker
+    skips inference for them. Finite sources (files) are paced at `fps`
+    when `realtime` is set and otherwise run as fast as the pipeline takes
+    frames; once they run out, is_opened() turns False.
+    """
+
+    provides_landmarks = False
+    live = False  # True for sources that keep producing regardless of the reader
+
+    def __init__(self, name, mirror=False, realtime=True, fps=30.0, loop=False):
+        self.name = name
+        self.mirror = mirror
+        self.realtime = realtime
+        self.fps = fps
+        self.loop = loop
+        self._next_t = None
+
+    @property
+    def lossless(self):
+        """True when every frame should reach the tracker (no drop-oldest)."""
+        return not self.live and not self.realtime
+
+    def _pace(self):
+        """Sleep until the next frame is due (realtime playback only)."""
+        if not self.realtime or not self.fps:
+            return
+        interval = 1.0 / self.fps
+        now = time.monotonic()
+        if self._next_t is not None and self._next_t > now:
+            time.sleep(self._next_t - now)
+            now = self._next_t
+        self._next_t = now + interval
+
+    def open(self):
+        raise NotImplementedError
+
+    def is_opened(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def read_timestamped(self):
+        """(success, frame, t_capture) with t_capture on the time.monotonic() clock."""
+        success, frame = self.read()
+        return success, frame, time.monotonic()
+
+    def release(self):
+        pass
+
+
+def fourcc_to_str(code):
+    code = int(code)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\0") or "?"
+
+
+class Camera(FrameSource):
+    """OpenCV camera that hands out BGR frames (mirrored downstream).
+
+    width / height / fps / fourcc / buffer_size are requested at open time
+    (None leaves the driver default); what the driver actually negotiated is
+    read back, logged and kept in `negotiated`. Every frame is a fresh
+    array: it travels through queues and previews with no owner to say
+    when it could be decoded over.
+    """
+
+    live = True
+
+    def __init__(self, index=0, mirror=True, width=None, height=None, fps=None, fourcc=None,
+                 buffer_size=None, backend="auto"):
+        super().__init__(f"camera {index}", mirror=mirror, realtime=False)
+        self.index = index
+        self.requested = {"width": width, "height": height, "fps": fps, "fourcc": fourcc,
+                          "buffer_size": buffer_size}
+        self.backend = backend
+        self.negotiated = {}
+        self.cap = None
+
+    def open(self):
+        api = CAMERA_BACKENDS.get(str(self.backend).lower())
+        if api is None:
+            logger.warning(f"Unknown camera_backend '{self.backend}', using auto")
+            api = cv2.CAP_ANY
+        logger.info(f"Opening camera index: {self.index} (backend {self.backend})")
+        self.cap = cv2.VideoCapture(self.index, api)
+        if not self.cap.isOpened():
+            logger.error(f"Failed to open camera {self.index}")
+            return False
+        self._configure()
+        return True
+
+    def _configure(self):
+        """Apply the requested settings (FOURCC first, some drivers reset the
+        size when it changes) and log what the driver ended up with."""
+        req, cap = self.requested, self.cap
+        if req["fourcc"]:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*str(req["fourcc"]).ljust(4)[:4]))
+        if req["width"]:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, int(req["width"]))
+        if req["height"]:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(req["height"]))
+        if req["fps"]:
+            cap.set(cv2.CAP_PROP_FPS, float(req["fps"]))
+        if req["buffer_size"] is not None:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, int(req["buffer_size"]))
+
+        got = self.negotiated = {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": round(cap.get(cv2.CAP_PROP_FPS), 2),
+            "fourcc": fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+            "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+            "backend": cap.getBackendName(),
+        }
+        logger.info("Camera {}: {}x{} @ {} fps, {}, buffer {} ({})".format(
+            self.index, got["width"], got["height"], got["fps"], got["fourcc"], got["buffer_size"], got["backend"]))
+        for key, want in req.items():
+            if not want and want != 0:
+                continue
+            have = got[key]
+            if key == "fourcc":
+                same = have.upper() == str(want).upper()
+            else:
+                same = abs(float(have) - float(want)) < 0.5
+            if not same:
+                logger.warning(f"Camera {self.index}: requested {key}={want}, driver gave {have}")
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self):
+        success, image = self.cap.read()
+        if not success:
+            return False, None
+        return True, image
+
+    def read_timestamped(self):
+        # Stamp when grab() returns, before the (possibly MJPG) decode
+        if not self.cap.grab():
+            return False, None, None
+        t_capture = time.monotonic()
+        success, image = self.cap.retrieve()
+        if not success:
+            return False, None, None
+        return True, image, t_capture
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class LatestFrameGrabber(FrameSource):
+    """Drains a live source on its own thread and keeps only the newest frame.
+
+    The driver's queue never fills up, so a slow inference stage always
+    gets the freshest frame (with the time it was grabbed) instead of a
+    backlog; frames replaced before anyone read them are counted in
+    `skipped`. read() waits for a frame newer than the last one returned.
+    """
+
+    live = True
+
+    def __init__(self, source, timeout=1.0):
+        super().__init__(source.name, mirror=source.mirror, realtime=False)
+        self.source = source
+        self.timeout = timeout
+        self.skipped = 0
+        self._slot = None  # (frame, t_capture)
+        self._seq = 0
+        self._read_seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def negotiated(self):
+        return getattr(self.source, "negotiated", None)
+
+    def open(self):
+        if not self.source.open():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return True
+
+    def _grab_loop(self):
+        while self._running:
+            success, frame, t_capture = self.source.read_timestamped()
+            if not success:
+                if not self.source.is_opened():
+                    break
+                time.sleep(0.005)
+                continue
+            with self._cond:
+                if self._slot is not None and self._read_seq < self._seq:
+                    self.skipped += 1
+                self._slot = (frame, t_capture)
+                self._seq += 1
+                self._cond.notify_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def is_opened(self):
+        return self._running and self.source.is_opened()
+
+    def read_timestamped(self):
+        with self._cond:
+            if self._seq == self._read_seq and self._running:
+                self._cond.wait(self.timeout)
+            if self._seq == self._read_seq:
+                return False, None, None
+            self._read_seq = self._seq
+            frame, t_capture = self._slot
+            return True, frame, t_capture
+
+    def read(self):
+        success, frame, _ = self.read_timestamped()
+        return success, frame
+
+    def release(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.source.release()
+
+
+class VideoFileSource(FrameSource):
+    """Frames from a recorded video file, at its own frame rate or flat out."""
+
+    def __init__(self, path, mirror=True, realtime=True, fps=None, loop=False):
+        super().__init__(path, mirror=mirror, realtime=realtime, fps=fps, loop=loop)
+        self.path = path
+        self.cap = None
+
+    def open(self):
+        logger.info(f"Opening video file: {self.path}")
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            logger.error(f"Failed to open video file {self.path}")
+            self.cap = None
+            return False
+        if not self.fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return True
+
+    def is_opened(self):
+        return self.cap is not None
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        success, image = self.cap.read()
+        if not success and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, image = self.cap.read()
+        if not success:
+            logger.info(f"End of video file: {self.path}")
+            self.release()
+            return False, None
+        self._pace()
+        return True, image
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class ImageSequenceSource(FrameSource):
+    """Frames from a directory of still images, in file name order."""
+
+    def __init__(self, directory, mirror=True, realtime=True, fps=30.0, loop=False):
+        super().__init__(directory, mirror=mirror, realtime=realtime, fps=fps, loop=loop)
+        self.directory = directory
+        self.files = []
+        self.pos = 0
+        self._opened = False
+
+    def open(self):
+        self.files = sorted(f for f in glob.glob(os.path.join(self.directory, "*"))
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            logger.error(f"No images found in {self.directory}")
+            return False
+        logger.info(f"Opening image sequence: {self.directory} ({len(self.files)} images)")
+        self.pos = 0
+        self._opened = True
+        return True
+
+    def is_opened(self):
+        return self._opened
+
+    def read(self):
+        while self._opened:
+            if self.pos >= len(self.files):
+                if not self.loop:
+                    logger.info(f"End of image sequence: {self.directory}")
+                    self._opened = False
+                    break
+                self.pos = 0
+            path = self.files[self.pos]
+            self.pos += 1
+            image = cv2.imread(path)
+            if image is None:
+                logger.warning(f"Skipping unreadable image {path}")
+                continue
+            self._pace()
+            return True, image
+        return False, None
+
+    def release(self):
+        self._opened = False
+
+
+class LandmarkReplaySource(FrameSource):
+    """Replays recorded landmarks straight into the mapping stage.
+
+    Reads .sklm recordings (see recording.py), paced by their own
+    timestamps, or plain .npy arrays of shape (frames, 478, 3) paced at
+    `fps`. Both are memory-mapped so long takes don't have to fit in RAM.
+    """
+
+    provides_landmarks = True
+
+    def __init__(self, path, realtime=True, fps=30.0, loop=False):
+        super().__init__(path, realtime=realtime, fps=fps, loop=loop)
+        self.path = path
+        self.frames = None
+        self.times = None
+        self.blendshapes = None
+        self.pos = 0
+        self._t0 = None
+
+    def open(self):
+        try:
+            if self.path.lower().endswith(".npy"):
+                frames = np.load(self.path, mmap_mode="r")
+            else:
+                rec = open_recording(self.path)
+                frames, self.times = rec["pts"], rec["t"]
+                if "bs" in rec.dtype.names:
+                    self.blendshapes = rec["bs"]
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to open landmark file {self.path}: {e}")
+            return False
+        if frames.ndim != 3 or frames.shape[1:] != (NUM_LANDMARKS, 3) or not len(frames):
+            logger.error(f"Landmark file {self.path} has shape {frames.shape}, "
+                         f"expected (frames, {NUM_LANDMARKS}, 3)")
+            return False
+        logger.info(f"Opening landmark replay: {self.path} ({len(frames)} frames)")
+        self.frames = frames
+        self.pos = 0
+        return True
+
+    def is_opened(self):
+        return self.frames is not None
+
+    def _pace_recorded(self):
+        """Sleep until this record's offset from the first one has passed."""
+        now = time.monotonic()
+        if self.pos == 0 or self._t0 is None:
+            self._t0 = now - (self.times[self.pos] - self.times[0])
+            return
+        due = self._t0 + (self.times[self.pos] - self.times[0])
+        if due > now:
+            time.sleep(due - now)
+
+    def read(self):
+        if self.frames is None:
+            return False, None
+        if self.pos >= len(self.frames):
+            if not self.loop:
+                logger.info(f"End of landmark replay: {self.path}")
+                self.frames = None
+                return False, None
+            self.pos = 0
+        if self.times is None:
+            self._pace()
+        elif self.realtime:
+            self._pace_recorded()
+        pts = np.asarray(self.frames[self.pos], dtype=np.float64)
+        bs = None if self.blendshapes is None else np.asarray(self.blendshapes[self.pos], dtype=np.float64)
+        self.pos += 1
+        return True, (pts, bs)
+
+    def release(self):
+        self.frames = None
+
+
+def create_source(config):
+    """Build the frame source named by config["frame_source"].
+
+    None (default) or an int opens that camera index ("camera_index" when
+    unset) with the "camera_*" capture settings, behind a LatestFrameGrabber
+    unless "camera_grabber_thread" is off; a directory is read as an
+    image sequence, a .sklm / .npy file is replayed as landmarks and any
+    other path is opened as a video file.
+    """
+    spec = config.get("frame_source")
+    if spec is None or isinstance(spec, int) or str(spec).isdigit():
+        camera = Camera(int(spec) if spec is not None else config.get("camera_index", 0),
+                        width=config.get("camera_width"), height=config.get("camera_height"),
+                        fps=config.get("camera_fps"), fourcc=config.get("camera_fourcc"),
+                        buffer_size=config.get("camera_buffer_size"),
+                        backend=config.get("camera_backend", "auto"))
+        if config.get("camera_grabber_thread", True):
+            return LatestFrameGrabber(camera)
+        return camera
+
+    path = str(spec)
+    realtime = config.get("source_realtime", True)
+    fps = config.get("source_fps")
+    loop = config.get("source_loop", False)
+    mirror = config.get("source_mirror", True)
+    if os.path.isdir(path):
+        return ImageSequenceSource(path, mirror=mirror, realtime=realtime, fps=fps or 30.0, loop=loop)
+    if path.lower().endswith(LANDMARK_EXTENSIONS):
+        return LandmarkReplaySource(path, realtime=realtime, fps=fps or 30.0, loop=loop)
+    return VideoFileSource(path, mirror=mirror, realtime=realtime, fps=fps, loop=loop)
@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+import sys
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# Next to the EXE when frozen, otherwise the repo root (where main.py lives)
+if getattr(sys, 'frozen', False):
+    APP_DIR = os.path.dirname(sys.executable)
+else:
+    APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.path.join(APP_DIR, "config.json")
+MODEL_FILE = os.path.join(APP_DIR, "face_landmarker.task")
+HAND_MODEL_FILE = os.path.join(APP_DIR, "hand_landmarker.task")
+
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/face_landmarker/face_landmarker/float16/1/face_landmarker.task"
+HAND_MODEL_URL = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
+REF_MAP_URL = "https://raw.githubusercontent.com/google-ai-edge/mediapipe/master/mediapipe/modules/face_geometry/data/canonical_face_model_uv_visualization.png"
+
+DEFAULT_CONFIG = {
+    "blender_ip": "127.0.0.1",
+    "blender_port": 5000,
+    "camera_index": 0,
+    "draw_mesh": True,
+    "groups": {},
+}
+
+
+def default_config():
+    return json.loads(json.dumps(DEFAULT_CONFIG))
+
+
+def load_config(path):
+    """Load a config file, or None if it is missing / unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read config {path}: {e}")
+        return None
+
+
+def save_config(path, config):
+    with open(path, "w") as f:
+        json.dump(config, f, indent=4)
+
+
+def ensure_asset(path, url, user_agent=None):
+    """Download `url` to `path` if the file does not exist yet."""
+    if os.path.exists(path):
+        return path
+    logger.info(f"Downloading {os.path.basename(path)}...")
+    req = urllib.request.Request(url, headers={"User-Agent": user_agent} if user_agent else {})
+    with urllib.request.urlopen(req) as resp, open(path, "wb") as f:
+        f.write(resp.read())
+    logger.info("Download complete.")
+    return path
@@ -0,0 +1,56 @@
+"""Stable IDs for several faces in one camera.
+
+FaceLandmarker returns faces in no particular order, so with two
+performers "face 0" can swap from frame to frame. FaceTracks follows each
+face by the center of its landmarks: detections are matched to the
+nearest live track, new faces take the lowest free ID, and a track that
+stops matching keeps its ID for `max_missing` frames so a performer who
+turns away briefly gets the same groups and output back.
+"""
+import numpy as np
+
+
+class FaceTracks:
+    """Assigns track IDs 0..max_faces-1 to the faces of each frame."""
+
+    def __init__(self, max_faces=2, max_distance=0.2, max_missing=15):
+        self.max_faces = max_faces
+        self.max_distance = max_distance  # normalized image units
+        self.max_missing = max_missing
+        self.centers = np.full((max_faces, 2), np.nan)
+        self.missing = np.zeros(max_faces, dtype=np.intp)
+
+    def assign(self, pts):
+        """Track ID per face for a (faces, N, 3) landmark stack; -1 when
+        every ID is taken."""
+        n = len(pts)
+        ids = np.full(n, -1, dtype=np.intp)
+        live = ~np.isnan(self.centers[:, 0])
+        if n:
+            centers = pts[:, :, :2].mean(axis=1)
+            # Greedy nearest pairs first; a handful of faces needs nothing smarter
+            d = np.linalg.norm(centers[:, None] - self.centers[None], axis=2)
+            d[:, ~live] = np.inf
+            for flat in np.argsort(d, axis=None):
+                f, t = divmod(int(flat), self.max_faces)
+                if d[f, t] > self.max_distance:
+                    break
+                if ids[f] < 0 and t not in ids:
+                    ids[f] = t
+            for f in np.flatnonzero(ids < 0):
+                free = np.flatnonzero(np.isnan(self.centers[:, 0]) & ~np.isin(np.arange(self.max_faces), ids))
+                if free.size:
+                    ids[f] = free[0]
+            matched = ids >= 0
+            self.centers[ids[matched]] = centers[matched]
+
+        seen = np.zeros(self.max_faces, dtype=bool)
+        seen[ids[ids >= 0]] = True
+        self.missing[seen] = 0
+        self.missing[~seen] += 1
+        self.centers[self.missing > self.max_missing] = np.nan
+        return ids
+
+    def reset(self):
+        self.centers[:] = np.nan
+        self.missing[:] = 0
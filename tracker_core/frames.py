@@ -0,0 +1,83 @@
+"""Reusable frame buffers.
+
+RGB conversions are written into arrays from a small pool instead of fresh
+allocations. Nothing is copied to share a frame: inference, the picker
+snapshot and the preview keep a reference to the same array.
+
+Ownership is explicit. acquire() hands out a FrameBuffer lease that its
+taker holds once; whoever keeps the array longer retain()s the lease (or,
+for tracker frames, the TrackerFrame) and release()s it when done. The
+pool only reissues a buffer nobody holds, so a frame still queued, shown
+or snapshotted is never overwritten. A lease that is never released only
+drops out of reuse.
+"""
+import threading
+
+import numpy as np
+
+
+class FrameBuffer:
+    """One pooled array and how many holders it has (see FramePool)."""
+
+    __slots__ = ("array", "holders", "_lock")
+
+    def __init__(self, array, lock):
+        self.array = array
+        self.holders = 1
+        self._lock = lock
+
+    def retain(self):
+        with self._lock:
+            if self.holders <= 0:
+                raise RuntimeError("FrameBuffer retained after its last release")
+            self.holders += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            if self.holders <= 0:
+                raise RuntimeError("FrameBuffer released more often than it was held")
+            self.holders -= 1
+
+
+class FramePool:
+    """Hands out preallocated arrays, reusing ones nobody holds any more.
+
+    When every pooled buffer of the right shape is still held a new one
+    is allocated; it joins the pool while there is room (evicting a free
+    buffer of another shape if need be), otherwise it is simply garbage
+    collected after use. `allocated` counts arrays created so far. Safe
+    to acquire and release from different threads.
+    """
+
+    def __init__(self, size=6):
+        self.size = size
+        self.allocated = 0
+        self._buffers = []
+        self._lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        """A FrameBuffer of `shape` / `dtype` that nobody else holds, held once by the caller."""
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            stale = None
+            for i, buf in enumerate(self._buffers):
+                if buf.holders:
+                    continue
+                if buf.array.shape == shape and buf.array.dtype == dtype:
+                    buf.holders = 1
+                    return buf
+                if stale is None:
+                    stale = i
+            buf = FrameBuffer(np.empty(shape, dtype), self._lock)
+            self.allocated += 1
+            if len(self._buffers) < self.size:
+                self._buffers.append(buf)
+            elif stale is not None:
+                self._buffers[stale] = buf  # e.g. the ROI crop changed size
+            return buf
+
+    def clear(self):
+        with self._lock:
+            self._buffers = []
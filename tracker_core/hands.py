@@ -0,0 +1,69 @@
+"""Finger curls from HandLandmarker output.
+
+config "hand_setup" gives every finger a tip and a base landmark (MediaPipe
+hand indices, 0 = wrist) and the tip-base distance range it moves through,
+in normalized image units: rmin with the finger curled in, rmax stretched
+out. All fingers of all detected hands are evaluated in one pass and go
+out as ordinary groups, "hand_<l|r>_<finger>", with the curl (0 open ..
+1 closed) on x and 0 on y, so the Blender side drives them like any face
+group.
+"""
+import numpy as np
+
+NUM_HAND_LANDMARKS = 21
+FINGERS = ("thumb", "index", "middle", "ring", "pinky")
+
+DEFAULT_HAND_SETUP = {
+    "thumb": {"tip": 4, "base": 0, "rmin": 0.05, "rmax": 0.15},
+    "index": {"tip": 8, "base": 0, "rmin": 0.05, "rmax": 0.15},
+    "middle": {"tip": 12, "base": 0, "rmin": 0.05, "rmax": 0.15},
+    "ring": {"tip": 16, "base": 0, "rmin": 0.05, "rmax": 0.15},
+    "pinky": {"tip": 20, "base": 0, "rmin": 0.05, "rmax": 0.15},
+}
+
+
+def hand_side(handedness, mirrored=True):
+    """"l" / "r", the performer's own side, for a hand's handedness categories.
+
+    MediaPipe labels hands as if the image were mirrored (a selfie view);
+    for an unmirrored image the label is the other hand.
+    """
+    left = bool(handedness) and handedness[0].category_name.lower().startswith("l")
+    return "l" if left == bool(mirrored) else "r"
+
+
+class HandMapping:
+    """Compiled hand_setup table; evaluate() turns (hands, 21, 3) landmarks into curls."""
+
+    def __init__(self, setup=None):
+        self.update(setup)
+
+    def update(self, setup):
+        setup = DEFAULT_HAND_SETUP if not setup else setup
+        fingers = [f for f in FINGERS if f in setup] + [f for f in setup if f not in FINGERS]
+        self.fingers = fingers
+        self.tip = np.array([int(setup[f].get("tip", 0)) for f in fingers], dtype=np.intp)
+        self.base = np.array([int(setup[f].get("base", 0)) for f in fingers], dtype=np.intp)
+        self.rmin = np.array([float(setup[f].get("rmin", 0.05)) for f in fingers])
+        span = np.array([float(setup[f].get("rmax", 0.15)) for f in fingers]) - self.rmin
+        span[span == 0] = 1e-6
+        self.span = span
+        self._names = {}
+
+    def names(self, sides):
+        """Group names for hands in `sides` order, cached per side combination."""
+        sides = tuple(sides)
+        names = self._names.get(sides)
+        if names is None:
+            names = [f"hand_{s}_{f}" for s in sides for f in self.fingers]
+            self._names[sides] = names
+        return names
+
+    def evaluate(self, pts, sides):
+        """(names, (hands * fingers, 2) values) for a (hands, 21, 3) landmark stack."""
+        d = pts[:, self.tip] - pts[:, self.base]
+        dist = np.sqrt(np.einsum("hfi,hfi->hf", d, d))
+        curl = 1.0 - np.clip((dist - self.rmin) / self.span, 0.0, 1.0)
+        values = np.zeros((curl.size, 2))
+        values[:, 0] = curl.ravel()
+        return self.names(sides), values
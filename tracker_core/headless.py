@@ -0,0 +1,258 @@
+"""Headless service mode: capture -> FaceLandmarker -> mapping -> UDP.
+
+Imports no GUI toolkit and opens no preview window; status (including the
+rolling per-stage timings from metrics.py) goes to the log and, optionally,
+to a JSON metrics file rewritten every interval and/or a local HTTP
+endpoint (--metrics-port).
+
+    python main.py --headless [--config config.json] [--camera 1] [--port 5001]
+    python main.py --headless --source take.mp4 --fast --metrics-file bench.json
+
+With a file source (video, image directory or landmark recording) the run ends
+when the input does, after a final status report. A config with "cameras"
+runs one worker process per camera instead (see multicam.py).
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+from .config import CONFIG_FILE, HAND_MODEL_URL, MODEL_FILE, MODEL_URL, ensure_asset, load_config
+from .metrics import MetricsServer
+from .multicam import MultiCameraTracker
+from .pipeline import create_pipeline
+from .tracker import Tracker
+
+logger = logging.getLogger(__name__)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ShapeKey Face Tracker (headless)")
+    parser.add_argument("--headless", action="store_true", help="run without any GUI (default here)")
+    parser.add_argument("--config", default=CONFIG_FILE, help="config JSON to load")
+    parser.add_argument("--model", default=MODEL_FILE, help="face_landmarker.task path")
+    parser.add_argument("--camera", type=int, help="override camera_index")
+    parser.add_argument("--source", help="video file, image directory or landmark .sklm/.npy instead of a camera")
+    parser.add_argument("--fast", action="store_true", help="read file sources as fast as possible, no frame drops")
+    parser.add_argument("--loop", action="store_true", help="restart file sources at the end")
+    parser.add_argument("--record", help="record tracked landmarks to this .sklm file")
+    parser.add_argument("--record-blendshapes", action="store_true", help="include blendshape scores in --record")
+    parser.add_argument("--ip", help="override blender_ip")
+    parser.add_argument("--port", type=int, help="override blender_port")
+    parser.add_argument("--metrics-file", help="write status JSON here every interval")
+    parser.add_argument("--metrics-port", type=int, help="serve live status JSON on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="seconds between status reports")
+    parser.add_argument("--log-file", help="also log to this file")
+    parser.add_argument("--log-level", default="INFO")
+    return parser
+
+
+def write_metrics(path, metrics):
+    """Atomically replace `path` with the metrics JSON."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp, path)
+
+
+class HeadlessRunner:
+    """Runs a Tracker until stopped and periodically reports its status."""
+
+    def __init__(self, tracker, pipeline, stats_interval=5.0, metrics_file=None):
+        self.tracker = tracker
+        self.pipeline = pipeline
+        self.stats_interval = stats_interval
+        self.metrics_file = metrics_file
+        self.stop_event = threading.Event()
+        self.started_at = time.time()
+        self.frames = 0
+        self.faces = 0
+        self.last_frame_t = self.started_at
+        self._latencies = []
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def status(self, window_frames=None, window_s=None):
+        """Status dict; without a report window (HTTP endpoint) fps is the rolling one."""
+        lat = sorted(self._latencies)
+        pipeline = self.tracker.status(self.pipeline)
+        if window_frames is None:
+            fps = pipeline["fps"]
+        else:
+            fps = round(window_frames / window_s, 2) if window_s > 0 else 0.0
+        return {
+            "time": time.time(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "source": self.tracker.source.name,
+            "capture": getattr(self.tracker.source, "negotiated", None),
+            "target": "{}:{}".format(*self.tracker.output.target_address),
+            "fps": fps,
+            "latency_ms_p50": round(lat[len(lat) // 2], 2) if lat else None,
+            "latency_ms_max": round(lat[-1], 2) if lat else None,
+            "frames": self.frames,
+            "frames_with_face": self.faces,
+            # Summed over every performer's output, not just the main one
+            "packets_sent": pipeline["counters"]["packets_sent"],
+            "send_errors": pipeline["counters"]["send_errors"],
+            "frames_suppressed": pipeline["counters"]["frames_suppressed"],
+            "groups": len(self.tracker.mapping.names),
+            "stages_ms": pipeline["stages_ms"],
+            "counters": pipeline["counters"],
+            "dropped": pipeline["dropped"],
+        }
+
+    def report(self, window_frames, window_s):
+        st = self.status(window_frames, window_s)
+        self._latencies = []
+        logger.info(f"fps={st['fps']} latency_p50={st['latency_ms_p50']}ms frames={st['frames']} faces={st['frames_with_face']} "
+                    f"sent={st['packets_sent']} send_errors={st['send_errors']}")
+        logger.info(self.tracker.metrics.summary())
+        if self.metrics_file:
+            try:
+                write_metrics(self.metrics_file, st)
+            except OSError as e:
+                logger.warning(f"Could not write metrics file: {e}")
+
+    def _count(self, frame):
+        self.frames += 1
+        self.last_frame_t = time.time()
+        if frame.pts is not None:
+            self.faces += 1
+        if frame.latency_ms is not None:
+            self._latencies.append(frame.latency_ms)
+
+    def run(self):
+        source = self.tracker.source
+        window_start, window_frames = time.time(), 0
+        self.pipeline.start()
+        while not self.stop_event.is_set() and source.is_opened() and self.pipeline.alive:
+            frame = self.pipeline.next_frame()
+            if frame is not None:
+                self._count(frame)
+                frame.release()
+                window_frames += 1
+
+            now = time.time()
+            if now - window_start >= self.stats_interval:
+                self.report(window_frames, now - window_start)
+                window_start, window_frames = now, 0
+
+        if not self.pipeline.alive:
+            logger.error(f"Tracking stopped after an error: {self.pipeline.failed!r}")
+            self.report(window_frames, time.time() - window_start)
+        elif not self.stop_event.is_set():
+            # File source ran out: collect the frames still in flight
+            while (frame := self.pipeline.next_frame(0.5)) is not None:
+                self._count(frame)
+                frame.release()
+                window_frames += 1
+            self.report(window_frames, self.last_frame_t - window_start)
+
+
+def run_cameras(config, args):
+    """Multi-camera mode: drive the coordinator and report until stopped or
+    every worker has finished."""
+    if args.record:
+        logger.warning("--record is not supported with several cameras, ignoring it")
+    ensure_asset(args.model, MODEL_URL)
+    coordinator = MultiCameraTracker(config, args.model)
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *a: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *a: stop_event.set())
+    server = None
+    if args.metrics_port:
+        server = MetricsServer(coordinator.status, args.metrics_port)
+        server.start()
+
+    def report():
+        st = coordinator.status()
+        cams = " ".join(f"{name}={c['state']}/{c['frames']}" for name, c in st["cameras"].items())
+        logger.info(f"fps={st['fps']} cameras[{cams}]")
+        logger.info(coordinator.metrics.summary())
+        if args.metrics_file:
+            try:
+                write_metrics(args.metrics_file, dict(st, time=time.time()))
+            except OSError as e:
+                logger.warning(f"Could not write metrics file: {e}")
+
+    try:
+        coordinator.start(logging.getLogger().level)
+        last_report = time.time()
+        while not stop_event.is_set():
+            if coordinator.step(0.1) is None and not coordinator.running:
+                break
+            if time.time() - last_report >= args.stats_interval:
+                report()
+                last_report = time.time()
+        report()
+    finally:
+        if server is not None:
+            server.stop()
+        coordinator.close()
+        logger.info("Multi-camera tracker stopped.")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    handlers = [logging.StreamHandler()]
+    if args.log_file:
+        handlers.append(logging.FileHandler(args.log_file))
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.INFO),
+                        format='%(asctime)s [%(levelname)s] %(message)s', handlers=handlers)
+
+    config = load_config(args.config)
+    if config is None:
+        logger.error(f"Could not load config: {args.config}")
+        return 2
+    if args.camera is not None:
+        config["camera_index"] = args.camera
+    if args.source:
+        config["frame_source"] = args.source
+    if args.fast:
+        config["source_realtime"] = False
+    if args.loop:
+        config["source_loop"] = True
+    if args.ip:
+        config["blender_ip"] = args.ip
+    if args.port:
+        config["blender_port"] = args.port
+
+    if config.get("cameras"):
+        return run_cameras(config, args)
+
+    tracker = Tracker(config, args.model)
+    if args.record:
+        tracker.start_recording(args.record, args.record_blendshapes)
+    if not tracker.source.provides_landmarks:
+        ensure_asset(args.model, MODEL_URL)
+    if tracker.hands_active:
+        ensure_asset(tracker.hand_model_path, HAND_MODEL_URL)
+    if not tracker.start():
+        tracker.close()
+        return 1
+
+    runner = HeadlessRunner(tracker, create_pipeline(tracker, config), args.stats_interval, args.metrics_file)
+    server = None
+    if args.metrics_port:
+        server = MetricsServer(runner.status, args.metrics_port)
+        server.start()
+    signal.signal(signal.SIGINT, runner.stop)
+    signal.signal(signal.SIGTERM, runner.stop)
+    ip, port = tracker.output.target_address
+    logger.info(f"Headless tracker running: {len(config.get('groups', {}))} groups -> {ip}:{port}")
+    try:
+        runner.run()
+    finally:
+        if server is not None:
+            server.stop()
+        runner.pipeline.stop()
+        tracker.close()
+        tracker.output.close()
+        logger.info("Headless tracker stopped.")
+    return 0 if runner.pipeline.alive else 1
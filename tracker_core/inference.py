@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+
+import mediapipe as mp
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+logger = logging.getLogger(__name__)
+
+
+def create_face_landmarker(model_path, running_mode=vision.RunningMode.VIDEO, num_faces=1,
+                           blendshapes=False, result_callback=None, pose=False):
+    options = vision.FaceLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_path=model_path),
+        running_mode=running_mode,
+        num_faces=num_faces,
+        min_face_detection_confidence=0.5,
+        min_face_presence_confidence=0.5,
+        min_tracking_confidence=0.5,
+        output_face_blendshapes=blendshapes,
+        output_facial_transformation_matrixes=pose,
+        result_callback=result_callback,
+    )
+    return vision.FaceLandmarker.create_from_options(options)
+
+
+def create_hand_landmarker(model_path, running_mode=vision.RunningMode.VIDEO, num_hands=2):
+    options = vision.HandLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_path=model_path),
+        running_mode=running_mode,
+        num_hands=num_hands,
+        min_hand_detection_confidence=0.5,
+        min_hand_presence_confidence=0.5,
+        min_tracking_confidence=0.5,
+    )
+    return vision.HandLandmarker.create_from_options(options)
+
+
+class FaceInference:
+    """FaceLandmarker in VIDEO mode with strictly increasing timestamps."""
+
+    def __init__(self, model_path, num_faces=1, blendshapes=False, pose=False):
+        logger.info(f"Initializing MediaPipe with model: {model_path}")
+        self.model_path = model_path
+        self.num_faces = num_faces
+        self.blendshapes = blendshapes
+        self.pose = pose  # output facial transformation matrixes
+        self.landmarker = self._create()
+        self._last_ts = -1
+
+    def _create(self):
+        return create_face_landmarker(self.model_path, num_faces=self.num_faces,
+                                      blendshapes=self.blendshapes, pose=self.pose)
+
+    def set_blendshapes(self, enabled):
+        """Switch blendshape output on or off; recreates the landmarker.
+
+        The blendshape head costs inference time, so it only runs while
+        something reads the scores. Call from the thread that feeds frames.
+        """
+        enabled = bool(enabled)
+        if enabled == self.blendshapes:
+            return
+        logger.info(f"Blendshape output {'enabled' if enabled else 'disabled'}, recreating landmarker")
+        self.landmarker.close()
+        self.blendshapes = enabled
+        self.landmarker = self._create()
+
+    def next_timestamp(self):
+        # detect_for_video / detect_async reject repeated timestamps, which
+        # int(time()*1000) produces whenever two frames land in the same ms
+        ts = int(time.monotonic() * 1000)
+        if ts <= self._last_ts:
+            ts = self._last_ts + 1
+        self._last_ts = ts
+        return ts
+
+    def detect(self, rgb_frame, timestamp_ms=None):
+        if timestamp_ms is None:
+            timestamp_ms = self.next_timestamp()
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        return self.landmarker.detect_for_video(mp_image, timestamp_ms)
+
+    def close(self):
+        self.landmarker.close()
+
+
+class HandInference(FaceInference):
+    """HandLandmarker in VIDEO mode, next to whichever face landmarker runs.
+
+    Keeps its own timestamps; it is synchronous in every pipeline mode.
+    """
+
+    def __init__(self, model_path, num_hands=2):
+        logger.info(f"Initializing MediaPipe hands with model: {model_path}")
+        self.model_path = model_path
+        self.num_hands = num_hands
+        self.landmarker = create_hand_landmarker(model_path, num_hands=num_hands)
+        self._last_ts = -1
+
+
+class LiveStreamInference(FaceInference):
+    """FaceLandmarker in LIVE_STREAM mode.
+
+    submit() returns immediately; MediaPipe runs the graph on its own thread,
+    drops frames that arrive while it is busy and hands finished results to
+    `on_result(result, context)`, where context is whatever was submitted
+    with the frame; the context of every dropped frame goes to
+    `on_dropped(context)`.
+    """
+
+    def __init__(self, model_path, num_faces=1, blendshapes=False, pose=False):
+        logger.info(f"Initializing MediaPipe (live stream) with model: {model_path}")
+        self.model_path = model_path
+        self.num_faces = num_faces
+        self.blendshapes = blendshapes
+        self.pose = pose
+        self.on_result = None
+        self.on_dropped = None
+        self.dropped = 0
+        self._pending = {}  # timestamp_ms -> context
+        self._lock = threading.Lock()
+        self._last_ts = -1
+        self.landmarker = self._create()
+
+    def _create(self):
+        return create_face_landmarker(
+            self.model_path, running_mode=vision.RunningMode.LIVE_STREAM, num_faces=self.num_faces,
+            blendshapes=self.blendshapes, result_callback=self._on_result, pose=self.pose)
+
+    def submit(self, rgb_frame, context=None):
+        ts = self.next_timestamp()
+        with self._lock:
+            self._pending[ts] = context
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        self.landmarker.detect_async(mp_image, ts)
+
+    def detect(self, rgb_frame, timestamp_ms=None):
+        raise RuntimeError("LiveStreamInference is asynchronous, use submit()")
+
+    def _on_result(self, result, mp_image, timestamp_ms):
+        with self._lock:
+            context = self._pending.pop(timestamp_ms, None)
+            # Anything older was skipped by MediaPipe's flow limiter
+            stale = [ts for ts in self._pending if ts < timestamp_ms]
+            skipped = [self._pending.pop(ts) for ts in stale]
+            self.dropped += len(stale)
+        if self.on_dropped is not None:
+            for dropped in skipped:
+                if dropped is not None:
+                    self.on_dropped(dropped)
+        if self.on_result is not None:
+            self.on_result(result, context)
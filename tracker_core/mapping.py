@@ -0,0 +1,436 @@
+import numpy as np
+
+from .smoothing import AxisLerp, Ema
+
+# MediaPipe landmark indices for iris tracking
+EYE_R = {"iris": 468, "inner": 133, "outer": 33, "top": 159, "bottom": 145}
+EYE_L = {"iris": 473, "inner": 362, "outer": 263, "top": 386, "bottom": 374}
+
+NUM_LANDMARKS = 478  # 468 face + 10 iris
+
+# FaceLandmarker blendshape categories, in the order of its output scores
+BLENDSHAPE_NAMES = (
+    "_neutral", "browDownLeft", "browDownRight", "browInnerUp", "browOuterUpLeft",
+    "browOuterUpRight", "cheekPuff", "cheekSquintLeft", "cheekSquintRight", "eyeBlinkLeft",
+    "eyeBlinkRight", "eyeLookDownLeft", "eyeLookDownRight", "eyeLookInLeft", "eyeLookInRight",
+    "eyeLookOutLeft", "eyeLookOutRight", "eyeLookUpLeft", "eyeLookUpRight", "eyeSquintLeft",
+    "eyeSquintRight", "eyeWideLeft", "eyeWideRight", "jawForward", "jawLeft",
+    "jawOpen", "jawRight", "mouthClose", "mouthDimpleLeft", "mouthDimpleRight",
+    "mouthFrownLeft", "mouthFrownRight", "mouthFunnel", "mouthLeft", "mouthLowerDownLeft",
+    "mouthLowerDownRight", "mouthPressLeft", "mouthPressRight", "mouthPucker", "mouthRight",
+    "mouthRollLower", "mouthRollUpper", "mouthShrugLower", "mouthShrugUpper", "mouthSmileLeft",
+    "mouthSmileRight", "mouthStretchLeft", "mouthStretchRight", "mouthUpperUpLeft", "mouthUpperUpRight",
+    "noseSneerLeft", "noseSneerRight",
+)
+NUM_BLENDSHAPES = len(BLENDSHAPE_NAMES)
+_BLENDSHAPE_INDEX = {name: i for i, name in enumerate(BLENDSHAPE_NAMES)}
+
+# Face reference points used to normalize distances / build the face axes
+FACE_LEFT, FACE_RIGHT, FACE_TOP, FACE_BOTTOM = 234, 454, 10, 152
+
+# --- Mode Codes ---
+MODE_NONE = 0
+MODE_2PT = 1
+MODE_1PT = 2
+MODE_IRIS = 3
+MODE_BLEND = 4
+
+# Both front ends save their own spelling of the mode, map them all here
+MODE_CODES = {
+    "None": MODE_NONE,
+    "2pt": MODE_2PT,
+    "2pt (Dist)": MODE_2PT,
+    "box": MODE_2PT,  # old configs
+    "1pt": MODE_1PT,
+    "1pt (Proj)": MODE_1PT,
+    "iris": MODE_IRIS,
+    "blendshape": MODE_BLEND,
+}
+
+MODE_NAMES = {MODE_NONE: "None", MODE_2PT: "2pt", MODE_1PT: "1pt", MODE_IRIS: "iris", MODE_BLEND: "blendshape"}
+
+AXES = ("x", "y")
+IRIS_EMA_ALPHA = 0.30
+DEFAULT_BLINK_RATIO = 0.25
+
+# (eye, role) index table: row 0 = R, row 1 = L; cols = iris, inner, outer, top, bottom
+_EYE_ROLES = ("iris", "inner", "outer", "top", "bottom")
+EYE_INDEX = np.array([[EYE_R[r] for r in _EYE_ROLES],
+                      [EYE_L[r] for r in _EYE_ROLES]], dtype=np.intp)
+
+
+def parse_mode(mode):
+    """Return the numeric mode code for a saved mode string."""
+    return MODE_CODES.get(str(mode), MODE_2PT)
+
+
+def canonical_mode(mode):
+    """Normalize any saved mode spelling to "None" / "2pt" / "1pt" / "iris" / "blendshape"."""
+    return MODE_NAMES[parse_mode(mode)]
+
+
+def blendshape_index(value):
+    """Score index for a blendshape name (or index); None if unknown."""
+    if isinstance(value, str) and not value.isdigit():
+        return _BLENDSHAPE_INDEX.get(value)
+    try:
+        i = int(value)
+    except (ValueError, TypeError):
+        return None
+    return i if 0 <= i < NUM_BLENDSHAPES else None
+
+
+def _group_snapshot(mappings):
+    """Shallow copy of one group's mappings and of each axis dict, so compile()
+    sees a consistent group while the UI thread edits the original."""
+    if not isinstance(mappings, dict):
+        return mappings
+    return {k: dict(v) if isinstance(v, dict) else v for k, v in mappings.items()}
+
+
+def landmarks_to_array(face_landmarks, out=None):
+    """Pack a MediaPipe landmark list into an (N, 3) float array."""
+    n = len(face_landmarks)
+    if out is None or out.shape[0] != n:
+        out = np.empty((n, 3), dtype=np.float64)
+    for i, lm in enumerate(face_landmarks):
+        out[i, 0] = lm.x
+        out[i, 1] = lm.y
+        out[i, 2] = lm.z
+    return out
+
+
+# Image axes (x right, y down, z away) <-> MediaPipe's metric model/camera
+# axes (x right, y up, z toward the viewer)
+_IMAGE_TO_MODEL = np.diag((1.0, -1.0, -1.0))
+
+
+def head_pose_matrix(facial_matrix, width, height, mirrored=False):
+    """4x4 that takes normalized landmarks into a head-local frame.
+
+    facial_matrix is FaceLandmarker's facial transformation matrix
+    (canonical face -> camera). The landmarks are scaled to pixels (z
+    like x) and un-rotated by the head rotation, keeping image axis
+    directions, so a face looks frontal whatever its pose. Scale is left
+    as is; every mode divides by the face width anyway. mirrored: the
+    landmarks were mirrored after inference (mirror_landmarks), so the
+    rotation is mirrored too.
+    """
+    u, _, vt = np.linalg.svd(np.asarray(facial_matrix, dtype=np.float64)[:3, :3])
+    rot = u @ vt  # drop any scale in the matrix
+    if mirrored:
+        rot = rot * np.array([[1.0, -1.0, -1.0], [-1.0, 1.0, 1.0], [-1.0, 1.0, 1.0]])
+    m = np.eye(4)
+    m[:3, :3] = _IMAGE_TO_MODEL @ rot.T @ _IMAGE_TO_MODEL * (width, height, width)
+    return m
+
+
+def _eye_for(point_a, point_b):
+    """Pick the eye row (0 = R, 1 = L) an iris axis refers to."""
+    if point_a == EYE_L["iris"]:
+        return 1
+    if point_a == EYE_R["iris"]:
+        return 0
+    return 1 if point_b in EYE_L.values() else 0
+
+
+class MappingEngine:
+    """Evaluates every group axis of a config in a few batched array ops.
+
+    The groups dict is compiled into packed arrays (one row per group axis)
+    the first time it is evaluated after `update()`, so UI threads only flip a
+    flag and the tracker thread does the (re)compile. Internally every row
+    also names the face it reads (always 0 here), which is what lets
+    MultiFaceMapping run several performers through the same pass.
+    """
+
+    num_faces = 1
+
+    def __init__(self, groups=None, blink_ratio=DEFAULT_BLINK_RATIO, iris_y_gain=1.0):
+        self.blink_ratio = blink_ratio
+        self.iris_y_gain = iris_y_gain
+        self.iris_ema = Ema((self.num_faces, 2, 2), IRIS_EMA_ALPHA)  # [face, eye, axis]
+        self.version = 0  # bumped by every compile
+        self.lerp = AxisLerp()
+        self._groups = {}
+        self._dirty = True
+        self.names = []
+        self.send_eps = np.zeros(0)
+        self._index = {}
+        self.points_x = set()
+        self.points_y = set()
+        self.uses_blendshapes = False
+        self.update(groups or {})
+
+    def update(self, groups):
+        """Bind a (possibly new) groups dict and schedule a recompile."""
+        self._groups = groups
+        self._dirty = True
+
+    def invalidate(self):
+        self._dirty = True
+
+    def refresh(self):
+        """Recompile now if the groups changed (evaluate() does this itself)."""
+        if self._dirty:
+            self.compile()
+
+    def index_of(self, group_name):
+        return self._index.get(group_name, -1)
+
+    @property
+    def draw_points(self):
+        return self.points_x | self.points_y
+
+    def _items(self):
+        """(key, mappings, face) per group, in row order, copied from the
+        bound dict (the UI thread may edit it while this compiles)."""
+        return [(name, _group_snapshot(mappings), 0) for name, mappings in list(self._groups.items())]
+
+    def compile(self):
+        """Pack the bound groups dict into flat per-axis arrays."""
+        self._dirty = False
+        self.version += 1
+        items = self._items()
+        n = len(items) * 2
+
+        mode = np.zeros(n, dtype=np.int8)
+        pa = np.zeros(n, dtype=np.intp)
+        pb = np.zeros(n, dtype=np.intp)
+        eye = np.zeros(n, dtype=np.intp)
+        bs = np.zeros(n, dtype=np.intp)
+        rmin = np.zeros(n)
+        rmax = np.ones(n)
+        omin = np.zeros(n)
+        omax = np.ones(n)
+        sens = np.ones(n)
+        exp_p = np.full(n, 1.2)
+        lerp_en = np.zeros(n, dtype=bool)
+        lerp_fac = np.full(n, 0.15)
+        send_eps = np.full(len(items), np.nan)  # NaN = output's default
+        points = (set(), set())
+
+        for g, (name, mappings, _) in enumerate(items):
+            try:
+                send_eps[g] = float((mappings or {}).get("send_epsilon", np.nan))
+            except (ValueError, TypeError, KeyError):
+                pass
+            for a, axis in enumerate(AXES):
+                m = (mappings or {}).get(axis) or {}
+                i = g * 2 + a
+                code = parse_mode(m.get("mode", "2pt"))
+                if code == MODE_BLEND:
+                    # Reads a blendshape score, no landmarks involved
+                    k = blendshape_index(m.get("blendshape"))
+                    if k is None:
+                        continue
+                    bs[i] = k
+                    m = dict(m, point_a=0, point_b=0)
+                elif m.get("point_a") is None or m.get("point_b") is None:
+                    continue
+                try:
+                    ia, ib = int(m["point_a"]), int(m["point_b"])
+                    if not (0 <= ia < NUM_LANDMARKS and 0 <= ib < NUM_LANDMARKS):
+                        continue
+                    rmin[i] = float(m.get("radius_min", m.get("min", 0.0)))
+                    rmax[i] = float(m.get("radius_max", m.get("max", 1.0)))
+                    omin[i] = float(m.get("out_min", 0.0))
+                    omax[i] = float(m.get("out_max", 1.0))
+                    sens[i] = float(m.get("sens", 1.0))
+                    exp_p[i] = float(m.get("exp_power", 1.2))
+                    lerp_en[i] = bool(m.get("lerp_en", False))
+                    lerp_fac[i] = float(m.get("lerp_fac", 0.15))
+                except (ValueError, TypeError, KeyError):
+                    continue
+
+                mode[i], pa[i], pb[i] = code, ia, ib
+                if code == MODE_IRIS:
+                    eye[i] = _eye_for(ia, ib)
+                    points[a].update(EYE_INDEX[eye[i]].tolist())
+                elif code not in (MODE_NONE, MODE_BLEND):
+                    points[a].update((ia, ib))
+
+        # Carry lerp state over by group name so edits don't snap values
+        old_index = self._index
+        self.names = [name for name, _, _ in items]
+        self._index = {name: g for g, name in enumerate(self.names)}
+        self.lerp.reindex([old_index.get(name, -1) for name in self.names])
+
+        self.mode = mode
+        self.face = np.repeat(np.array([f for _, _, f in items], dtype=np.intp), 2)
+        self.axis_id = np.tile(np.arange(2, dtype=np.intp), len(items))
+        self.idx_2pt = np.flatnonzero(mode == MODE_2PT)
+        self.idx_1pt = np.flatnonzero(mode == MODE_1PT)
+        self.idx_iris = np.flatnonzero(mode == MODE_IRIS)
+        self.idx_blend = np.flatnonzero(mode == MODE_BLEND)
+        self.bs = bs
+        self.uses_blendshapes = bool(self.idx_blend.size)
+        self.signed = (mode == MODE_1PT) | (mode == MODE_IRIS)
+        self.pa, self.pb, self.eye = pa, pb, eye
+        self.rmin, self.rmax, self.omin, self.omax = rmin, rmax, omin, omax
+        span = rmax - rmin
+        self.range_ok = span > 0
+        self.span = np.where(self.range_ok, span, 1.0)
+        self.sens, self.exp_p = sens, exp_p
+        self.lerp_en, self.lerp_fac = lerp_en.reshape(-1, 2), lerp_fac.reshape(-1, 2)
+        self.group_active = (mode != MODE_NONE).reshape(-1, 2).any(axis=1)
+        self.send_eps = send_eps
+        self.points_x, self.points_y = points
+
+    def evaluate(self, pts, blendshapes=None, pose=None):
+        """Map one frame of landmarks ((N, 3) array) to group outputs.
+
+        blendshapes: the frame's 52 scores, read by blendshape axes (which
+        stay at 0 without them). pose: a head_pose_matrix(); all landmarks
+        go through it once and every mode then works in head-local,
+        pose-invariant coordinates. Returns (out, raw), both shaped
+        (n_groups, 2) with columns x, y.
+        """
+        self.refresh()
+        if blendshapes is not None:
+            blendshapes = np.asarray(blendshapes)[None]
+        raw = self._raw(pts[None], blendshapes, None if pose is None else pose[None])
+        return self._finish(raw)
+
+    def _raw(self, pts, blendshapes=None, poses=None, present=None):
+        """Raw values of every row for a (faces, N, 3) landmark stack.
+
+        Row r reads face self.face[r]; `present` (faces,) masks faces that
+        were not detected this frame (their rows come out as garbage).
+        """
+        if poses is not None:
+            pts = np.einsum("fij,fnj->fni", poses[:, :3, :3], pts) + poses[:, None, :3, 3]
+
+        raw = np.zeros(self.mode.shape[0])
+        face = self.face
+
+        fx = pts[:, FACE_RIGHT] - pts[:, FACE_LEFT]
+        face_width = np.sqrt(np.einsum("fi,fi->f", fx, fx))
+        face_width[face_width <= 0] = 1.0
+
+        if self.idx_2pt.size:
+            i = self.idx_2pt
+            f = face[i]
+            d = pts[f, self.pa[i]] - pts[f, self.pb[i]]
+            raw[i] = np.sqrt(np.einsum("ij,ij->i", d, d)) / face_width[f]
+
+        if self.idx_1pt.size:
+            # Project origin->target onto the face X (ear to ear) / Y (top to chin) axis
+            i = self.idx_1pt
+            f = face[i]
+            v = pts[f, self.pa[i]] - pts[f, self.pb[i]]
+            if poses is not None:
+                # Head-local already: the face axes are the image axes
+                raw[i] = v[np.arange(i.size), self.axis_id[i]] / face_width[f] * 10.0
+            else:
+                fy = pts[:, FACE_BOTTOM] - pts[:, FACE_TOP]
+                fy_len = np.sqrt(np.einsum("fi,fi->f", fy, fy))
+                fy_len[fy_len <= 0] = 1.0
+                face_axes = np.stack((fx / face_width[:, None], fy / fy_len[:, None]), axis=1)
+                raw[i] = np.einsum("ij,ij->i", v, face_axes[f, self.axis_id[i]]) / face_width[f] * 10.0
+
+        if self.idx_iris.size:
+            raw[self.idx_iris] = self._eval_iris(pts, present)
+
+        if self.idx_blend.size and blendshapes is not None and blendshapes.shape[-1] == NUM_BLENDSHAPES:
+            # Scores are already 0..1 expressions; just pick them
+            i = self.idx_blend
+            raw[i] = blendshapes[face[i], self.bs[i]]
+        return raw
+
+    def _finish(self, raw, rows=None):
+        """Range map + lerp raw row values into (out, raw), each (n_groups, 2).
+
+        rows: optional (n_groups,) mask of groups whose smoothing state may
+        advance (groups of absent faces keep theirs).
+        """
+        # Range map: signed modes map |raw| and restore the sign afterwards
+        mag = np.where(self.signed, np.abs(raw), raw)
+        t = np.clip((mag - self.rmin) / self.span, 0.0, 1.0)
+        t[~self.range_ok] = 0.0
+        val = (self.omin + (self.omax - self.omin) * t) * self.sens
+        val = np.where(self.signed & (raw < 0), -val, val)
+        val[self.mode == MODE_NONE] = 0.0
+        out = np.clip(val, -1.0, 1.0).reshape(-1, 2)
+
+        out = self.lerp.apply(out, self.lerp_en, self.lerp_fac, rows)
+        return out, raw.reshape(-1, 2)
+
+    def _eval_iris(self, pts, present=None):
+        e = pts[:, EYE_INDEX]  # (faces, 2 eyes, 5 roles, 3)
+        iris, inner, outer, top, bot = (e[:, :, k] for k in range(5))
+        ex = inner - outer
+        eye_width = np.sqrt(np.einsum("fei,fei->fe", ex, ex))
+        eye_width[eye_width <= 0] = 1.0
+        cy = (top[..., 1] + bot[..., 1]) / 2.0
+
+        # X: iris offset from eye center projected on the outer->inner axis
+        delta = np.stack((iris[..., 0] - (inner[..., 0] + outer[..., 0]) / 2.0,
+                          iris[..., 1] - cy,
+                          iris[..., 2] - (inner[..., 2] + outer[..., 2]) / 2.0), axis=-1)
+        inst_x = np.einsum("fei,fei->fe", delta, ex) / (eye_width * eye_width)
+        inst_y = (iris[..., 1] - cy) / eye_width * self.iris_y_gain
+        inst = np.stack((inst_x, inst_y), axis=-1)
+
+        # Blink guard: hold the last smoothed value while the eye is closing
+        is_open = np.abs(top[..., 1] - bot[..., 1]) >= self.blink_ratio * eye_width
+        if present is not None:
+            is_open &= present[:, None]
+        ema = self.iris_ema.update(inst, is_open)
+
+        i = self.idx_iris
+        r = ema[self.face[i], self.eye[i], self.axis_id[i]]
+        return np.copysign(np.abs(r) ** self.exp_p[i], r)
+
+    def to_payload(self, out):
+        """Build the {group: {"x", "y"}} UDP payload. Every group is sent;
+        ones without a mapped axis read 0.0, as they always have."""
+        return {name: {"x": v[0], "y": v[1]} for name, v in zip(self.names, out.tolist())}
+
+
+class MultiFaceMapping(MappingEngine):
+    """Evaluates several performers' groups, one face each, in one pass.
+
+    engines[p] holds performer p's groups (and stays what the UI edits and
+    the output for that performer reads group names from). Their
+    rows are concatenated into a single packed table with a face index per
+    row, so adding a performer adds rows, not another round of array ops.
+    """
+
+    def __init__(self, engines, blink_ratio=DEFAULT_BLINK_RATIO, iris_y_gain=1.0):
+        self.engines = list(engines)
+        self.num_faces = len(self.engines)
+        self._versions = None
+        super().__init__({}, blink_ratio, iris_y_gain)
+
+    def _items(self):
+        return [((p, name), _group_snapshot(mappings), p)
+                for p, engine in enumerate(self.engines)
+                for name, mappings in list(engine._groups.items())]
+
+    def refresh(self):
+        for engine in self.engines:
+            engine.refresh()
+        versions = [engine.version for engine in self.engines]
+        if self._dirty or versions != self._versions:
+            self._versions = versions
+            self.compile()
+            # Row ranges of each performer, in group units
+            sizes = [len(engine.names) for engine in self.engines]
+            self.offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.intp)
+            self.uses_blendshapes = any(engine.uses_blendshapes for engine in self.engines)
+
+    def evaluate_faces(self, pts, present, blendshapes=None, poses=None):
+        """Map a (performers, N, 3) stack, row p being performer p's face.
+
+        present: (performers,) bool, False where that face wasn't found.
+        blendshapes (performers, 52) / poses (performers, 4, 4) as in
+        evaluate(). Returns a list with (out, raw) per performer, None for
+        absent ones.
+        """
+        self.refresh()
+        present = np.asarray(present, dtype=bool)
+        raw = self._raw(pts, blendshapes, poses, present)
+        out, raw = self._finish(raw, present[self.face[::2]])
+        return [(out[a:b], raw[a:b]) if present[p] else None
+                for p, (a, b) in enumerate(zip(self.offsets[:-1], self.offsets[1:]))]
@@ -0,0 +1,142 @@
+"""Always-on hot path instrumentation.
+
+Every stage adds its duration to a small ring per stage; snapshot() turns
+the rings into mean / p95 / max milliseconds for the log, the DPG
+telemetry text, the headless metrics file and the HTTP endpoint. Adding
+a sample is an array store and an index bump, cheap enough to leave on.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stages in pipeline order; front ends add "draw" and "preview". "latency" is
+# capture -> sent, end to end.
+STAGES = ("capture", "convert", "inference", "hands", "mapping", "serialize", "send", "draw", "preview", "latency")
+
+
+class StageMetrics:
+    """Rolling per-stage timings and event counters, safe to feed from any thread.
+
+    One lock guards the rings and counters; readers copy under it and do
+    the statistics outside, so a feeding stage waits for a copy at most.
+    Set counters with count() / set(), not through `counters` directly.
+    """
+
+    def __init__(self, window=120):
+        self.window = window
+        self._samples = {}
+        self._pos = {}
+        self._ticks = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.started_at = time.monotonic()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            buf = self._samples.get(stage)
+            if buf is None:
+                buf = self._samples[stage] = np.full(self.window, np.nan)
+                self._pos[stage] = 0
+            i = self._pos[stage]
+            buf[i % self.window] = seconds
+            self._pos[stage] = i + 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        """Set a counter to an absolute value (totals kept elsewhere)."""
+        with self._lock:
+            self.counters[name] = value
+
+    def tick(self):
+        """Mark one finished frame (for the rolling fps)."""
+        self._ticks.append(time.monotonic())
+
+    @property
+    def fps(self):
+        ticks = self._ticks
+        if len(ticks) < 2 or ticks[-1] <= ticks[0]:
+            return 0.0
+        return (len(ticks) - 1) / (ticks[-1] - ticks[0])
+
+    def samples(self, stage):
+        """A stage's durations in the current window, in seconds."""
+        with self._lock:
+            buf = self._samples.get(stage)
+            buf = np.empty(0) if buf is None else buf.copy()
+        return buf[~np.isnan(buf)]
+
+    def stage_ms(self):
+        """{stage: {"mean", "p95", "max"}} in ms over the current window."""
+        with self._lock:
+            samples = {stage: buf.copy() for stage, buf in self._samples.items()}
+        stats = {}
+        order = [s for s in STAGES if s in samples] + [s for s in samples if s not in STAGES]
+        for stage in order:
+            buf = samples[stage]
+            vals = buf[~np.isnan(buf)] * 1000.0
+            if not vals.size:
+                continue
+            stats[stage] = {"mean": round(float(vals.mean()), 3),
+                            "p95": round(float(np.percentile(vals, 95)), 3),
+                            "max": round(float(vals.max()), 3)}
+        return stats
+
+    def snapshot(self, **extra):
+        with self._lock:
+            counters = dict(self.counters)
+        snap = {"fps": round(self.fps, 2), "stages_ms": self.stage_ms(), "counters": counters}
+        snap.update(extra)
+        return snap
+
+    def summary(self):
+        """One log line: stage means and the counters."""
+        stages = " ".join(f"{s}={v['mean']:.1f}" for s, v in self.stage_ms().items())
+        with self._lock:
+            counters = sorted(self.counters.items())
+        counters = " ".join(f"{k}={v}" for k, v in counters)
+        return f"stages_ms[{stages}] {counters}".strip()
+
+
+class MetricsServer:
+    """Serves a status callable as JSON on http://host:port/metrics."""
+
+    def __init__(self, status, port, host="127.0.0.1"):
+        self.status = status
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.rstrip("/") not in ("", "/metrics"):
+                    handler.send_error(404)
+                    return
+                body = json.dumps(self.status()).encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", "application/json")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, fmt, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        host, port = self.httpd.server_address[:2]
+        logger.info(f"Metrics endpoint: http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
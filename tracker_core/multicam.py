@@ -0,0 +1,226 @@
+"""Several cameras, one worker process each.
+
+MediaPipe inference and the Python side of the pipeline share one GIL, so
+more cameras in one process do not use more cores. With "cameras" in the
+config every camera gets a worker process running capture and
+FaceLandmarker (a single-face Tracker with no groups of its own); workers
+publish their latest landmarks into shared memory (see shm.py) and the
+coordinator maps every camera in one batched pass and sends UDP:
+
+    "cameras": [
+        {"name": "front", "camera_index": 0},
+        {"name": "left", "camera_index": 1, "groups": {...}},
+        {"name": "right", "camera_index": 2, "blender_port": 5010}
+    ]
+
+A camera entry overrides any top-level key for its worker (source,
+resolution, roi_crop, ...). Like performers, a camera without "groups"
+uses the main ones and without a port sends to blender_port plus its
+index.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+import numpy as np
+
+from .mapping import (
+    DEFAULT_BLINK_RATIO, NUM_BLENDSHAPES, NUM_LANDMARKS, MappingEngine, MultiFaceMapping,
+)
+from .metrics import StageMetrics
+from .output import create_output
+from .shm import STATE_ENDED, STATE_FAILED, STATE_RUNNING, LandmarkSlots
+from .tracker import Tracker
+
+logger = logging.getLogger(__name__)
+
+# Keys a worker never inherits from the coordinator's config
+_COORDINATOR_KEYS = ("cameras", "performers", "groups")
+
+
+def worker_config(config, camera, blendshapes=False):
+    """The single-camera config a worker's Tracker runs with."""
+    cfg = {k: v for k, v in config.items() if k not in _COORDINATOR_KEYS}
+    cfg.update({k: v for k, v in camera.items() if k not in _COORDINATOR_KEYS})
+    cfg.update(groups={}, num_faces=1, active_models=["Face"], delta_output=False,
+               output_blendshapes=blendshapes, shared_ring=False)
+    return cfg
+
+
+def camera_worker(index, config, model_path, slots_name, count, stop_event, log_level=logging.INFO):
+    """Worker process body: capture + FaceLandmarker, results into slot `index`."""
+    # Ctrl-C reaches the whole process group; the coordinator stops the
+    # workers through stop_event so each one ends its slot cleanly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=log_level, format=f'%(asctime)s [%(levelname)s] [{config.get("name", index)}] %(message)s')
+    slots = LandmarkSlots(count, slots_name)
+    tracker = None
+    try:
+        tracker = Tracker(config, model_path)
+        if not tracker.start():
+            logger.error(f"Could not open {tracker.source.name}")
+            slots.set_state(index, STATE_FAILED)
+            return
+        slots.set_state(index, STATE_RUNNING)
+        while not stop_event.is_set() and tracker.source.is_opened():
+            frame = tracker.step()
+            if frame is None:
+                time.sleep(0.005)
+                continue
+            t = frame.t_capture if frame.t_capture is not None else time.monotonic()
+            slots.write(index, t, frame.pts, frame.blendshapes, frame.pose)
+            frame.release()
+        slots.set_state(index, STATE_ENDED)
+    except Exception:
+        logger.exception("Camera worker crashed")
+        slots.set_state(index, STATE_FAILED)
+    finally:
+        if tracker is not None:
+            tracker.close()
+            tracker.output.close()
+        slots.close()
+
+
+class MultiCameraTracker:
+    """Coordinator for one worker process per camera: mapping and UDP output.
+
+    step() waits for any camera to publish, then maps every camera with a
+    new frame at once and sends each to its own output.
+    """
+
+    def __init__(self, config, model_path):
+        self.config = config
+        self.model_path = model_path
+        self.cameras = config["cameras"]
+        iris = dict(blink_ratio=config.get("iris_blink_ratio", DEFAULT_BLINK_RATIO),
+                    iris_y_gain=config.get("iris_y_gain", 1.0))
+        ip, port = config.get("blender_ip", "127.0.0.1"), config.get("blender_port", 5000)
+        engines = []
+        self.outputs = []
+        self.names = []
+        for i, cam in enumerate(self.cameras):
+            engines.append(MappingEngine(cam.get("groups", config.get("groups", {})), **iris))
+            self.outputs.append(create_output(config, cam.get("blender_ip", ip), cam.get("blender_port", port + i)))
+            self.names.append(cam.get("name", f"camera{i}"))
+        self.multi = MultiFaceMapping(engines, **iris)
+        self.head_pose = config.get("head_pose_normalize", False)
+        self.metrics = StageMetrics(config.get("metrics_window", 120))
+        self.slots = None
+        self.workers = []
+        self._stop = None
+        self._seen = np.zeros(len(self.cameras), dtype=np.uint64)
+
+    def start(self, log_level=logging.INFO):
+        """Create the shared slots and spawn one worker per camera."""
+        self.multi.refresh()
+        n = len(self.cameras)
+        self.slots = LandmarkSlots(n)
+        ctx = multiprocessing.get_context("spawn")  # MediaPipe is not fork-safe
+        self._stop = ctx.Event()
+        # Workers start with SIGINT ignored (kept across exec), so a Ctrl-C
+        # while they are still importing doesn't kill them mid-startup either
+        main_thread = threading.current_thread() is threading.main_thread()
+        if main_thread:
+            previous = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            for i, cam in enumerate(self.cameras):
+                cfg = worker_config(self.config, cam, self.multi.engines[i].uses_blendshapes)
+                p = ctx.Process(target=camera_worker, name=f"camera-{self.names[i]}", daemon=True,
+                                args=(i, cfg, self.model_path, self.slots.name, n, self._stop, log_level))
+                p.start()
+                self.workers.append(p)
+        finally:
+            if main_thread:
+                signal.signal(signal.SIGINT, previous)
+        logger.info(f"Started {n} camera workers: {', '.join(self.names)}")
+
+    @property
+    def running(self):
+        """False once every worker has ended or died."""
+        states = self.slots.array["state"]
+        return any(p.is_alive() and states[i] < STATE_ENDED for i, p in enumerate(self.workers))
+
+    def step(self, timeout=0.1):
+        """Map and send the cameras that published since the last call.
+
+        Returns {camera index: (out, raw) or None without a face}, or None
+        when nothing arrived within `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        new = self.slots.changed(self._seen)
+        while not new.size:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.001)
+            new = self.slots.changed(self._seen)
+
+        t0 = time.perf_counter()
+        self.multi.refresh()
+        n = len(self.cameras)
+        pts = np.zeros((n, NUM_LANDMARKS, 3))
+        present = np.zeros(n, dtype=bool)
+        blendshapes = np.zeros((n, NUM_BLENDSHAPES)) if self.multi.uses_blendshapes else None
+        poses = np.tile(np.eye(4), (n, 1, 1)) if self.head_pose else None
+        t_capture = {}
+        for i in new.tolist():
+            record = self.slots.read(i)
+            if record is None:
+                continue
+            self._seen[i] = record["seq"][0]
+            t_capture[i] = record["t_capture"][0]
+            if record["present"][0]:
+                present[i] = True
+                pts[i] = record["pts"][0]
+                if blendshapes is not None:
+                    blendshapes[i] = record["blendshapes"][0]
+                if poses is not None:
+                    poses[i] = record["pose"][0]
+            else:
+                self.metrics.count("no_face")
+        mapped = self.multi.evaluate_faces(pts, present, blendshapes, poses)
+        t1 = time.perf_counter()
+        self.metrics.add("mapping", t1 - t0)
+
+        batches = [(self.outputs[i], self.outputs[i].pack_values(self.multi.engines[i], mapped[i][0]))
+                   for i in np.flatnonzero(present).tolist()]
+        t2 = time.perf_counter()
+        for output, packets in batches:
+            output.send_packets(packets)
+        now = time.monotonic()
+        self.metrics.add("serialize", t2 - t1)
+        self.metrics.add("send", time.perf_counter() - t2)
+        for t in t_capture.values():
+            self.metrics.add("latency", now - t)
+            self.metrics.tick()
+        return {i: mapped[i] for i in t_capture}
+
+    def status(self):
+        """Metrics snapshot plus per-camera worker state and frame counts."""
+        m = self.metrics
+        m.set("packets_sent", sum(o.packets_sent for o in self.outputs))
+        m.set("send_errors", sum(o.send_errors for o in self.outputs))
+        m.set("frames_suppressed", sum(o.frames_suppressed for o in self.outputs))
+        slots = self.slots.array
+        state_names = ("starting", "running", "ended", "failed")
+        cameras = {self.names[i]: {"state": state_names[int(slots["state"][i])],
+                                   "frames": int(slots["frames"][i]),
+                                   "alive": p.is_alive(),
+                                   "target": "{}:{}".format(*self.outputs[i].target_address)}
+                   for i, p in enumerate(self.workers)}
+        return m.snapshot(cameras=cameras)
+
+    def close(self):
+        if self._stop is not None:
+            self._stop.set()
+        for p in self.workers:
+            p.join(timeout=5.0)
+            if p.is_alive():
+                p.terminate()
+        self.workers = []
+        for output in self.outputs:
+            output.close()
+        if self.slots is not None:
+            self.slots.close()
+            self.slots = None
@@ -0,0 +1,156 @@
+import json
+import logging
+import socket
+import time
+
+import numpy as np
+
+from .wire import BinaryEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class DeltaFilter:
+    """Picks the groups worth sending this frame.
+
+    A group goes out when its x or y moved more than its epsilon since the
+    value last sent for it. Every `keyframe_interval` seconds (and whenever
+    the groups change) everything is sent, so receivers that joined
+    late or dropped packets resynchronize.
+    """
+
+    def __init__(self, epsilon=0.002, keyframe_interval=1.0):
+        self.epsilon = epsilon
+        self.keyframe_interval = keyframe_interval
+        self._names = None
+        self._last = None
+        self._last_key_t = 0.0
+
+    def select(self, names, values, eps=None, now=None):
+        """None for a full keyframe, otherwise the indices that changed.
+
+        eps: optional per-group epsilons, NaN meaning "use the default".
+        """
+        now = time.monotonic() if now is None else now
+        if (names is not self._names and names != self._names) or \
+                now - self._last_key_t >= self.keyframe_interval:
+            self._names = names
+            self._last = values.copy()
+            self._last_key_t = now
+            return None
+        if eps is None:
+            th = self.epsilon
+        else:
+            th = np.where(np.isnan(eps), self.epsilon, eps)[:, None]
+        changed = np.flatnonzero((np.abs(values - self._last) > th).any(axis=1))
+        self._last[changed] = values[changed]
+        return changed
+
+
+class UdpOutput:
+    """Sends mapped group values to the Blender add-on over UDP.
+
+    fmt "json" sends the {group: {"x", "y"}} dict as text; "binary" sends
+    the SKFT packets described in wire.py.
+    """
+
+    def __init__(self, ip="127.0.0.1", port=5000, timeout=2.0, fmt="json", table_interval=1.0,
+                 delta_filter=None):
+        self.target_address = (ip, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(timeout)
+        self.fmt = fmt
+        self.encoder = BinaryEncoder(table_interval) if fmt == "binary" else None
+        self.delta = delta_filter
+        self.frames_suppressed = 0
+        self.send_errors = 0
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    def _sendto(self, data):
+        try:
+            self.sock.sendto(data, self.target_address)
+            self.packets_sent += 1
+            self.bytes_sent += len(data)
+            return True
+        except OSError as e:
+            self.send_errors += 1
+            if self.send_errors == 1 or self.send_errors % 100 == 0:
+                logger.warning(f"UDP send failed ({self.send_errors}x): {e}")
+            return False
+
+    def send(self, payload):
+        """Send a ready-made {group: {"x", "y"}} dict as JSON."""
+        return self._sendto(self._json(payload))
+
+    @staticmethod
+    def _json(payload):
+        return json.dumps(payload).encode('utf-8')
+
+    def send_values(self, mapping, out, timestamp=None, extra=None):
+        """Send every group of an evaluated (n_groups, 2) array
+        (pack_values() then send_packets())."""
+        return self.send_packets(self.pack_values(mapping, out, timestamp, extra))
+
+    def send_packets(self, packets):
+        """Send datagrams from pack_values(); False if there were none or any failed."""
+        sent = bool(packets)
+        for packet in packets:
+            sent = self._sendto(packet) and sent
+        return sent
+
+    def pack_values(self, mapping, out, timestamp=None, extra=None):
+        """Datagrams for every group of an evaluated (n_groups, 2) array,
+        empty when there is nothing to send (or the delta filter held it back).
+
+        out may be None (no face) when `extra`, a (names, (n, 2) values)
+        pair such as the hand curls, is appended to the same payload.
+        """
+        names = mapping.names if out is not None else []
+        values = out if out is not None else np.zeros((0, 2))
+        eps = mapping.send_eps if out is not None else np.zeros(0)
+        if extra is not None and extra[0]:
+            names = names + extra[0]
+            values = np.concatenate((values, extra[1]))
+            eps = np.concatenate((eps, np.full(len(extra[0]), np.nan)))
+        else:
+            extra = None
+        if not names:
+            return []
+
+        changed = None
+        if self.delta is not None:
+            changed = self.delta.select(names, values, eps)
+            if changed is not None and changed.size == 0:
+                self.frames_suppressed += 1
+                return []
+
+        if self.encoder is None:
+            if changed is None:
+                if extra is None:
+                    return [self._json(mapping.to_payload(out))]
+                return [self._json({n: {"x": v[0], "y": v[1]} for n, v in zip(names, values.tolist())})]
+            vals = values[changed].tolist()
+            return [self._json({names[i]: {"x": v[0], "y": v[1]} for i, v in zip(changed.tolist(), vals)})]
+        return self.encoder.encode(names, values, timestamp, changed)
+
+    def request_groups(self):
+        """Ask Blender for its shape-key groups. Raises socket.timeout on no reply."""
+        req = json.dumps({"type": "GET_GROUPS"})
+        self.sock.sendto(req.encode('utf-8'), self.target_address)
+        data, addr = self.sock.recvfrom(2048)
+        resp = json.loads(data.decode('utf-8'))
+        if resp.get("type") == "GROUPS":
+            return resp.get("groups", [])
+        return None
+
+    def close(self):
+        self.sock.close()
+
+
+def create_output(config, ip, port):
+    """UdpOutput for one target with the config's format and delta settings."""
+    delta = None
+    if config.get("delta_output", False):
+        delta = DeltaFilter(config.get("send_epsilon", 0.002), config.get("keyframe_interval", 1.0))
+    return UdpOutput(ip, port, fmt=config.get("output_format", "json"), delta_filter=delta)
@@ -0,0 +1,175 @@
+"""Preview helpers: a batched landmark overlay, point hover lookup, a
+redraw rate cap and a check for minimized / background preview windows.
+
+All landmarks go to pixel coordinates in one array op and every point of
+a role is drawn at once by stamping a precomputed disk sprite: the sprite
+offsets are added to the pixel coordinates, clipped to the image and
+written with a single fancy-index assignment. Roles are drawn in order,
+so highlighted points always end up on top of the plain mesh.
+"""
+import os
+import time
+
+import numpy as np
+
+try:
+    from mediapipe.tasks.python.vision import FaceLandmarksConnections
+except ImportError:  # older mediapipe: reduced mode draws active points only
+    FaceLandmarksConnections = None
+
+
+def _contour_points():
+    if FaceLandmarksConnections is None:
+        return np.zeros(0, dtype=np.intp)
+    idx = {i for c in FaceLandmarksConnections.FACE_LANDMARKS_CONTOURS for i in (c.start, c.end)}
+    return np.array(sorted(idx), dtype=np.intp)
+
+
+# Face oval, eyes, brows and lips: what reduced mode keeps of the mesh
+CONTOUR_POINTS = _contour_points()
+
+
+def disk_offsets(radius):
+    """(k, 2) integer (dy, dx) offsets of a filled disk, like cv2.circle(.., -1)."""
+    r = int(radius)
+    d = np.arange(-r, r + 1)
+    dy, dx = np.meshgrid(d, d, indexing="ij")
+    inside = dy * dy + dx * dx <= r * r  # same pixels as cv2.circle's filled disk
+    return np.column_stack((dy[inside], dx[inside]))
+
+
+class MeshOverlay:
+    """Draws landmarks into a BGR image, colored by role.
+
+    styles: ordered {role: ((b, g, r), radius)}; later roles draw on top.
+    "mesh" is every landmark without another role.
+    """
+
+    def __init__(self, styles, reduced=False):
+        self.styles = styles
+        self.reduced = reduced
+        self._sprites = {radius: disk_offsets(radius) for _, radius in styles.values()}
+
+    def to_pixels(self, pts, width, height):
+        """(N, 2) int pixel coordinates of normalized landmarks."""
+        px = np.empty((pts.shape[0], 2), dtype=np.intp)
+        np.multiply(pts[:, 0], width, out=px[:, 0], casting="unsafe")
+        np.multiply(pts[:, 1], height, out=px[:, 1], casting="unsafe")
+        return px
+
+    def stamp(self, image, px, color, radius):
+        """Draw filled disks at every (x, y) in px in one assignment."""
+        if not len(px):
+            return
+        h, w = image.shape[:2]
+        off = self._sprites.get(radius)
+        if off is None:
+            off = self._sprites[radius] = disk_offsets(radius)
+        ys = (px[:, 1, None] + off[None, :, 0]).ravel()
+        xs = (px[:, 0, None] + off[None, :, 1]).ravel()
+        ok = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+        image[ys[ok], xs[ok]] = color
+
+    def draw(self, image, pts, roles):
+        """Draw landmarks pts ((N, 3) normalized) into image.
+
+        roles: {role: index array or set of landmark ids} for the non-mesh
+        roles; ids may repeat across roles, the last style wins.
+        """
+        h, w = image.shape[:2]
+        px = self.to_pixels(pts, w, h)
+        n = len(px)
+
+        marked = np.zeros(n, dtype=bool)
+        role_idx = {}
+        for role in self.styles:
+            if role == "mesh":
+                continue
+            idx = roles.get(role)
+            if idx is None or not len(idx):
+                continue
+            idx = np.fromiter(idx, dtype=np.intp) if isinstance(idx, (set, frozenset)) else np.asarray(idx)
+            idx = idx[(idx >= 0) & (idx < n)]
+            role_idx[role] = idx
+            marked[idx] = True
+
+        for role, (color, radius) in self.styles.items():
+            if role == "mesh":
+                if self.reduced:
+                    idx = CONTOUR_POINTS[CONTOUR_POINTS < n]
+                    idx = idx[~marked[idx]]
+                else:
+                    idx = np.flatnonzero(~marked)
+            else:
+                idx = role_idx.get(role)
+                if idx is None:
+                    continue
+            self.stamp(image, px[idx], color, radius)
+        return px
+
+
+def nearest_point(pts, x, y, max_dist=0.05):
+    """Index of the landmark nearest to normalized (x, y), or -1 when none
+    is within max_dist. Works for live and replayed frames alike (pts)."""
+    if pts is None or not len(pts):
+        return -1
+    d = np.hypot(pts[:, 0] - x, pts[:, 1] - y)
+    i = int(np.argmin(d))
+    return i if d[i] < max_dist else -1
+
+
+def window_hidden(title):
+    """Whether the top-level window called `title` is out of sight.
+
+    True while it is minimized or another application has the foreground
+    (a window of this process in front, e.g. the Tk controls, still
+    counts as in sight), False while shown. None where the OS can't say:
+    off Windows, or when no such window exists; callers then fall back to
+    their toolkit's own check.
+    """
+    if os.name != 'nt':
+        return None
+    import ctypes
+    from ctypes import wintypes
+    user32 = ctypes.windll.user32
+    hwnd = user32.FindWindowW(None, title)
+    if not hwnd:
+        return None
+    if user32.IsIconic(hwnd):
+        return True
+    foreground = user32.GetForegroundWindow()
+    if foreground == hwnd:
+        return False
+    pid = wintypes.DWORD()
+    user32.GetWindowThreadProcessId(foreground, ctypes.byref(pid))
+    return pid.value != os.getpid()
+
+
+class PreviewThrottle:
+    """Caps how often the preview is redrawn, independent of the tracking rate.
+
+    Tracking and UDP output never wait on the preview; the front ends ask
+    ready() for each tracked frame and skip all preview work when it says
+    no. `paused` (window minimized / unfocused) skips every frame.
+    """
+
+    def __init__(self, max_hz=15.0):
+        self.max_hz = max_hz
+        self.paused = False
+        self.skipped = 0
+        self._next_t = 0.0
+
+    def ready(self, now=None):
+        if self.paused:
+            self.skipped += 1
+            return False
+        if not self.max_hz:
+            return True
+        now = time.monotonic() if now is None else now
+        if now < self._next_t:
+            self.skipped += 1
+            return False
+        interval = 1.0 / self.max_hz
+        # Keep the cadence steady, but don't burst to catch up after a stall
+        self._next_t = max(self._next_t + interval, now)
+        return True
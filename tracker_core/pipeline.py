@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from .tracker import TrackerFrame
+
+logger = logging.getLogger(__name__)
+
+
+class DropOldestQueue:
+    """Bounded hand-off queue that discards the oldest item when full.
+
+    Producers never block, so a slow consumer only ever sees recent items
+    and the number of discarded ones is counted in `dropped` (and handed to
+    `on_drop`, e.g. to release a frame). put(block=True) waits for room
+    instead, for file sources that must not lose frames.
+    """
+
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item, block=False):
+        old = None
+        with self._cond:
+            while block and len(self._items) >= self.maxsize and not self._closed:
+                self._cond.wait(0.1)
+            if len(self._items) >= self.maxsize:
+                old = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        if old is not None and self.on_drop is not None:
+            self.on_drop(old)
+
+    def get(self, timeout=None):
+        """Next item, or None on timeout / after close()."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+            return None
+
+    def close(self):
+        """Wake waiting consumers; items still queued go to `on_drop`."""
+        with self._cond:
+            self._closed = True
+            left, self._items = list(self._items), deque()
+            self._cond.notify_all()
+        if self.on_drop is not None:
+            for item in left:
+                self.on_drop(item)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SyncPipeline:
+    """Everything on the caller's thread, one frame per next_frame() call.
+
+    An exception from a stage stops the pipeline: it is logged, kept in
+    `failed` and `alive` turns False, so callers stop polling.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.failed = None
+
+    @property
+    def alive(self):
+        return self.failed is None
+
+    def start(self):
+        pass
+
+    def next_frame(self, timeout=None):
+        if self.failed is not None:
+            return None
+        try:
+            frame = self.tracker.step()
+        except Exception as e:
+            logger.exception("Tracking pipeline crashed")
+            self.failed = e
+            return None
+        if frame is None:
+            time.sleep(0.01)
+            return None
+        self.tracker.emit(frame)
+        return frame
+
+    @property
+    def dropped(self):
+        return {}
+
+    def stop(self):
+        pass
+
+
+class StagedPipeline:
+    """Capture, inference and mapping/output each on their own thread.
+
+    Stages are joined by drop-oldest queues, so throughput is bound by the
+    slowest stage rather than the sum of all of them, and the UDP send
+    never waits on preview drawing. The caller is the preview stage: it
+    pulls finished (already sent) frames with next_frame() and release()s
+    each one when done with it; frames dropped on the way are released
+    here. A stage that crashes stops the whole pipeline; its exception is
+    kept in `failed`.
+    """
+
+    def __init__(self, tracker, queue_size=1):
+        self.tracker = tracker
+        self.failed = None
+        self.infer_q = DropOldestQueue(queue_size)
+        self.map_q = DropOldestQueue(queue_size, on_drop=TrackerFrame.release)
+        self.preview_q = DropOldestQueue(queue_size, on_drop=TrackerFrame.release)
+        self._running = threading.Event()
+        self._threads = []
+
+    def _stages(self):
+        return (("capture", self._capture_loop),
+                ("inference", self._inference_loop),
+                ("output", self._output_loop))
+
+    @property
+    def alive(self):
+        return self.failed is None
+
+    def start(self):
+        self._running.set()
+        for name, target in self._stages():
+            t = threading.Thread(target=self._guard, args=(name, target), name=f"tracker-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _guard(self, name, target):
+        try:
+            target()
+        except Exception as e:
+            logger.exception(f"Pipeline stage '{name}' crashed")
+            self.failed = e
+            self.stop()
+
+    def _capture_loop(self):
+        source = self.tracker.source
+        while self._running.is_set():
+            success, image, t_capture = self.tracker.read()
+            if not success:
+                time.sleep(0.005)
+                continue
+            self.infer_q.put((image, t_capture), block=source.lossless)
+
+    def _inference_loop(self):
+        while self._running.is_set():
+            item = self.infer_q.get(timeout=0.1)
+            if item is None:
+                continue
+            image, t_capture = item
+            self.map_q.put(self.tracker.infer(image, t_capture), block=self.tracker.source.lossless)
+
+    def _output_loop(self):
+        while self._running.is_set():
+            frame = self.map_q.get(timeout=0.1)
+            if frame is None:
+                continue
+            self.tracker.map(frame)
+            self.tracker.emit(frame)
+            self.preview_q.put(frame, block=self.tracker.source.lossless)
+
+    def next_frame(self, timeout=0.1):
+        return self.preview_q.get(timeout)
+
+    @property
+    def dropped(self):
+        return {"inference": self.infer_q.dropped, "mapping": self.map_q.dropped,
+                "preview": self.preview_q.dropped}
+
+    def stop(self):
+        self._running.clear()
+        for q in (self.infer_q, self.map_q, self.preview_q):
+            q.close()
+        current = threading.current_thread()
+        for t in self._threads:
+            if t is not current:
+                t.join(timeout=2.0)
+        self._threads = []
+
+
+class LiveStreamPipeline(StagedPipeline):
+    """StagedPipeline with MediaPipe's LIVE_STREAM mode as the inference stage.
+
+    The capture thread hands each frame to detect_async and goes straight
+    back to the camera; results arrive on MediaPipe's callback thread and
+    feed the mapping/output stage. Frames that arrive while the graph is
+    busy are dropped by MediaPipe rather than queued.
+    """
+
+    def _stages(self):
+        self.tracker.inference.on_result = self._on_result
+        self.tracker.inference.on_dropped = TrackerFrame.release
+        return (("capture", self._capture_loop),
+                ("output", self._output_loop))
+
+    def _capture_loop(self):
+        while self._running.is_set():
+            success, image, t_capture = self.tracker.read()
+            if not success:
+                time.sleep(0.005)
+                continue
+            frame = self.tracker.submit(image, t_capture)
+            if frame is not None:
+                self.map_q.put(frame)  # face model skipped, nothing to wait for
+
+    def _on_result(self, result, context):
+        if context is None:
+            return
+        frame = context
+        if not self._running.is_set():
+            frame.release()
+            return
+        # Submit -> result, so this includes the time queued in the graph
+        self.tracker.metrics.add("inference", time.monotonic() - frame.t_submit)
+        frame.results = result
+        self.map_q.put(frame)
+
+    @property
+    def dropped(self):
+        d = super().dropped
+        d["inference"] = self.tracker.inference.dropped
+        return d
+
+
+def create_pipeline(tracker, config):
+    """Pick the pipeline for the config's "inference_mode" / "threaded_pipeline"."""
+    if tracker.live_stream:
+        return LiveStreamPipeline(tracker, queue_size=config.get("pipeline_queue_size", 1))
+    if config.get("threaded_pipeline", True):
+        return StagedPipeline(tracker, queue_size=config.get("pipeline_queue_size", 1))
+    return SyncPipeline(tracker)
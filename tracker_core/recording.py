@@ -0,0 +1,98 @@
+"""Landmark recordings (.sklm): raw FaceLandmarker output, one fixed-size
+record per frame, so a take can be memory-mapped and replayed without
+running MediaPipe.
+
+    offset  size  field
+    0       4     magic           b"SKLM"
+    4       2     version         1
+    6       2     landmarks       points per frame (478)
+    8       2     blendshapes     scores per frame (0 = not recorded)
+    10      2     header size     offset of the first record (64)
+    12      52    reserved
+
+Each record is a float64 capture timestamp (seconds, monotonic clock)
+followed by the landmarks as float32 (x, y, z) and, if recorded, the
+blendshape scores as float32 in MediaPipe's category order. The frame
+count follows from the file size, so a recording cut short by a crash
+is still readable up to its last complete record.
+
+    rec = open_recording("take.sklm")     # numpy memmap, no copy
+    rec["pts"][100]                       # (478, 3) landmarks of frame 100
+"""
+import logging
+import struct
+
+import numpy as np
+
+from .mapping import NUM_BLENDSHAPES, NUM_LANDMARKS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SKLM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHH")
+HEADER_SIZE = 64
+
+
+def record_dtype(landmarks=NUM_LANDMARKS, blendshapes=0):
+    """numpy dtype of one record."""
+    fields = [("t", "<f8"), ("pts", "<f4", (landmarks, 3))]
+    if blendshapes:
+        fields.append(("bs", "<f4", (blendshapes,)))
+    return np.dtype(fields)
+
+
+class LandmarkRecorder:
+    """Appends one record per tracked frame to a .sklm file."""
+
+    def __init__(self, path, blendshapes=False):
+        self.path = path
+        self.n_blend = NUM_BLENDSHAPES if blendshapes else 0
+        self.frames = 0
+        self._rec = np.zeros(1, dtype=record_dtype(NUM_LANDMARKS, self.n_blend))
+        self._f = open(path, "wb")
+        header = HEADER.pack(MAGIC, VERSION, NUM_LANDMARKS, self.n_blend, HEADER_SIZE)
+        self._f.write(header.ljust(HEADER_SIZE, b"\0"))
+        logger.info(f"Recording landmarks to {path}" + (" (with blendshapes)" if self.n_blend else ""))
+
+    def write(self, t, pts, blendshapes=None):
+        """Add one frame. pts: (478, 3) array; blendshapes: 52 scores or None."""
+        if self._f is None or pts.shape[0] != NUM_LANDMARKS:
+            return
+        rec = self._rec[0]
+        rec["t"] = t
+        rec["pts"] = pts
+        if self.n_blend:
+            if blendshapes is not None and len(blendshapes) == self.n_blend:
+                rec["bs"] = blendshapes
+            else:
+                rec["bs"] = 0.0
+        self._f.write(self._rec.tobytes())
+        self.frames += 1
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+            logger.info(f"Recorded {self.frames} frames to {self.path}")
+
+
+def open_recording(path):
+    """Memory-map a .sklm file as a structured array with fields t, pts[, bs]."""
+    with open(path, "rb") as f:
+        head = f.read(HEADER.size)
+    if len(head) < HEADER.size:
+        raise ValueError(f"{path} is not a landmark recording")
+    magic, version, landmarks, blendshapes, header_size = HEADER.unpack(head)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a landmark recording")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported recording version {version}")
+
+    dtype = record_dtype(landmarks, blendshapes)
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+    count = max(0, (size - header_size) // dtype.itemsize)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=header_size, shape=(count,))
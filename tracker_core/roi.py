@@ -0,0 +1,109 @@
+"""Region-of-interest cropping for the inference input.
+
+Once a face is tracked, the next frame is cropped to the previous
+landmarks' bounding box plus a margin (and optionally downscaled) before
+the RGB conversion and FaceLandmarker, so a 1080p camera costs about as
+much as the face it contains. The landmarks that come back are remapped
+to full-frame normalized coordinates before anything else sees them.
+When the face is lost the next frame goes in whole again.
+
+Mirroring is folded into the same step: the crop window and the landmarks
+live in mirrored coordinates, while the frame itself arrives unmirrored.
+The window is mirrored onto the raw frame and either the crop's pixels are
+flipped during the RGB conversion, or (mirror_landmarks) they are not and
+the transform mirrors x instead, via a negative x scale.
+"""
+import cv2
+
+
+class RoiCropper:
+    """Keeps the crop window and turns frames into (possibly cropped) inference input.
+
+    transform: (ox, oy, sx, sy) with full = o + crop * s in normalized
+    coordinates, or None when the input is the full frame as is.
+    """
+
+    def __init__(self, enabled=True, margin=0.25, max_size=0):
+        self.enabled = enabled
+        self.margin = margin
+        self.max_size = max_size
+        self.rect = None  # (x0, y0, x1, y1) crop window in pixels
+
+    def prepare(self, image, mirror=False, flip=True):
+        """(input_bgr, transform) for one BGR frame. Crops are views, not copies.
+
+        mirror: image is unmirrored but the output should be mirrored. With
+        flip the caller flips the crop's pixels; without, the transform
+        mirrors the landmarks instead.
+        """
+        h, w = image.shape[:2]
+        rect = self.rect if self.enabled else None
+        if rect is not None:
+            x0, y0, x1, y1 = rect
+            if mirror:
+                crop = image[y0:y1, w - x1:w - x0]
+            else:
+                crop = image[y0:y1, x0:x1]
+            transform = (x0 / w, y0 / h, (x1 - x0) / w, (y1 - y0) / h)
+        else:
+            crop, transform = image, None
+        if mirror and not flip:
+            ox, oy, sx, sy = transform or (0.0, 0.0, 1.0, 1.0)
+            transform = (ox + sx, oy, -sx, sy)
+
+        if self.max_size:
+            ch, cw = crop.shape[:2]
+            longest = max(ch, cw)
+            if longest > self.max_size:
+                s = self.max_size / longest
+                crop = cv2.resize(crop, (max(1, round(cw * s)), max(1, round(ch * s))),
+                                  interpolation=cv2.INTER_AREA)
+        return crop, transform
+
+    def update(self, pts, width, height):
+        """Move the window to follow landmarks pts ((N, 3), full frame), or
+        drop it (next frame goes in whole) when pts is None."""
+        if not self.enabled or pts is None:
+            self.rect = None
+            return
+        lo = pts[:, :2].min(axis=0) * (width, height)
+        hi = pts[:, :2].max(axis=0) * (width, height)
+        side = max(hi - lo) * (1.0 + 2.0 * self.margin)
+        if side <= 0:
+            self.rect = None
+            return
+
+        # Keep the current window while the face sits comfortably inside it;
+        # a steady crop helps FaceLandmarker's own frame-to-frame tracking
+        if self.rect is not None:
+            x0, y0, x1, y1 = self.rect
+            pad = 0.5 * self.margin * max(hi - lo)
+            cur = max(x1 - x0, y1 - y0)
+            if (lo[0] - pad >= x0 and lo[1] - pad >= y0 and hi[0] + pad <= x1 and hi[1] + pad <= y1
+                    and 0.8 * side <= cur <= 1.25 * side):
+                return
+
+        if side >= min(width, height):
+            self.rect = None  # face fills the frame, nothing to save
+            return
+        cx, cy = (lo + hi) / 2.0
+        half = side / 2.0
+        x0, y0 = int(max(0, cx - half)), int(max(0, cy - half))
+        x1, y1 = int(min(width, cx + half)), int(min(height, cy + half))
+        self.rect = (x0, y0, x1, y1) if x1 - x0 > 1 and y1 - y0 > 1 else None
+
+
+def remap_landmarks(face_landmarks, transform):
+    """Map crop-normalized landmarks (a list per face) to the full frame, in place.
+
+    z follows x's scale, as in MediaPipe's own output (a mirroring negative
+    scale flips x only).
+    """
+    ox, oy, sx, sy = transform
+    sz = abs(sx)
+    for landmarks in face_landmarks:
+        for lm in landmarks:
+            lm.x = ox + lm.x * sx
+            lm.y = oy + lm.y * sy
+            lm.z = lm.z * sz
+
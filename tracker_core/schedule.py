@@ -0,0 +1,98 @@
+"""Per-model inference rates.
+
+Each model runs every N frames ("model_intervals", e.g. {"Face": 1,
+"Hand": 2}); on the frames in between its last output is held, or with
+"skip_mode": "extrapolate" continued along the line through its last two
+runs. With "target_frame_ms" set the intervals adapt as well: while the
+average per-frame processing time stays above the target the least
+important model is run less often, one step at a time up to
+`max_interval`, and once there is headroom again the most important
+slowed-down model gets its rate back first. So turning on another model
+costs frame rate on that model instead of on everything.
+"""
+
+# Most important first: the face drives nearly every group
+MODEL_PRIORITY = ("Face", "Hand")
+
+
+class ModelScheduler:
+    """Decides which models run on each frame."""
+
+    def __init__(self, intervals=None, target_ms=0.0, max_interval=4, adapt_frames=30):
+        intervals = dict(intervals or {})
+        for model in MODEL_PRIORITY:
+            intervals.setdefault(model, 1)
+        rank = {m: i for i, m in enumerate(MODEL_PRIORITY)}
+        self.models = sorted(intervals, key=lambda m: rank.get(m, len(rank)))
+        self.base = {m: max(1, int(n)) for m, n in intervals.items()}
+        self.interval = dict(self.base)
+        self.target = target_ms / 1000.0
+        self.max_interval = max_interval
+        self.adapt_frames = adapt_frames
+        self.frame_time = None  # EMA of observed per-frame processing time, seconds
+        self._frames = {m: 0 for m in self.models}  # frames since the model last ran
+        self._observed = 0
+
+    def due(self, model):
+        """Whether `model` runs on this frame. Call once per model per frame."""
+        n = self._frames.get(model)
+        if n is None:
+            return True
+        if n == 0 or n >= self.interval[model]:
+            self._frames[model] = 1
+            return True
+        self._frames[model] = n + 1
+        return False
+
+    def observe(self, seconds):
+        """Feed one frame's processing time; adapts the intervals every `adapt_frames` frames."""
+        if self.frame_time is None:
+            self.frame_time = seconds
+        else:
+            self.frame_time += 0.1 * (seconds - self.frame_time)
+        self._observed += 1
+        if not self.target or self._observed < self.adapt_frames:
+            return
+        self._observed = 0
+        if self.frame_time > self.target * 1.1:
+            for model in reversed(self.models):
+                if self.interval[model] < self.max_interval:
+                    self.interval[model] += 1
+                    return
+        elif self.frame_time < self.target * 0.75:
+            for model in self.models:
+                if self.interval[model] > self.base[model]:
+                    self.interval[model] -= 1
+                    return
+
+
+class Extrapolator:
+    """Keeps a model's last two outputs and predicts the frames it skipped.
+
+    mode "hold" repeats the last output; "extrapolate" continues linearly
+    from the last two, by at most one gap between them, and falls back to
+    holding when their shapes differ (a hand came or went).
+    """
+
+    def __init__(self, mode="hold"):
+        self.mode = mode
+        self.reset()
+
+    def update(self, t, value):
+        """Record a real output (None when the model found nothing)."""
+        self._prev, self._t_prev = self.value, self.t
+        self.value, self.t = value, t
+
+    def predict(self, t):
+        value, prev = self.value, self._prev
+        if value is None or self.mode != "extrapolate" or prev is None or prev.shape != value.shape:
+            return value
+        dt = self.t - self._t_prev
+        if dt <= 0:
+            return value
+        k = min(max(t - self.t, 0.0) / dt, 1.0)
+        return value + (value - prev) * k
+
+    def reset(self):
+        self.value = self._prev = None
+        self.t = self._t_prev = None
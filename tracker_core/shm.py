@@ -0,0 +1,391 @@
+"""Shared-memory exchange between tracker processes.
+
+Both structures live in one `multiprocessing.shared_memory` block each
+and have a single writer, so no lock is needed: a sequence counter
+brackets every write (odd while writing), and readers check it before
+and after copying and retry or give up when it moved underneath them.
+
+LandmarkSlots is a table with a slot per camera worker holding the
+latest face that worker tracked (multicam.py).
+
+SharedRing keeps the last `capacity` frames the tracker emitted
+(landmarks, timestamps, mapped values) for local consumers: the UI
+thread, a recorder, or a Blender-side reader on the same machine that
+attaches by name instead of listening on UDP. Layout, all little-endian:
+
+    header (RING_HEADER)  magic b"SKRB", version, capacity, max_values,
+                          num_landmarks, names_len, head (frames
+                          written), names_seq, pid and pid_start of
+                          the writing process
+    names  (NAMES_BYTES)  UTF-8 JSON list of the group names, replaced
+                          under names_seq whenever the groups change
+    records               capacity x ring_record_dtype(max_values); frame
+                          k lives in record k % capacity, its seq is
+                          2k + 1 while being written and 2k + 2 when done,
+                          and its names_version is names_seq // 2 of the
+                          names its values follow
+
+    ring = SharedRing.attach("skft")
+    record = ring.read()              # newest frame, a copy, or None
+    names = ring.names(record["names_version"])
+    values = dict(zip(names, record["values"][:record["count"]].tolist()))
+"""
+import json
+import logging
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .mapping import NUM_BLENDSHAPES, NUM_LANDMARKS
+
+logger = logging.getLogger(__name__)
+
+# Worker states
+STATE_STARTING = 0
+STATE_RUNNING = 1
+STATE_ENDED = 2   # file source ran out or the worker was stopped
+STATE_FAILED = 3  # the source would not open or the worker crashed
+
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),          # write counter, odd while a write is in progress
+    ("frames", "<u8"),       # frames the worker has processed
+    ("state", "<u4"),
+    ("present", "<u4"),      # 1 when the slot holds a face
+    ("t_capture", "<f8"),    # time.monotonic() of the frame
+    ("pts", "<f8", (NUM_LANDMARKS, 3)),
+    ("blendshapes", "<f8", (NUM_BLENDSHAPES,)),
+    ("pose", "<f8", (4, 4)),
+], align=True)
+
+
+class LandmarkSlots:
+    """Latest-face slots, one writer per slot, in shared memory.
+
+    Create with no name in the coordinator; workers attach with its `name`.
+    """
+
+    def __init__(self, count, name=None):
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=count * SLOT_DTYPE.itemsize)
+        self.name = self.shm.name
+        self.array = np.ndarray((count,), dtype=SLOT_DTYPE, buffer=self.shm.buf)
+        self._owner = create
+        if create:
+            self.array[:] = np.zeros((), SLOT_DTYPE)
+
+    def set_state(self, i, state):
+        self.array["state"][i] = state
+
+    def write(self, i, t_capture, pts=None, blendshapes=None, pose=None):
+        """Publish one frame into slot i (from its worker only)."""
+        slot = self.array[i:i + 1]
+        seq = int(slot["seq"][0])
+        slot["seq"] = seq + 1
+        slot["frames"] += 1
+        slot["t_capture"] = t_capture
+        slot["present"] = pts is not None
+        if pts is not None:
+            slot["pts"][0] = pts
+            slot["blendshapes"][0] = 0.0 if blendshapes is None else blendshapes
+            slot["pose"][0] = np.eye(4) if pose is None else pose
+        slot["seq"] = seq + 2
+
+    def changed(self, seen):
+        """Indices whose sequence differs from `seen` and that are not mid-write."""
+        seq = self.array["seq"]
+        return np.flatnonzero((seq != seen) & (seq % 2 == 0))
+
+    def read(self, i, retries=100):
+        """A consistent copy of slot i (a one-record array), or None if the
+        worker kept writing through every retry."""
+        slot = self.array[i:i + 1]
+        for _ in range(retries):
+            seq = int(slot["seq"][0])
+            if seq % 2:
+                continue
+            record = slot.copy()
+            if int(slot["seq"][0]) == seq:
+                return record
+        return None
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+RING_MAGIC = b"SKRB"
+RING_VERSION = 3
+NAMES_BYTES = 65536
+_OWN_RINGS = set()  # names of the rings this process writes
+
+RING_HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u4"),
+    ("capacity", "<u4"),
+    ("max_values", "<u4"),
+    ("num_landmarks", "<u4"),
+    ("names_len", "<u4"),
+    ("head", "<u8"),         # frames written so far
+    ("names_seq", "<u8"),    # odd while the names are rewritten
+    ("pid", "<u4"),          # writing process, to tell a dead tracker's ring from a live one
+    ("pid_start", "<f8"),    # its start time as _process_start() reports it, 0 if unknown
+], align=True)
+_NAMES_OFFSET = 64
+_RECORDS_OFFSET = _NAMES_OFFSET + NAMES_BYTES
+
+
+def ring_record_dtype(max_values):
+    return np.dtype([
+        ("seq", "<u8"),
+        ("frame", "<u8"),
+        ("t_capture", "<f8"),    # time.monotonic(), comparable across processes
+        ("t_emit", "<f8"),
+        ("t_wall", "<f8"),       # time.time() at write
+        ("present", "<u4"),      # 1 when pts holds a face
+        ("count", "<u4"),        # valid rows of values
+        ("names_version", "<u4"),
+        ("pts", "<f4", (NUM_LANDMARKS, 3)),
+        ("values", "<f4", (max_values, 2)),
+    ], align=True)
+
+
+def _attach(name):
+    """Open an existing block without this process's resource tracker
+    unlinking it on exit (it belongs to the tracker that created it)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _process_start(pid):
+    """Start time of process `pid` in the OS's own units (POSIX only), 0.0
+    when it runs but the start can't be read (no /proc), None when no such
+    process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass  # another user's process, but alive
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return 0.0
+    # Field 22 (starttime); the command name in field 2 may contain spaces
+    return float(stat[stat.rindex(b")") + 2:].split()[19])
+
+
+def _ring_is_stale(name):
+    """Whether the existing block `name` is a ring whose writing process is
+    gone (or its pid now belongs to a different process); anything else (a
+    live ring, an idle one, a block that is not a current ring) must be
+    left alone. On Windows a block disappears with its last handle, so one
+    that exists is always in use."""
+    if os.name != "posix" or name in _OWN_RINGS:
+        return False  # attaching our own block would drop it from the resource tracker
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return True
+    try:
+        if shm.size < RING_HEADER.itemsize:
+            return False
+        header = np.ndarray((1,), dtype=RING_HEADER, buffer=shm.buf)
+        ours = header["magic"][0] == RING_MAGIC and header["version"][0] == RING_VERSION
+        pid, pid_start = int(header["pid"][0]), float(header["pid_start"][0])
+        del header
+    finally:
+        shm.close()
+    if not ours or not pid:
+        return False
+    start = _process_start(pid)
+    return start is None or bool(start and pid_start and start != pid_start)
+
+
+class SharedRing:
+    """Lock-free ring of emitted frames in shared memory, one writer.
+
+    The tracker creates it (name=None picks a private random name; a
+    name still held by a live ring falls back to a random one);
+    other processes use SharedRing.attach(name). read() returns a
+    consistent copy of one record; view() + valid() read in place
+    without copying.
+    """
+
+    def __init__(self, name=None, capacity=64, max_values=512, shm=None):
+        self._owner = shm is None
+        if shm is None:
+            record = ring_record_dtype(max_values)
+            size = _RECORDS_OFFSET + capacity * record.itemsize
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                if _ring_is_stale(name):
+                    logger.warning(f"Replacing stale shared ring {name}")
+                    stale = shared_memory.SharedMemory(name=name)
+                    stale.close()
+                    stale.unlink()
+                    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                else:
+                    shm = shared_memory.SharedMemory(create=True, size=size)
+                    logger.warning(f"Shared memory {name} is in use by another tracker, "
+                                   f"publishing the ring as {shm.name} instead")
+        self.shm = shm
+        self.name = shm.name
+        if self._owner:
+            _OWN_RINGS.add(self.name)
+        self.header = np.ndarray((1,), dtype=RING_HEADER, buffer=shm.buf)
+        if self._owner:
+            pid = os.getpid()
+            self.header[0] = (RING_MAGIC, RING_VERSION, capacity, max_values, NUM_LANDMARKS, 0, 0, 0,
+                              pid, _process_start(pid) or 0.0)
+        elif self.header["magic"][0] != RING_MAGIC or self.header["version"][0] != RING_VERSION:
+            shm.close()
+            raise ValueError(f"{self.name} is not a version {RING_VERSION} shared ring")
+        self.capacity = int(self.header["capacity"][0])
+        self.max_values = int(self.header["max_values"][0])
+        self._names_buf = np.ndarray((NAMES_BYTES,), dtype=np.uint8, buffer=shm.buf, offset=_NAMES_OFFSET)
+        self.records = np.ndarray((self.capacity,), dtype=ring_record_dtype(self.max_values),
+                                  buffer=shm.buf, offset=_RECORDS_OFFSET)
+        self._names = None            # writer: names last published
+        self._names_count = 0         # how many of them the table holds
+        self._names_cache = (None, None)
+        self._truncated = False
+
+    @classmethod
+    def attach(cls, name):
+        """Reader for another process's ring; in the writing process use the
+        writer's own object."""
+        return cls(shm=_attach(name))
+
+    @property
+    def head(self):
+        """Frames written so far; the newest is head - 1."""
+        return int(self.header["head"][0])
+
+    def _publish_names(self, names):
+        """Replace the names table; when the names do not fit in NAMES_BYTES
+        only the leading ones that do are published (records then carry just
+        as many values)."""
+        keep = min(len(names), self.max_values)
+        data = json.dumps(names[:keep]).encode("utf-8")
+        if len(data) > NAMES_BYTES:
+            lo, hi = 0, keep  # most names whose JSON fits
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if len(json.dumps(names[:mid]).encode("utf-8")) <= NAMES_BYTES:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            logger.warning(f"Group names need {len(data)} bytes, the shared ring holds {NAMES_BYTES}; "
+                           f"publishing the first {lo} of {len(names)}")
+            keep = lo
+            data = json.dumps(names[:keep]).encode("utf-8")
+        header = self.header
+        seq = int(header["names_seq"][0])
+        header["names_seq"] = seq + 1
+        self._names_buf[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        header["names_len"] = len(data)
+        header["names_seq"] = seq + 2
+        self._names = names
+        self._names_count = keep
+
+    def write(self, t_capture, pts, names, values, t_emit=None):
+        """Append one frame (writer only); returns its frame number.
+
+        pts: (N, 3) landmarks or None without a face, names / values: the
+        groups sent this frame and their (n, 2) values (values may be None
+        when names is empty).
+        """
+        if names is not self._names and names != self._names:
+            self._publish_names(names)
+        n = len(names)
+        if n > self.max_values:
+            if not self._truncated:
+                logger.warning(f"{n} groups, the shared ring keeps the first {self.max_values}")
+                self._truncated = True
+        n = min(n, self._names_count)
+
+        frame = self.head
+        rec = self.records[frame % self.capacity:frame % self.capacity + 1]
+        rec["seq"] = 2 * frame + 1
+        rec["frame"] = frame
+        rec["t_capture"] = t_capture if t_capture is not None else np.nan
+        rec["t_emit"] = t_emit if t_emit is not None else np.nan
+        rec["t_wall"] = time.time()
+        rec["present"] = pts is not None
+        if pts is not None:
+            rec["pts"][0] = pts
+        rec["count"] = n
+        rec["names_version"] = int(self.header["names_seq"][0]) // 2
+        if n:
+            rec["values"][0, :n] = values[:n]
+        rec["seq"] = 2 * frame + 2
+        self.header["head"] = frame + 1
+        return frame
+
+    def valid(self, frame):
+        """Whether frame's record is complete and not yet overwritten."""
+        return int(self.records["seq"][frame % self.capacity]) == 2 * frame + 2
+
+    def view(self, frame=None):
+        """Zero-copy record of `frame` (default the newest), or None. Check
+        valid(frame) after reading it; the writer may have moved on."""
+        if frame is None:
+            frame = self.head - 1
+        if frame < 0 or not self.valid(frame):
+            return None
+        return self.records[frame % self.capacity]
+
+    def read(self, frame=None, retries=3):
+        """Consistent copy of `frame` (default the newest), or None when it
+        was overwritten or never written."""
+        for _ in range(retries):
+            f = self.head - 1 if frame is None else frame
+            if f < 0 or not self.valid(f):
+                if frame is not None:
+                    return None
+                continue
+            record = self.records[f % self.capacity].copy()
+            if self.valid(f):
+                return record
+        return None
+
+    def names(self, version=None):
+        """Group names for a record's names_version (default current), or
+        None when they have been replaced since."""
+        cached_version, cached = self._names_cache
+        if version is not None and version == cached_version:
+            return cached
+        header = self.header
+        for _ in range(100):
+            seq = int(header["names_seq"][0])
+            if seq % 2:
+                continue
+            data = self._names_buf[:int(header["names_len"][0])].tobytes()
+            if int(header["names_seq"][0]) == seq:
+                break
+        else:
+            return None
+        current = seq // 2
+        if version is not None and version != current:
+            return None
+        names = json.loads(data.decode("utf-8")) if data else []
+        self._names_cache = (current, names)
+        return names
+
+    def close(self):
+        self.header = self.records = self._names_buf = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+            _OWN_RINGS.discard(self.name)
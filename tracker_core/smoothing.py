@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class AxisLerp:
+    """Per-group x/y lerp smoothing over (n_groups, 2) arrays.
+
+    The first value an axis sees primes it, so enabling smoothing doesn't
+    sweep in from 0. Axes with smoothing off just keep their state current.
+    """
+
+    def __init__(self, n=0):
+        self.state = np.zeros((n, 2))
+        self.primed = np.zeros((n, 2), dtype=bool)
+
+    def reindex(self, old_rows):
+        """Rebuild state for a new group order; old_rows[i] = previous row or -1."""
+        old_rows = np.asarray(old_rows, dtype=np.intp)
+        keep = old_rows >= 0
+        state = np.zeros((old_rows.shape[0], 2))
+        primed = np.zeros((old_rows.shape[0], 2), dtype=bool)
+        state[keep] = self.state[old_rows[keep]]
+        primed[keep] = self.primed[old_rows[keep]]
+        self.state, self.primed = state, primed
+
+    def apply(self, values, enabled, factor, rows=None):
+        """Smooth values in; rows (bool per group) limits which groups advance."""
+        smooth = enabled & self.primed
+        new = np.where(smooth, self.state + (values - self.state) * factor, values)
+        if rows is None:
+            self.state[:] = new
+            self.primed[:] = True
+        else:
+            self.state[rows] = new[rows]
+            self.primed[rows] = True
+        return self.state.copy()
+
+
+class Ema:
+    """Exponential moving average that can hold selected entries."""
+
+    def __init__(self, shape, alpha):
+        self.alpha = alpha
+        self.value = np.zeros(shape)
+
+    def update(self, inst, mask=None):
+        if mask is None:
+            self.value += self.alpha * (inst - self.value)
+        else:
+            self.value[mask] += self.alpha * (inst[mask] - self.value[mask])
+        return self.value
+
+    def reset(self):
+        self.value[:] = 0.0
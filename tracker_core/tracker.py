@@ -0,0 +1,557 @@
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .capture import create_source
+from .config import HAND_MODEL_FILE
+from .faces import FaceTracks
+from .frames import FramePool
+from .hands import HandMapping, hand_side
+from .inference import FaceInference, HandInference, LiveStreamInference
+from .mapping import (
+    DEFAULT_BLINK_RATIO, NUM_BLENDSHAPES, NUM_LANDMARKS, MappingEngine, MultiFaceMapping,
+    head_pose_matrix, landmarks_to_array,
+)
+from .metrics import StageMetrics
+from .output import create_output
+from .recording import LandmarkRecorder
+from .roi import RoiCropper, remap_landmarks
+from .schedule import Extrapolator, ModelScheduler
+from .shm import SharedRing
+
+logger = logging.getLogger(__name__)
+
+_holds_lock = threading.Lock()
+
+
+class TrackerFrame:
+    """Everything one pass of the pipeline produced for a camera frame.
+
+    A frame owns its pooled buffers (`rgb`) and starts with one hold, which
+    the pipeline passes along with the frame: whoever ends up with it
+    (next_frame()'s caller) release()s it when done, and anyone keeping it
+    longer retain()s it first. The last release returns the buffers to the
+    tracker's FramePool.
+    """
+
+    def __init__(self, image, rgb, results, t_capture=None):
+        self.image = image          # BGR camera frame as captured (None for landmark replay)
+        self.t_capture = t_capture  # time.monotonic() when the frame was grabbed
+        self.rgb = rgb              # RGB inference input (the ROI crop when cropping)
+        self.mirror = False         # whether the preview shows `image` mirrored
+        self.rgb_is_display = False  # rgb is the whole frame as the preview shows it
+        self._display = None
+        self.roi = None             # crop -> full frame transform, see roi.py
+        self.results = results      # raw FaceLandmarkerResult
+        self.landmarks = None       # results.face_landmarks[0]
+        self.pts = None             # (478, 3) landmark array
+        self.blendshapes = None     # (52,) scores when the landmarker outputs them
+        self.pose = None            # 4x4 head_pose_matrix() with head_pose_normalize
+        self.out = None             # (n_groups, 2) mapped values
+        self.raw = None             # (n_groups, 2) pre-range raw values
+        self.t_submit = None        # time.monotonic() when handed to LIVE_STREAM inference
+        self.t_emit = None          # time.monotonic() after the UDP send
+        self.ring_frame = None      # frame number in the tracker's SharedRing once emitted
+        self.faces = None           # [TrackedFace] with num_faces > 1; the fields above are track 0's
+        self.hand_results = None    # raw HandLandmarkerResult when "Hand" is active
+        self.hand_pts = None        # (hands, 21, 3) landmarks in the preview's coordinates
+        self.hand_names = None      # hand group names, see hands.py
+        self.hand_values = None     # matching (n, 2) curl values
+        self.held = []              # models skipped this frame, their outputs held / extrapolated
+        self.work = None            # seconds spent on this frame before map()
+        self._holds = 1
+        self._buffers = []          # FrameBuffer leases given back on the last release()
+
+    def retain(self):
+        with _holds_lock:
+            if self._holds <= 0:
+                raise RuntimeError("TrackerFrame retained after its last release")
+            self._holds += 1
+        return self
+
+    def release(self):
+        with _holds_lock:
+            if self._holds <= 0:
+                raise RuntimeError("TrackerFrame released more often than it was held")
+            self._holds -= 1
+            last = self._holds == 0
+        if last:
+            for buf in self._buffers:
+                buf.release()
+            self._buffers = []
+
+    def display_rgb(self):
+        """The full (mirrored) RGB frame for previews and the point picker.
+
+        Shares `rgb` when inference already saw the whole frame; otherwise
+        converts `image` once and keeps the result. Callers must not draw
+        into it, other consumers hold the same array.
+        """
+        if self.rgb_is_display:
+            return self.rgb
+        if self._display is None and self.image is not None:
+            rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
+            if self.mirror:
+                cv2.flip(rgb, 1, dst=rgb)
+            self._display = rgb
+        return self._display
+
+    @property
+    def latency_ms(self):
+        """Capture -> output latency, once the frame has been emitted."""
+        if self.t_capture is None or self.t_emit is None:
+            return None
+        return (self.t_emit - self.t_capture) * 1000.0
+
+
+class TrackedFace:
+    """One performer's face in a multi-face frame."""
+
+    def __init__(self, track_id, landmarks, pts):
+        self.track_id = track_id    # stable ID from FaceTracks, also the performer index
+        self.landmarks = landmarks
+        self.pts = pts
+        self.blendshapes = None
+        self.pose = None
+        self.out = None
+        self.raw = None
+
+
+class Tracker:
+    """Capture -> FaceLandmarker -> mapping -> UDP, with no UI attached.
+
+    Front ends drive it through a pipeline (see pipeline.py), which calls
+    infer() / map() / emit() either inline or on separate stage threads,
+    and layer their own preview on top of the returned TrackerFrame.
+
+    With "num_faces" > 1 every face gets a stable track ID (see faces.py).
+    Track 0 is the performer the UI edits (config "groups" / blender_ip /
+    blender_port); track p > 0 uses "performers"[p - 1], whose "groups",
+    "blender_ip" and "blender_port" default to the main groups, the main
+    IP and blender_port + p. All performers are mapped in one pass.
+
+    With "Hand" in "active_models" a HandLandmarker runs on the whole frame
+    next to the face model and its finger curls (see hands.py) join track
+    0's payload.
+
+    Each model runs at its own rate (see schedule.py); on the frames it
+    skips its last output is held or extrapolated, and the rates adapt to
+    "target_frame_ms" when that is set.
+
+    Every emitted frame is also appended to a shared-memory ring (see
+    shm.py) that UI threads and other local processes read lock-free;
+    "shared_ring_name" gives it a fixed name for outside readers.
+    """
+
+    def __init__(self, config, model_path, hand_model_path=HAND_MODEL_FILE):
+        self.config = config
+        self.model_path = model_path
+        self.hand_model_path = hand_model_path
+        iris = dict(blink_ratio=config.get("iris_blink_ratio", DEFAULT_BLINK_RATIO),
+                    iris_y_gain=config.get("iris_y_gain", 1.0))
+        self.mapping = MappingEngine(config.get("groups", {}), **iris)
+        ip, port = config.get("blender_ip", "127.0.0.1"), config.get("blender_port", 5000)
+        self.output = create_output(config, ip, port)
+        self.source = create_source(config)
+        self.roi = RoiCropper(config.get("roi_crop", False), config.get("roi_margin", 0.25),
+                              config.get("inference_max_size", 0))
+
+        self.num_faces = max(1, int(config.get("num_faces", 1)))
+        self.multi = self.tracks = None
+        self.outputs = [self.output]
+        if self.num_faces > 1:
+            performers = config.get("performers", [])
+            engines = [self.mapping]
+            for p in range(1, self.num_faces):
+                perf = performers[p - 1] if p - 1 < len(performers) else {}
+                engines.append(MappingEngine(perf.get("groups", config.get("groups", {})), **iris))
+                self.outputs.append(create_output(config, perf.get("blender_ip", ip), perf.get("blender_port", port + p)))
+            self.multi = MultiFaceMapping(engines, **iris)
+            self.tracks = FaceTracks(self.num_faces)
+            if self.roi.enabled:
+                logger.warning("roi_crop is ignored with num_faces > 1 (a crop would hide the other performers)")
+                self.roi.enabled = False
+        # Mirror the landmarks instead of the pixels (see roi.py)
+        self.mirror_landmarks = config.get("mirror_landmarks", False)
+        # Map in head-local coordinates from FaceLandmarker's transformation matrix
+        self.head_pose = config.get("head_pose_normalize", False)
+        self.frames = FramePool(config.get("frame_pool_size", 6))
+        self.hands = HandMapping(config.get("hand_setup"))
+        self.inference = None
+        self.hand_inference = None
+        self.schedule = ModelScheduler(config.get("model_intervals"), config.get("target_frame_ms", 0.0),
+                                       config.get("max_model_interval", 4))
+        skip_mode = config.get("skip_mode", "hold")
+        self._face_hold = Extrapolator(skip_mode)
+        self._hand_hold = Extrapolator(skip_mode)
+        self._held_face = (None, None, None)  # landmarks, blendshapes, pose
+        self._held_results = None             # last FaceLandmarkerResult, multi-face hold
+        self._hand_sides = []
+        self.recorder = None
+        self.ring = None
+        self.send_enabled = True
+        self.metrics = StageMetrics(config.get("metrics_window", 120))
+
+    def set_groups(self, groups):
+        self.mapping.update(groups)
+
+    @property
+    def live_stream(self):
+        return (self.config.get("inference_mode", "video") == "live_stream"
+                and not self.source.provides_landmarks)
+
+    @property
+    def hands_active(self):
+        """Whether the hand model runs; it is not even loaded otherwise."""
+        return "Hand" in self.config.get("active_models", ()) and not self.source.provides_landmarks
+
+    @property
+    def blendshapes(self):
+        """Whether the landmarker has to output blendshape scores: a
+        blendshape axis reads them, the recorder stores them or the config
+        asks for them ("output_blendshapes", multi-camera workers)."""
+        if (self.multi or self.mapping).uses_blendshapes or self.config.get("output_blendshapes", False):
+            return True
+        return self.recorder is not None and self.recorder.n_blend > 0
+
+    def start_recording(self, path, blendshapes=False):
+        """Record every tracked frame's landmarks to a .sklm file (see recording.py).
+
+        Call before start(); blendshapes need the landmarker to output them.
+        """
+        self.recorder = LandmarkRecorder(path, blendshapes)
+
+    def start(self):
+        """Create the landmarker and open the frame source. Returns False on failure."""
+        (self.multi or self.mapping).refresh()  # know up front whether blendshapes are needed
+        if self.source.provides_landmarks:
+            pass  # replayed landmarks skip inference entirely
+        elif self.live_stream:
+            self.inference = LiveStreamInference(self.model_path, num_faces=self.num_faces,
+                                                 blendshapes=self.blendshapes, pose=self.head_pose)
+        else:
+            self.inference = FaceInference(self.model_path, num_faces=self.num_faces,
+                                           blendshapes=self.blendshapes, pose=self.head_pose)
+        if self.config.get("shared_ring", True) and self.ring is None:
+            self.ring = SharedRing(self.config.get("shared_ring_name"), self.config.get("shared_ring_size", 64),
+                                   self.config.get("shared_ring_groups", 512))
+        if self.hands_active:
+            self.hand_inference = HandInference(self.hand_model_path, self.config.get("num_hands", 2))
+        if self.inference is not None:
+            logger.info("MediaPipe Landmarker Created Successfully")
+        return self.source.open()
+
+    def read(self):
+        """Grab one frame from the source (capture stage): (success, image, t_capture)."""
+        t0 = time.perf_counter()
+        success, image, t_capture = self.source.read_timestamped()
+        self.metrics.add("capture", time.perf_counter() - t0)
+        return success, image, t_capture
+
+    def step(self):
+        """Grab and process one frame; None if the source gave nothing.
+        release() the frame when done with it."""
+        success, image, t_capture = self.read()
+        if not success:
+            return None
+        return self.process(image, t_capture)
+
+    def process(self, image, t_capture=None):
+        return self.map(self.infer(image, t_capture))
+
+    def infer(self, image, t_capture=None):
+        """Run the landmarker on a BGR frame (inference stage).
+
+        For landmark sources `image` is already the (pts, blendshapes) pair
+        and is passed through as frame.pts / frame.blendshapes.
+        """
+        if self.inference is None:
+            frame = TrackerFrame(None, None, None, t_capture)
+            frame.pts, frame.blendshapes = image
+            return frame
+        t_start = time.perf_counter()
+        frame = self.begin_frame(image, t_capture)
+        if "Face" not in frame.held:
+            self.inference.set_blendshapes(self.blendshapes)
+            t0 = time.perf_counter()
+            frame.results = self.inference.detect(frame.rgb)
+            self.metrics.add("inference", time.perf_counter() - t0)
+        frame.work = time.perf_counter() - t_start
+        return frame
+
+    def begin_frame(self, image, t_capture=None):
+        """Ask the scheduler which models run on this frame: converts it for
+        the face model and runs the hand model, or marks them held."""
+        if self.schedule.due("Face"):
+            frame = self.convert(image, t_capture)
+        else:
+            frame = TrackerFrame(image, None, None, t_capture)
+            frame.mirror = self.source.mirror
+            frame.held.append("Face")
+            self.metrics.count("face_held")
+        if self.hand_inference is not None:
+            if self.schedule.due("Hand"):
+                self.detect_hands(frame)
+            else:
+                frame.held.append("Hand")
+                self.metrics.count("hands_held")
+        return frame
+
+    def detect_hands(self, frame):
+        """Run the hand model on the whole preview-oriented frame (a face
+        ROI crop would cut the hands off)."""
+        t0 = time.perf_counter()
+        frame.hand_results = self.hand_inference.detect(frame.display_rgb())
+        self.metrics.add("hands", time.perf_counter() - t0)
+
+    def convert(self, image, t_capture=None):
+        """Crop, mirror and convert a BGR frame into a pooled RGB buffer.
+
+        Returns a TrackerFrame without results yet. The flip happens in
+        place on the (usually cropped) RGB buffer, or not at all with
+        mirror_landmarks.
+        """
+        t0 = time.perf_counter()
+        mirror = self.source.mirror
+        flip = mirror and not self.mirror_landmarks
+        crop, roi = self.roi.prepare(image, mirror, flip)
+        buf = self.frames.acquire(crop.shape)
+        rgb = buf.array
+        cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=rgb)
+        if flip:
+            cv2.flip(rgb, 1, dst=rgb)
+        frame = TrackerFrame(image, rgb, None, t_capture)
+        frame._buffers.append(buf)
+        frame.roi = roi
+        frame.mirror = mirror
+        frame.rgb_is_display = rgb.shape[:2] == image.shape[:2] and (flip or not mirror)
+        self.metrics.add("convert", time.perf_counter() - t0)
+        return frame
+
+    def submit(self, image, t_capture=None):
+        """Queue a BGR frame for LIVE_STREAM inference; the result arrives via
+        inference.on_result with the frame (see convert()) as context.
+
+        Returns the frame instead when the scheduler skips the face model on
+        it; it then goes to map() directly. Hands run here, before
+        submitting, since the result callback maps the frame.
+        """
+        t0 = time.perf_counter()
+        frame = self.begin_frame(image, t_capture)
+        # The face model's own time passes on MediaPipe's thread, uncounted
+        frame.work = time.perf_counter() - t0
+        if "Face" in frame.held:
+            return frame
+        self.inference.set_blendshapes(self.blendshapes)
+        frame.t_submit = time.monotonic()
+        self.inference.submit(frame.rgb, frame)
+        return None
+
+    def map(self, frame):
+        """Fill in landmarks and mapped values (mapping stage)."""
+        t0 = time.perf_counter()
+        t = frame.t_capture if frame.t_capture is not None else time.monotonic()
+        if self.hand_inference is not None:
+            self._map_hands(frame, t)
+        if self.multi is not None:
+            self._map_faces(frame)
+            self._finish_map(frame, t0)
+            return frame
+        self.mapping.refresh()  # also without a face, so uses_blendshapes stays current
+        results = frame.results
+        if "Face" in frame.held:
+            frame.pts = self._face_hold.predict(t)
+            frame.landmarks, frame.blendshapes, frame.pose = self._held_face
+        elif results is not None and results.face_landmarks:
+            if frame.roi is not None:
+                remap_landmarks(results.face_landmarks, frame.roi)
+                frame.roi = None
+            frame.landmarks = results.face_landmarks[0]
+            frame.pts = landmarks_to_array(frame.landmarks)
+            if results.face_blendshapes:
+                frame.blendshapes = np.array([c.score for c in results.face_blendshapes[0]])
+            if results.facial_transformation_matrixes and frame.image is not None:
+                h, w = frame.image.shape[:2]
+                frame.pose = head_pose_matrix(results.facial_transformation_matrixes[0], w, h,
+                                              mirrored=frame.mirror and self.mirror_landmarks)
+        if "Face" not in frame.held:
+            self._face_hold.update(t, frame.pts)
+            self._held_face = (frame.landmarks, frame.blendshapes, frame.pose)
+        if frame.image is not None:
+            h, w = frame.image.shape[:2]
+            self.roi.update(frame.pts, w, h)
+        if frame.pts is not None:
+            frame.out, frame.raw = self.mapping.evaluate(frame.pts, frame.blendshapes, frame.pose)
+            if self.recorder is not None and "Face" not in frame.held:
+                self.recorder.write(t, frame.pts, frame.blendshapes)
+        else:
+            self.metrics.count("no_face")
+        self._finish_map(frame, t0)
+        return frame
+
+    def _finish_map(self, frame, t0):
+        dt = time.perf_counter() - t0
+        self.metrics.add("mapping", dt)
+        if frame.work is not None:
+            self.schedule.observe(frame.work + dt)
+
+    def _map_hands(self, frame, t):
+        """Curls for every detected (or held) hand in one pass; one hand per side."""
+        if "Hand" in frame.held:
+            pts, sides = self._hand_hold.predict(t), self._hand_sides
+        else:
+            results = frame.hand_results
+            pts, sides, keep = None, [], []
+            if results is not None and results.hand_landmarks:
+                for k, handedness in enumerate(results.handedness):
+                    side = hand_side(handedness, frame.mirror)
+                    if side not in sides:
+                        sides.append(side)
+                        keep.append(k)
+                pts = np.stack([landmarks_to_array(results.hand_landmarks[k]) for k in keep])
+            self._hand_hold.update(t, pts)
+            self._hand_sides = sides
+        if pts is not None:
+            frame.hand_pts = pts
+            frame.hand_names, frame.hand_values = self.hands.evaluate(pts, sides)
+
+    def _map_faces(self, frame):
+        """map() for several performers: track every face, then map them all at once."""
+        self.multi.refresh()
+        if "Face" in frame.held:
+            results = self._held_results  # already remapped to the full frame
+        else:
+            results = self._held_results = frame.results
+        landmarks, scores, matrices = [], None, None
+        if results is not None and results.face_landmarks:
+            if frame.roi is not None:
+                remap_landmarks(results.face_landmarks, frame.roi)
+                frame.roi = None
+            landmarks = results.face_landmarks
+            detected = np.stack([landmarks_to_array(lms) for lms in landmarks])
+            if results.face_blendshapes:
+                scores = [[c.score for c in face] for face in results.face_blendshapes]
+            matrices = results.facial_transformation_matrixes or None
+        elif frame.pts is not None:
+            # Landmark replay: one recorded face
+            detected, landmarks = frame.pts[None], [None]
+            if frame.blendshapes is not None:
+                scores = [frame.blendshapes]
+        else:
+            detected = np.zeros((0, NUM_LANDMARKS, 3))
+        ids = self.tracks.assign(detected)
+
+        n = self.num_faces
+        pts = np.zeros((n, NUM_LANDMARKS, 3))
+        present = np.zeros(n, dtype=bool)
+        blendshapes = np.zeros((n, NUM_BLENDSHAPES)) if scores is not None else None
+        poses = np.tile(np.eye(4), (n, 1, 1)) if matrices is not None and frame.image is not None else None
+        faces = []
+        for k, tid in enumerate(ids.tolist()):
+            if tid < 0:
+                continue  # more faces than performers
+            face = TrackedFace(tid, landmarks[k], detected[k])
+            pts[tid], present[tid] = detected[k], True
+            if blendshapes is not None:
+                blendshapes[tid] = scores[k]
+                face.blendshapes = blendshapes[tid]
+            if poses is not None:
+                h, w = frame.image.shape[:2]
+                poses[tid] = head_pose_matrix(matrices[k], w, h, mirrored=frame.mirror and self.mirror_landmarks)
+                face.pose = poses[tid]
+            faces.append(face)
+        if faces:
+            mapped = self.multi.evaluate_faces(pts, present, blendshapes, poses)
+            for face in faces:
+                face.out, face.raw = mapped[face.track_id]
+
+        faces.sort(key=lambda f: f.track_id)
+        frame.faces = faces
+        frame.landmarks = frame.pts = frame.blendshapes = None
+        for face in faces:
+            if face.track_id == 0:
+                frame.landmarks, frame.pts, frame.pose = face.landmarks, face.pts, face.pose
+                frame.out, frame.raw, frame.blendshapes = face.out, face.raw, face.blendshapes
+        if not faces:
+            self.metrics.count("no_face")
+        elif self.recorder is not None and frame.pts is not None and "Face" not in frame.held:
+            t = frame.t_capture if frame.t_capture is not None else time.monotonic()
+            self.recorder.write(t, frame.pts, frame.blendshapes)
+
+    def emit(self, frame):
+        """Send a mapped frame unless output is switched off (output stage)."""
+        sent = False
+        hands = (frame.hand_names, frame.hand_values) if frame.hand_names else None
+        if self.send_enabled and (frame.out is not None or hands is not None or frame.faces):
+            t0 = time.perf_counter()
+            # Track 0 (or the only face) and the hands share the main output
+            batches = []
+            if frame.out is not None or hands is not None:
+                batches.append((self.output, self.output.pack_values(self.mapping, frame.out, extra=hands)))
+            for face in frame.faces or ():
+                p = face.track_id
+                if p > 0:
+                    output = self.outputs[p]
+                    batches.append((output, output.pack_values(self.multi.engines[p], face.out)))
+            t1 = time.perf_counter()
+            for output, packets in batches:
+                sent = output.send_packets(packets) or sent
+            self.metrics.add("serialize", t1 - t0)
+            self.metrics.add("send", time.perf_counter() - t1)
+        frame.t_emit = time.monotonic()
+        if self.ring is not None:
+            self._write_ring(frame, hands)
+        self.metrics.tick()
+        if frame.latency_ms is not None:
+            self.metrics.add("latency", frame.latency_ms / 1000.0)
+        return sent
+
+    def _write_ring(self, frame, hands):
+        """Append the frame's landmarks and sent values (track 0 and hands) to the ring."""
+        names, values = [], None
+        if frame.out is not None:
+            names, values = self.mapping.names, frame.out
+        if hands is not None:
+            names = names + hands[0]
+            values = hands[1] if values is None else np.concatenate((values, hands[1]))
+        frame.ring_frame = self.ring.write(frame.t_capture, frame.pts, names, values, frame.t_emit)
+
+    def status(self, pipeline=None):
+        """Metrics snapshot with output / inference / queue counters folded in."""
+        m = self.metrics
+        m.set("packets_sent", sum(o.packets_sent for o in self.outputs))
+        m.set("send_errors", sum(o.send_errors for o in self.outputs))
+        m.set("frames_suppressed", sum(o.frames_suppressed for o in self.outputs))
+        if self.inference is not None:
+            m.set("face_interval", self.schedule.interval["Face"])
+        if self.hand_inference is not None:
+            m.set("hand_interval", self.schedule.interval["Hand"])
+        dropped = dict(pipeline.dropped) if pipeline is not None else {}
+        if self.live_stream and self.inference is not None:
+            m.set("inference_skipped", self.inference.dropped)
+            dropped.pop("inference", None)
+        # Preview drops only mean the UI skipped drawing a frame that was sent
+        m.set("frames_dropped", sum(n for q, n in dropped.items() if q != "preview"))
+        if hasattr(self.source, "skipped"):
+            m.set("capture_skipped", self.source.skipped)
+        return m.snapshot(dropped=dropped)
+
+    def close(self):
+        self.source.release()
+        for output in self.outputs[1:]:
+            output.close()  # the main one belongs to the front end
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.inference is not None:
+            self.inference.close()
+            self.inference = None
+        if self.hand_inference is not None:
+            self.hand_inference.close()
+            self.hand_inference = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,185 @@
+"""Binary UDP wire format ("SKFT") and a reference decoder.
+
+Every datagram starts with the same little-endian header:
+
+    offset  size  field
+    0       4     magic        b"SKFT"
+    4       1     version      2
+    5       1     packet type  1 = group table, 2 = frame, 3 = delta frame
+    6       2     count        number of groups
+    8       4     seq          per-sender packet counter (wraps at 2**32)
+    12      4     table_id     id of the group table the frame refers to
+    16      8     timestamp    sender time, microseconds since the epoch
+
+A group table packet follows the header with u16 first (table index of
+its first name) and u16 total (names in the whole table), then `count`
+names, each a u16 byte length plus UTF-8 bytes. Tables that would not fit
+one datagram (MAX_DATAGRAM bytes) are split over several packets with the
+same table_id; a receiver uses the table once it has every part. A frame
+packet follows the header with `count` float32 (x, y) pairs in table
+order, so a frame holds at most MAX_FRAME_GROUPS groups. A delta frame
+carries only the groups that changed: `count` entries of u16 table index
++ float32 x, y.
+The table is sent whenever the active groups change and again every
+`table_interval` seconds, so late joiners pick it up; frames whose table_id the receiver has not seen yet
+are ignored until the next table arrives.
+
+The decoder only uses `struct`/`json` (numpy is needed by the encoder
+alone) so this file can be copied into the
+Blender add-on as is. It also accepts the plain JSON payload, so one
+receive loop handles both formats. With delta output enabled, a decoded
+dict may hold only the groups that changed; keep the last value for the
+others:
+
+    decoder = WireDecoder()
+    while True:
+        values = decoder.feed(sock.recv(65535))
+        if values:
+            apply_shape_keys(values)   # same dict shape as the JSON payload
+"""
+import json
+import logging
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:  # decoder-only copies don't need it
+    np = None
+
+MAGIC = b"SKFT"
+VERSION = 2
+PKT_TABLE = 1
+PKT_FRAME = 2
+PKT_DELTA = 3
+
+HEADER = struct.Struct("<4sBBHIIQ")
+TABLE_PART = struct.Struct("<HH")
+NAME_LEN = struct.Struct("<H")
+DELTA_ENTRY = struct.Struct("<Hff")
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 65507  # largest UDP payload over IPv4
+MAX_FRAME_GROUPS = (MAX_DATAGRAM - HEADER.size) // 8
+
+
+class BinaryEncoder:
+    """Packs mapped values into SKFT frame (and table) datagrams."""
+
+    def __init__(self, table_interval=1.0):
+        self.table_interval = table_interval
+        self.seq = 0
+        self.table_id = 0
+        self._names = None
+        self._last_table_t = float("-inf")
+        self._truncated = False
+        if np is not None:
+            self._delta_dtype = np.dtype([("i", "<u2"), ("x", "<f4"), ("y", "<f4")])
+
+    def _header(self, ptype, count, ts_us):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        return HEADER.pack(MAGIC, VERSION, ptype, count, self.seq, self.table_id, ts_us)
+
+    def _table(self, names, ts_us):
+        """Table packets for `names`, split so each fits MAX_DATAGRAM."""
+        room = MAX_DATAGRAM - HEADER.size - TABLE_PART.size
+        packets, body, first = [], bytearray(), 0
+        for i, name in enumerate(names):
+            raw = name.encode("utf-8")
+            entry = NAME_LEN.pack(len(raw)) + raw
+            if body and len(body) + len(entry) > room:
+                packets.append((first, i, bytes(body)))
+                body, first = bytearray(), i
+            body += entry
+        packets.append((first, len(names), bytes(body)))
+        return [self._header(PKT_TABLE, end - start, ts_us) + TABLE_PART.pack(start, len(names)) + body
+                for start, end, body in packets]
+
+    def encode(self, names, values, timestamp=None, changed=None):
+        """Datagrams for one frame: [table parts,] frame.
+
+        names: active group names (at most MAX_FRAME_GROUPS), values:
+        matching (n, 2) float array, changed: optional row indices to send
+        as a delta frame instead.
+        """
+        now = time.time() if timestamp is None else timestamp
+        ts_us = int(now * 1_000_000)
+        packets = []
+        if len(names) > MAX_FRAME_GROUPS:
+            if not self._truncated:
+                logger.warning(f"{len(names)} groups, a binary frame holds the first {MAX_FRAME_GROUPS}")
+                self._truncated = True
+            names, values = names[:MAX_FRAME_GROUPS], values[:MAX_FRAME_GROUPS]
+            if changed is not None:
+                changed = [i for i in changed if i < MAX_FRAME_GROUPS]
+        if names is not self._names and names != self._names:
+            self._names = names
+            self.table_id = (self.table_id + 1) & 0xFFFFFFFF
+            self._last_table_t = float("-inf")
+        if now - self._last_table_t >= self.table_interval:
+            packets.extend(self._table(names, ts_us))
+            self._last_table_t = now
+        if changed is None:
+            packets.append(self._header(PKT_FRAME, len(names), ts_us)
+                           + values.astype("<f4", copy=False).tobytes())
+        else:
+            body = np.empty(len(changed), dtype=self._delta_dtype)
+            body["i"] = changed
+            body["x"] = values[changed, 0]
+            body["y"] = values[changed, 1]
+            packets.append(self._header(PKT_DELTA, len(changed), ts_us) + body.tobytes())
+        return packets
+
+
+class WireDecoder:
+    """Turns received datagrams back into {group: {"x": .., "y": ..}}."""
+
+    def __init__(self):
+        self.names = None
+        self.table_id = None
+        self.last_seq = None
+        self.lost = 0
+        self._parts = None  # (table_id, names with None for parts not received yet)
+
+    def feed(self, data):
+        """Decode one datagram. Returns the values dict for frame packets
+        (JSON or SKFT), otherwise None."""
+        if data[:1] == b"{":
+            return json.loads(data.decode("utf-8"))
+        if len(data) < HEADER.size or data[:4] != MAGIC:
+            return None
+        magic, version, ptype, count, seq, table_id, ts_us = HEADER.unpack_from(data)
+        if version != VERSION:
+            return None
+        if self.last_seq is not None:
+            gap = (seq - self.last_seq - 1) & 0xFFFFFFFF
+            if gap < 0x80000000:
+                self.lost += gap
+        self.last_seq = seq
+
+        if ptype == PKT_TABLE:
+            first, total = TABLE_PART.unpack_from(data, HEADER.size)
+            if self._parts is None or self._parts[0] != table_id or len(self._parts[1]) != total:
+                self._parts = (table_id, [None] * total)
+            names, off = self._parts[1], HEADER.size + TABLE_PART.size
+            for i in range(first, min(first + count, total)):
+                (n,) = NAME_LEN.unpack_from(data, off)
+                off += NAME_LEN.size
+                names[i] = data[off:off + n].decode("utf-8")
+                off += n
+            if None not in names:
+                self.names, self.table_id = list(names), table_id
+            return None
+
+        if ptype == PKT_FRAME and table_id == self.table_id and count == len(self.names):
+            vals = struct.unpack_from("<%df" % (count * 2), data, HEADER.size)
+            return {name: {"x": vals[2 * i], "y": vals[2 * i + 1]}
+                    for i, name in enumerate(self.names)}
+
+        if ptype == PKT_DELTA and table_id == self.table_id:
+            names = self.names
+            return {names[i]: {"x": x, "y": y}
+                    for i, x, y in DELTA_ENTRY.iter_unpack(data[HEADER.size:HEADER.size + count * DELTA_ENTRY.size])
+                    if i < len(names)}
+        return None